@@ -0,0 +1,21 @@
+import time
+import typing as typ
+
+from pylox.io import OutputStream
+
+
+def best_time(func: typ.Callable[[], typ.Any], repeats: int = 5) -> float:
+    """fastest of several runs of func, in seconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class NullOutput(OutputStream):
+    """an OutputStream that throws away what lox prints"""
+
+    def send(self, data):
+        pass
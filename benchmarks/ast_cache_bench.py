@@ -0,0 +1,43 @@
+"""Startup time of a large script that does little work when run: without
+the AST cache, with a cold cache (compile and store) and with a warm cache
+(load only).
+
+    ./make.sh bench ast_cache_bench
+"""
+
+import os
+import shutil
+import tempfile
+
+from pylox.ast_cache import CACHE_DIR_NAME, AstCache
+from pylox.lox import Lox, LoxFileRunner
+
+from . import NullOutput, best_time
+from .incremental_bench import generate_source
+
+
+def run(path: str, cache=None):
+    LoxFileRunner(Lox(output=NullOutput()), cache=cache).run(path)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.lox")
+        with open(path, "w") as outfile:
+            outfile.write(generate_source(10_000))
+        cache_dir = os.path.join(tmp, CACHE_DIR_NAME)
+
+        def cold():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            run(path, AstCache())
+
+        print(f"no cache:   {best_time(lambda: run(path)):.3f}s")
+        print(f"cold cache: {best_time(cold):.3f}s")
+        print(f"warm cache: {best_time(lambda: run(path, AstCache())):.3f}s")
+        cached = os.path.getsize(os.path.join(cache_dir, "big.lox.loxc"))
+        source = os.path.getsize(path)
+        print(f"cache file: {cached / 1e6:.1f}MB, source {source / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Memory used by the AST of a large script, per node. Tokens the AST keeps
+(identifiers, operators) are counted too, since they are part of what it
+costs to keep the AST around.
+
+    ./make.sh bench ast_memory_bench
+"""
+
+import gc
+import tracemalloc
+
+from pylox.parser import expressions, statements
+from pylox.parser.parser import Parser
+from pylox.regex_scanner import RegexScanner
+
+from .incremental_bench import generate_source
+
+
+def count_nodes(stmts) -> int:
+    count = 0
+    todo = list(stmts)
+    while todo:
+        node = todo.pop()
+        if node is None:
+            continue
+        count += 1
+        for name in node.__slots__:
+            child = getattr(node, name)
+            if isinstance(child, (expressions.Expression, statements.Statement)):
+                todo.append(child)
+            elif isinstance(child, list):
+                todo.extend(
+                    c
+                    for c in child
+                    if isinstance(c, (expressions.Expression, statements.Statement))
+                )
+    return count
+
+
+def main():
+    source = generate_source(20_000)
+    buffer = RegexScanner(source).scan_buffer()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    stmts = list(Parser(buffer).parse())
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    nodes = count_nodes(stmts)
+    print(f"source: {len(source) / 1e6:.2f}MB, {len(buffer)} tokens")
+    print(f"AST: {nodes} nodes, {used / 1e6:.2f}MB, {used / nodes:.0f} bytes per node")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Times function calls: a recursive fib, a function whose body runs nested
+blocks in a loop, and one that makes a closure each time it's called.
+
+    ./make.sh bench call_bench
+"""
+
+from pylox.lox import Lox
+
+from . import NullOutput, best_time
+
+FIB = """
+    fun fib(n) {
+        if (n < 2) return n;
+        return fib(n - 1) + fib(n - 2);
+    }
+    print fib(20);
+"""
+
+BLOCKS = """
+    fun f(n) {
+        var total = 0;
+        for (var i = 0; i < n; i = i + 1) {
+            var a = i * 2;
+            {
+                var b = a + 1;
+                { var c = b + a; total = total + c; }
+            }
+        }
+        return total;
+    }
+    var i = 0;
+    while (i < 500) {
+        f(20);
+        i = i + 1;
+    }
+"""
+
+CLOSURES = """
+    fun counter(start) {
+        var count = start;
+        fun next() {
+            count = count + 1;
+            return count;
+        }
+        return next;
+    }
+    var i = 0;
+    while (i < 10000) {
+        counter(i)();
+        i = i + 1;
+    }
+"""
+
+WORKLOADS = {"fib(20)": FIB, "blocks": BLOCKS, "closures": CLOSURES}
+
+
+def run(source: str):
+    Lox(output=NullOutput()).execute(source)
+
+
+def main():
+    for name, source in WORKLOADS.items():
+        elapsed = best_time(lambda: run(source), repeats=3)
+        print(f"{name}: {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
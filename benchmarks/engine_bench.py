@@ -0,0 +1,37 @@
+"""Times each of Lox's engines on the call_bench workloads, and on
+fib(25).
+
+    ./make.sh bench engine_bench
+"""
+
+from pylox.lox import ENGINES, Lox
+
+from . import NullOutput, best_time
+from .call_bench import FIB, WORKLOADS
+
+FIB_25 = FIB.replace("fib(20);", "fib(25);")
+
+
+def run(source: str, engine: str):
+    Lox(output=NullOutput(), engine=engine).execute(source)
+
+
+def main():
+    workloads = {**WORKLOADS, "fib(25)": FIB_25}
+    for name, source in workloads.items():
+        times = {
+            engine: best_time(lambda: run(source, engine), repeats=3)
+            for engine in ENGINES
+        }
+        tree = times["tree"]
+        print(
+            f"{name}: "
+            + ", ".join(
+                f"{engine} {elapsed:.3f}s ({tree / elapsed:.2f}x)"
+                for engine, elapsed in times.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
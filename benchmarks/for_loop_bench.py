@@ -0,0 +1,68 @@
+"""Runs nested for loops three ways: as counted loops, as for loops that
+aren't counted (the increment is written backwards), and as the while loops
+that for loops used to be desugared into.
+
+    ./make.sh bench for_loop_bench
+"""
+
+from pylox.lox import Lox
+
+from . import NullOutput, best_time
+
+N = 150
+
+COUNTED = f"""
+    var total = 0;
+    for (var i = 0; i < {N}; i = i + 1) {{
+        for (var j = 0; j < {N}; j = j + 1) {{
+            total = total + j;
+        }}
+    }}
+    print total;
+"""
+
+NOT_COUNTED = f"""
+    var total = 0;
+    for (var i = 0; i < {N}; i = 1 + i) {{
+        for (var j = 0; j < {N}; j = 1 + j) {{
+            total = total + j;
+        }}
+    }}
+    print total;
+"""
+
+DESUGARED = f"""
+    var total = 0;
+    {{
+        var i = 0;
+        while (i < {N}) {{
+            {{
+                var j = 0;
+                while (j < {N}) {{
+                    {{
+                        total = total + j;
+                    }}
+                    j = j + 1;
+                }}
+            }}
+            i = i + 1;
+        }}
+    }}
+    print total;
+"""
+
+
+def run(source: str):
+    Lox(output=NullOutput(), optimise=False).execute(source)
+
+
+def main():
+    desugared = best_time(lambda: run(DESUGARED), repeats=3)
+    print(f"desugared while loops: {desugared:.3f}s")
+    for name, source in [("for loops", NOT_COUNTED), ("counted loops", COUNTED)]:
+        elapsed = best_time(lambda: run(source), repeats=3)
+        print(f"{name}: {elapsed:.3f}s ({desugared / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
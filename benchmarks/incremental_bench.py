@@ -0,0 +1,77 @@
+"""Compares a full scan + parse of a 10k line file against incremental
+re-parses after edits of different sizes. The incremental cost should grow
+with the size of the edit, not the size of the file.
+
+    ./make.sh bench incremental_bench
+"""
+
+from pylox.incremental import IncrementalFrontEnd
+from pylox.parser.parser import Parser
+from pylox.scanner import Scanner
+
+from . import best_time
+
+FUNCTION = """fun f{n}(a, b) {{
+    // adds things up
+    var total = 0;
+    for (var i = 0; i < a; i = i + 1) {{
+        total = total + b * {n};
+    }}
+    return total;
+}}
+print f{n}(3, 4);
+"""
+
+
+def generate_source(num_lines: int) -> str:
+    lines_per_function = FUNCTION.count("\n")
+    return "".join(FUNCTION.format(n=n) for n in range(num_lines // lines_per_function))
+
+
+def full_parse(source: str):
+    tokens = list(Scanner(source).scan_tokens(skip_trivia=True))
+    list(Parser(tokens).parse())
+
+
+def main():
+    source = generate_source(10_000)
+    print(f"source: {source.count(chr(10))} lines, {len(source)} chars")
+    print(f"full scan + parse:       {best_time(lambda: full_parse(source)):.4f}s")
+
+    front_end = IncrementalFrontEnd(source)
+    middle = source.index("fun f500(")
+
+    for num_functions in [1, 10, 100]:
+        # replace some whole functions with new ones, in the middle of the file
+        old_text = generate_source(num_functions * 9)
+        end = middle + len(old_text)
+        new_text = old_text.replace("b * ", "b - ")
+
+        def edit():
+            front_end.edit(middle, end, new_text)
+            front_end.edit(middle, end, old_text)
+
+        # two edits per run
+        seconds = best_time(edit) / 2
+        print(
+            f"edit {num_functions * 9:>4} lines:         {seconds:.4f}s"
+            f"  ({front_end.rescanned_chars} chars re-scanned)"
+        )
+
+    def type_a_character():
+        front_end.edit(middle + 20, middle + 20, "1")
+        front_end.edit(middle + 20, middle + 21, "")
+
+    seconds = best_time(type_a_character) / 2
+    print(f"type one character:      {seconds:.4f}s")
+
+    def add_a_line():
+        front_end.edit(middle, middle, "\n")
+        front_end.edit(middle, middle + 1, "")
+
+    seconds = best_time(add_a_line) / 2
+    print(f"add a line (shifts rest): {seconds:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
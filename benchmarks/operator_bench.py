@@ -0,0 +1,65 @@
+"""Times how long the tree-walking Interpreter takes to evaluate each of
+Lox's operators, on literal operands, less the time to evaluate a literal.
+Binary and unary operators are timed with their operands checked, and then
+once the TypeInferrer has found their types.
+
+    ./make.sh bench operator_bench
+"""
+
+import timeit
+
+from pylox.interpreter import Interpreter
+from pylox.lox import Lox
+from pylox.optimiser import TypeInferrer
+from pylox.parser import expressions, statements
+
+NUMBER = 200000
+
+OPERATORS = {
+    "+": "3 + 2",
+    "-": "3 - 2",
+    "*": "3 * 2",
+    "/": "3 / 2",
+    "<": "3 < 2",
+    "<=": "3 <= 2",
+    ">": "3 > 2",
+    ">=": "3 >= 2",
+    "==": "3 == 2",
+    "!=": "3 != 2",
+    "unary -": "-3",
+    "!": "!nil",
+    "and": "3 and 2",
+    "or": "nil or 2",
+}
+
+
+def parse(source: str) -> expressions.Expression:
+    # unoptimised, so that the operators aren't folded away
+    (statement,) = Lox(optimise=False).compile(f"print {source};").statements
+    assert isinstance(statement, statements.Print)
+    return statement.expression
+
+
+def evaluation_time(expr: expressions.Expression) -> float:
+    """nanoseconds per evaluation of expr"""
+    interpreter = Interpreter()
+    evaluate = expr.accept
+    elapsed = min(timeit.repeat(lambda: evaluate(interpreter), number=NUMBER, repeat=5))
+    return elapsed / NUMBER * 1e9
+
+
+def main():
+    literal = evaluation_time(parse("3"))
+    for name, source in OPERATORS.items():
+        expr = parse(source)
+        checked = evaluation_time(expr) - literal
+        if not isinstance(expr, (expressions.Binary, expressions.Unary)):
+            print(f"{name}: {checked:.0f}ns")
+            continue
+        TypeInferrer().infer(expr)
+        typed = evaluation_time(expr) - literal
+        print(f"{name}: checked {checked:.0f}ns, typed {typed:.0f}ns")
+
+
+if __name__ == "__main__":
+    main()
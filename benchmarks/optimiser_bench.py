@@ -0,0 +1,76 @@
+"""Runs workloads with and without the AST optimiser, and shows how many
+times faster the optimised runs are.
+
+    ./make.sh bench optimiser_bench
+"""
+
+import random
+
+from pylox.lox import Lox
+
+from . import NullOutput, best_time
+
+
+def generated_arithmetic(statements: int, seed: int = 14) -> str:
+    """Like the output of a code generator: a loop over a block of
+    declarations that repeat the same few pure expressions.
+    """
+    rng = random.Random(seed)
+    terms = ["a * b + c", "a * b - c", "(a + b) * (a + b)", "-c * -c", "b / a"]
+    lines = []
+    for n in range(statements):
+        expression = " + ".join(rng.choice(terms) for _ in range(3))
+        lines.append(f"var v{n} = {expression};")
+    return f"""
+        var total = 0;
+        for (var i = 1; i < 2000; i = i + 1) {{
+            var a = i;
+            var b = i + 1;
+            var c = i * 2;
+            {" ".join(lines)}
+            total = total + v{statements - 1};
+        }}
+        print total;
+    """
+
+
+WORKLOADS = {
+    "constant expressions in a loop": """
+        var total = 0;
+        for (var i = 0; i < 20000; i = i + 1) {
+            total = total + (1 + 4/2) * 3*2 - 10 + ((2 * 3) - (4 / 2));
+            if (!!(i > 10 * 10) and true) total = total - (2 * 0.5);
+        }
+        print total;
+    """,
+    "dead branches in a loop": """
+        fun step(n) {
+            if (1 > 2) print "tracing";
+            while (false) n = n - 1;
+            if (true) { return n + 1; }
+            print "unreachable";
+        }
+        var n = 0;
+        for (var i = 0; i < 20000; i = i + 1) {
+            n = step(n);
+            if (2 < 1) { print n; } else { n = n + 0; }
+        }
+        print n;
+    """,
+    "generated arithmetic": generated_arithmetic(8),
+}
+
+
+def run(source: str, optimise: bool):
+    Lox(output=NullOutput(), optimise=optimise).execute(source)
+
+
+def main():
+    for name, source in WORKLOADS.items():
+        plain = best_time(lambda: run(source, optimise=False), repeats=3)
+        optimised = best_time(lambda: run(source, optimise=True), repeats=3)
+        print(f"{name}: {plain:.3f}s -> {optimised:.3f}s ({plain / optimised:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Scans a large generated source with the regex scanner, serially and then
+in chunks across different numbers of processes. The speedup depends on
+the number of cores; with one core the parallel scans are slower, as they
+pay for starting processes and copying chunks for nothing.
+
+    ./make.sh bench parallel_scan_bench
+"""
+
+import os
+
+from pylox.parallel_scanner import scan_columns_parallel
+from pylox.regex_scanner import scan_columns
+
+from . import best_time
+from .incremental_bench import generate_source
+
+
+def main():
+    source = generate_source(200_000)
+    cores = os.cpu_count() or 1
+    print(f"source: {source.count(chr(10))} lines, {len(source)} chars")
+    print(f"cores: {cores}")
+
+    serial = best_time(lambda: scan_columns(source), repeats=3)
+    print(f"serial:      {serial:.3f}s")
+
+    for workers in sorted({2, 4, cores} - {1}):
+        seconds = best_time(
+            lambda: scan_columns_parallel(source, workers, chunk_size=1 << 19),
+            repeats=3,
+        )
+        print(f"{workers:>2} workers:  {seconds:.3f}s  ({serial / seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Parses expression-dense code: arithmetic, comparisons, logic and calls,
+from a TokenBuffer so that scanning isn't part of the timing. Also parses
+a deeply nested expression, which the parser handles without recursion.
+
+    ./make.sh bench parser_bench
+"""
+
+from pylox.parser.parser import Parser
+from pylox.regex_scanner import RegexScanner
+
+from . import best_time
+
+STATEMENTS = """var x{n} = a * (b + {n}) - c / 2 >= d and !e or f(g, h + 1) == -i;
+print x{n} + 1;
+y = z = "str" + w;
+"""
+
+
+def main():
+    source = "".join(STATEMENTS.format(n=n) for n in range(10_000))
+    buffer = RegexScanner(source).scan_buffer()
+    print(f"source: {source.count(chr(10))} lines, {len(buffer)} tokens")
+    seconds = best_time(lambda: list(Parser(buffer).parse()))
+    print(f"expression-dense parse: {seconds:.4f}s")
+
+    depth = 100_000
+    nested = RegexScanner("(" * depth + "1" + ")" * depth + ";").scan_buffer()
+    seconds = best_time(lambda: list(Parser(nested).parse()), repeats=1)
+    print(f"{depth} nested groups:   {seconds:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Times returns with the tree engine: recursive calls that return early,
+and functions that return from inside nested blocks and loops.
+
+    ./make.sh bench return_bench
+"""
+
+from pylox.lox import Lox
+
+from . import NullOutput, best_time
+
+RECURSION = """
+    fun count(n) {
+        if (n < 1) return 0;
+        { if (n < 2) return 1; }
+        return count(n - 1) + count(n - 2) + 1;
+    }
+    print count(18);
+"""
+
+NESTED_LOOPS = """
+    fun find(n) {
+        for (var i = 1; i < 10; i = i + 1) {
+            var j = 1;
+            while (j <= i) {
+                {
+                    if (i * j == n) return i * 10 + j;
+                }
+                j = j + 1;
+            }
+        }
+        return -1;
+    }
+    for (var k = 0; k < 1000; k = k + 1) { find(12); find(35); }
+"""
+
+COUNTED_LOOP = """
+    fun first(limit) {
+        for (var i = 0; i < limit; i = i + 1) {
+            { if (i > 2) return i; }
+        }
+        return nil;
+    }
+    for (var k = 0; k < 10000; k = k + 1) first(10);
+"""
+
+WORKLOADS = {
+    "recursion": RECURSION,
+    "nested loops": NESTED_LOOPS,
+    "counted loop": COUNTED_LOOP,
+}
+
+
+def run(source: str):
+    Lox(output=NullOutput()).execute(source)
+
+
+def main():
+    for name, source in WORKLOADS.items():
+        elapsed = best_time(lambda: run(source), repeats=3)
+        print(f"{name}: {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Time to first output and peak memory when running a long script, with
+Lox's streaming pipeline and with every stage run to completion before the
+next, as Lox used to.
+
+    ./make.sh bench streaming_bench
+"""
+
+import time
+import tracemalloc
+
+from pylox.interpreter import Interpreter
+from pylox.io import OutputStream
+from pylox.lox import Lox
+from pylox.parser.parser import Parser
+from pylox.resolver import Resolver
+from pylox.scanner import Scanner
+
+STATEMENT = "var x{n} = {n} * 2 + 1; if (x{n} > 3) {{ print x{n}; }}\n"
+
+
+class FirstOutputTimer(OutputStream):
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_output = None
+
+    def send(self, data):
+        if self.first_output is None:
+            self.first_output = time.perf_counter() - self.start
+
+
+def run_streaming(source: str, out: FirstOutputTimer):
+    Lox(output=out).execute(source)
+
+
+def run_stage_by_stage(source: str, out: FirstOutputTimer):
+    tokens = list(Scanner(source).scan_tokens(skip_trivia=True))
+    statements = list(Parser(tokens).parse())
+    interpreter = Interpreter(out)
+    Resolver(interpreter)._resolve_all(statements)
+    interpreter.interpret(statements)
+
+
+def measure(run, source: str):
+    tracemalloc.start()
+    out = FirstOutputTimer()
+    run(source, out)
+    total = time.perf_counter() - out.start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out.first_output, total, peak
+
+
+def main():
+    source = "".join(STATEMENT.format(n=n) for n in range(20_000))
+    print(f"source: {source.count(chr(10))} lines")
+    runs = [("stage by stage", run_stage_by_stage), ("streaming", run_streaming)]
+    for name, run in runs:
+        first, total, peak = measure(run, source)
+        print(
+            f"{name:<15} first output {first:.4f}s, total {total:.3f}s,"
+            f" peak memory {peak / 1e6:.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
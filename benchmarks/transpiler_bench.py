@@ -0,0 +1,52 @@
+"""Times the python engine, which transpiles Lox to Python, against the
+tree-walking Interpreter, on the vm_bench workloads. Also times how long
+transpiling and compiling a program takes, with and without the compiled
+module in the ModuleCache.
+
+    ./make.sh bench transpiler_bench
+"""
+
+import tempfile
+
+from pylox.lox import Lox
+from pylox.transpiler import ModuleCache, Transpiler
+
+from . import NullOutput, best_time
+from .call_bench import BLOCKS
+from .vm_bench import WORKLOADS
+
+
+def run(source: str, engine: str):
+    Lox(output=NullOutput(), engine=engine).execute(source)
+
+
+def main():
+    for name, source in WORKLOADS.items():
+        tree = best_time(lambda: run(source, "tree"), repeats=3)
+        python = best_time(lambda: run(source, "python"), repeats=3)
+        print(f"{name}: tree {tree:.3f}s, python {python:.3f}s ({tree / python:.2f}x)")
+
+    # a program big enough to be cached: the same function, many times
+    functions = [BLOCKS.replace("fun f", f"fun f{i}") for i in range(50)]
+    program = Lox().compile("".join(functions))
+    with tempfile.TemporaryDirectory() as directory:
+
+        def load():
+            module = Transpiler().transpile(program.statements)
+            ModuleCache(directory).compile(module.source)
+
+        def compile_uncached():
+            module = Transpiler().transpile(program.statements)
+            compile(module.source, "<lox>", "exec")
+
+        uncached = best_time(compile_uncached)
+        load()
+        cached = best_time(load)
+    print(
+        f"transpile and compile 50 functions: {uncached * 1000:.1f}ms,"
+        f" from the cache {cached * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
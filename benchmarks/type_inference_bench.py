@@ -0,0 +1,52 @@
+"""Times arithmetic on locals with the types the optimiser infers, and again
+with them forgotten, so that every operator checks its operands.
+
+    ./make.sh bench type_inference_bench
+"""
+
+from pylox.lox import Lox
+from pylox.optimiser import AstTransformer
+from pylox.parser import expressions
+
+from . import NullOutput, best_time
+
+SOURCE = """
+    fun f(n) {
+        var total = 0;
+        var x = 1.5;
+        for (var i = 0; i < n; i = i + 1) {
+            var y = x * i - i / 2;
+            if (y > total) total = total + y;
+            else total = total - -y;
+        }
+        return total;
+    }
+    print f(30000);
+"""
+
+
+class ForgetTypes(AstTransformer):
+    def __init__(self):
+        super().__init__({})
+
+    def visit_binary_expression(self, expr: expressions.Binary):
+        expr.operand_type = None
+        return super().visit_binary_expression(expr)
+
+    def visit_unary_expression(self, expr: expressions.Unary):
+        expr.operand_type = None
+        return super().visit_unary_expression(expr)
+
+
+def main():
+    lox = Lox(output=NullOutput())
+    program = lox.compile(SOURCE)
+    inferred = best_time(lambda: lox.execute_compiled(program))
+    ForgetTypes().transform_all(program.statements)
+    checked = best_time(lambda: lox.execute_compiled(program))
+    print(f"checked operands: {checked:.3f}s")
+    print(f"inferred types: {inferred:.3f}s ({checked / inferred:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Times reading variables, at several scope depths: each workload sums a
+variable many times in a loop.
+
+    ./make.sh bench variable_access_bench
+"""
+
+from pylox.lox import Lox
+
+from . import NullOutput, best_time
+
+ITERATIONS = 20000
+READS = 10
+
+
+def workload(depth: int, body: str) -> str:
+    """A loop whose body is nested in depth blocks below the loop's"""
+    nested = body
+    for _ in range(depth):
+        nested = f"{{ {nested} }}"
+    return f"""
+        {{
+            var a = 1;
+            var b = 0;
+            var i = 0;
+            while (i < {ITERATIONS}) {{
+                {nested}
+                i = i + 1;
+            }}
+        }}
+    """
+
+
+def global_workload(body: str) -> str:
+    return f"""
+        var a = 1;
+        var b = 0;
+        var i = 0;
+        while (i < {ITERATIONS}) {{
+            {{ {body} }}
+            i = i + 1;
+        }}
+    """
+
+
+def run(source: str):
+    Lox(output=NullOutput(), optimise=False).execute(source)
+
+
+def main():
+    body = "b = " + "a + " * READS + "a;"
+    for depth in [0, 1, 4]:
+        elapsed = best_time(lambda: run(workload(depth, body)))
+        print(f"local, {depth + 1} scopes up: {elapsed:.3f}s")
+    elapsed = best_time(lambda: run(global_workload(body)))
+    print(f"global: {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
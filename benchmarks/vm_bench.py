@@ -0,0 +1,52 @@
+"""Times the bytecode VM against the tree-walking Interpreter, on loops,
+calls and string concatenation.
+
+    ./make.sh bench vm_bench
+"""
+
+from pylox.lox import Lox
+
+from . import NullOutput, best_time
+from .call_bench import FIB
+
+LOOPS = """
+    var total = 0;
+    for (var i = 0; i < 100000; i = i + 1) {
+        if (i / 2 > total - i) total = total + 1;
+        else total = total - 1;
+    }
+    var n = 0;
+    while (n < 50000) n = n + 1;
+    print total + n;
+"""
+
+STRINGS = """
+    fun build(n) {
+        var s = "";
+        for (var i = 0; i < n; i = i + 1) {
+            s = s + "ab";
+            if (s == "") print "empty";
+        }
+        return s;
+    }
+    var total = "";
+    for (var i = 0; i < 200; i = i + 1) total = build(100);
+    print total;
+"""
+
+WORKLOADS = {"loops": LOOPS, "calls (fib(20))": FIB, "strings": STRINGS}
+
+
+def run(source: str, engine: str):
+    Lox(output=NullOutput(), engine=engine).execute(source)
+
+
+def main():
+    for name, source in WORKLOADS.items():
+        tree = best_time(lambda: run(source, "tree"), repeats=3)
+        vm = best_time(lambda: run(source, "vm"), repeats=3)
+        print(f"{name}: tree {tree:.3f}s, vm {vm:.3f}s ({tree / vm:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
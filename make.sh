@@ -19,6 +19,10 @@ elif [ "$command" == "format" ]; then
 elif [ "$command" == "test" ]; then
     pattern=${2:-"*_tests.py"}
     uv run python -m unittest discover -s tests -p "$pattern"
+elif [ "$command" == "bench" ]; then
+    uv run python -m "benchmarks.${2}"
+elif [ "$command" == "precompile" ]; then
+    uv run python -m pylox.ast_cache "${2}"
 elif [ "$command" == "lox" ]; then
     uv run python pylox.py "${@:2}"
 fi
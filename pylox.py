@@ -1,5 +1,6 @@
 import sys
 
+from pylox.ast_cache import AstCache
 from pylox.lox import Lox, LoxRepl, LoxFileRunner
 
 DEBUG = False
@@ -10,6 +11,7 @@ if __name__ == "__main__":
     if len(args) == 0:
         LoxRepl(lox).run()
     elif len(args) == 1:
-        LoxFileRunner(lox).run(args[0])
+        cache = None if DEBUG else AstCache()
+        LoxFileRunner(lox, cache=cache).run(args[0])
     else:
         print("nah")
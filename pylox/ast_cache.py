@@ -0,0 +1,122 @@
+import hashlib
+import os
+import pickle
+import sys
+import typing as typ
+
+from . import __version__
+from .parser import expressions, statements
+
+# Bump this whenever the AST classes change, so that old cache files are
+# recompiled rather than unpickled into the wrong shape.
+CACHE_FORMAT = 9
+
+CACHE_DIR_NAME = "__loxcache__"
+
+
+class CompiledProgram:
+    """A parsed and resolved program, ready to run. The resolver's results
+    are stored in the statements. If it was optimised, originals maps the
+    expressions the optimiser replaced to the ones written (see Optimiser).
+    """
+
+    def __init__(
+        self,
+        statements: typ.List[statements.Statement],
+        originals: typ.Optional[
+            typ.Dict[expressions.Expression, expressions.Expression]
+        ] = None,
+    ):
+        self.statements = statements
+        self.originals = originals or {}
+
+
+class AstCache:
+    """Stores compiled programs on disk, like python's .pyc files, so that
+    scripts that are run again needn't be scanned, parsed and resolved
+    again.
+
+    Each script has one cache file, in a __loxcache__ directory next to it.
+    The file starts with a key made from the script's contents, whether it
+    was optimised, the pylox version and CACHE_FORMAT, followed by the
+    pickled CompiledProgram. A cached program is only used if its key
+    matches.
+    """
+
+    def load(
+        self, path: str, source: bytes, optimised: bool
+    ) -> typ.Optional[CompiledProgram]:
+        try:
+            with open(cache_path(path), "rb") as infile:
+                if infile.readline().rstrip(b"\n") != cache_key(source, optimised):
+                    return None
+                return pickle.load(infile)
+        except Exception:
+            # missing, unreadable and corrupt files are all just misses
+            return None
+
+    def store(
+        self, path: str, source: bytes, optimised: bool, program: CompiledProgram
+    ):
+        cached = cache_path(path)
+        temp = f"{cached}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            # write then rename, so that a half written file is never read
+            with open(temp, "wb") as outfile:
+                outfile.write(cache_key(source, optimised) + b"\n")
+                pickle.dump(program, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, cached)
+        except OSError:
+            # eg. a read only directory: the cache only saves time, so the
+            # program runs without it
+            if os.path.exists(temp):
+                os.remove(temp)
+
+
+def cache_key(source: bytes, optimised: bool) -> bytes:
+    hash = hashlib.sha256(f"pylox {__version__} {CACHE_FORMAT} {optimised}\n".encode())
+    hash.update(source)
+    return hash.hexdigest().encode()
+
+
+def cache_path(path: str) -> str:
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR_NAME, f"{name}.loxc")
+
+
+def precompile_directory(directory: str, cache: typ.Optional[AstCache] = None):
+    """Compile every .lox file under directory into the cache. Returns the
+    paths of the files that compiled, and those that had errors.
+    """
+    from .lox import Lox
+
+    cache = cache or AstCache()
+    lox = Lox()
+    optimised = lox.optimiser is not None
+    compiled, failed = [], []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if d != CACHE_DIR_NAME]
+        for name in sorted(files):
+            if not name.endswith(".lox"):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as infile:
+                source = infile.read()
+            try:
+                program = lox.compile(source)
+            except Exception:
+                failed.append(path)
+                continue
+            cache.store(path, source, optimised, program)
+            compiled.append(path)
+    return compiled, failed
+
+
+if __name__ == "__main__":
+    # python -m pylox.ast_cache <directory>
+    compiled, failed = precompile_directory(sys.argv[1])
+    print(f"compiled {len(compiled)} files")
+    for path in failed:
+        print(f"failed: {path}")
+    sys.exit(1 if failed else 0)
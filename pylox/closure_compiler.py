@@ -0,0 +1,667 @@
+import typing as typ
+from operator import itemgetter
+
+from .callable import Callable
+from .counted_loop import counted_loop
+from .environment import UNDEFINED, Cell, Environment
+from .interpreter import Interpreter, InterpreterException
+from .io import OutputStream
+from .operators import UNCHECKED_OPERATORS
+from .optimiser.type_inference import is_boolean
+from .parser import expressions, statements
+from .token_types import TokenTypes as t
+
+# The locals of a call by slot, followed by the call's upvalues: a list, as
+# indexing one is about as quick as anything in Python. Code that isn't in a
+# function, block or loop with locals runs with None for its frame.
+Frame = typ.Optional[typ.List[typ.Any]]
+
+# A compiled expression: returns the expression's value in a frame
+Evaluate = typ.Callable[[Frame], typ.Any]
+
+# A compiled statement: returns None once it has run, or a 1-tuple of the
+# value, if it ran a return statement
+Execute = typ.Callable[[Frame], typ.Optional[typ.Tuple[typ.Any]]]
+
+
+class ClosureInterpreter(Interpreter):
+    """Runs statements by compiling them into Python closures first, rather
+    than by visiting them. Each node is visited once, when it's compiled,
+    into a closure specialised for what the node is: its operator, and where
+    its variables are. Behaves as the Interpreter does, and raises the same
+    errors.
+    """
+
+    def __init__(
+        self,
+        output: typ.Optional[OutputStream] = None,
+        environment: typ.Optional[Environment] = None,
+    ):
+        super().__init__(output, environment)
+        self.compiler = ClosureCompiler(self)
+
+    def interpret(self, statements: typ.Iterable[statements.Statement]):
+        for statement in statements:
+            self.compiler.compile(statement)(None)
+
+
+class ClosureCompiler:
+    """Compiles resolved statements into closures for the ClosureInterpreter.
+    Global variables are compiled to the interpreter's cells for them, so the
+    closures only run in that interpreter.
+    """
+
+    def __init__(self, interpreter: ClosureInterpreter):
+        self.interpreter = interpreter
+        # the number of locals in the frame of the code being compiled,
+        # which is where its upvalues are. None outside any frame.
+        self.size: typ.Optional[int] = None
+
+    def compile(self, stmt: statements.Statement) -> Execute:
+        return stmt.accept(self)
+
+    def compile_all(self, stmts: typ.List[statements.Statement]) -> Execute:
+        compiled = [self.compile(stmt) for stmt in stmts]
+        if not compiled:
+            return _nil
+        if len(compiled) == 1:
+            return compiled[0]
+        if len(compiled) == 2:
+            first, second = compiled
+
+            def execute_two(frame):
+                result = first(frame)
+                if result is not None:
+                    return result
+                return second(frame)
+
+            return execute_two
+
+        def execute_all(frame):
+            for execute in compiled:
+                result = execute(frame)
+                if result is not None:
+                    return result
+            return None
+
+        return execute_all
+
+    def expression(self, expr: expressions.Expression) -> Evaluate:
+        return expr.accept(self)
+
+    def condition(self, expr: expressions.Expression) -> Evaluate:
+        """Compiles expr to return whether its value is truthy"""
+        evaluate = self.expression(expr)
+        if is_boolean(expr):
+            return evaluate
+
+        def truthy(frame):
+            value = evaluate(frame)
+            return value is not None and value is not False
+
+        return truthy
+
+    # statements
+
+    def visit_expression_statement(self, stmt: statements.ExpressionStatement):
+        evaluate = self.expression(stmt.expression)
+
+        def execute(frame):
+            evaluate(frame)
+
+        return execute
+
+    def visit_print_statement(self, stmt: statements.Print):
+        evaluate = self.expression(stmt.expression)
+        send = self.interpreter.out.send
+
+        def execute(frame):
+            value = evaluate(frame)
+            send("nil" if value is None else value)
+
+        return execute
+
+    def visit_return_statement(self, stmt: statements.Return):
+        if stmt.value is None:
+            return _return_nil
+        evaluate = self.expression(stmt.value)
+
+        def execute(frame):
+            return (evaluate(frame),)
+
+        return execute
+
+    def visit_variable_declaration(self, stmt: statements.VariableDeclaration):
+        evaluate = _nil
+        if stmt.initialiser:
+            evaluate = self.expression(stmt.initialiser)
+        if not stmt.identifier.lexeme:
+
+            def execute(frame):
+                evaluate(frame)
+                raise InterpreterException(
+                    stmt.initialiser, stmt.identifier, "Identifier must not be empty"
+                )
+
+            return execute
+        return self._define(stmt.identifier.lexeme, stmt.slot, stmt.captured, evaluate)
+
+    def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
+        outer_size = self.size
+        self.size = stmt.size
+        try:
+            body = self.compile_all(stmt.body)
+        finally:
+            self.size = outer_size
+
+        upvalues = stmt.upvalues
+
+        def closure(frame):
+            # the closure keeps only the cells it uses, not the frame
+            cells = [
+                frame[index] if in_frame else frame[outer_size][index]
+                for in_frame, index in upvalues
+            ]
+            return ClosureFunction(stmt, body, cells)
+
+        slot = stmt.slot
+        if slot is not None and stmt.captured:
+            # The function's cell is made before the closure, which needs it
+            # if the function calls itself.
+            def define_cell(frame):
+                cell = frame[slot] = Cell(None)
+                cell.value = closure(frame)
+
+            return define_cell
+
+        return self._define(stmt.name.lexeme, slot, False, closure)
+
+    def visit_block(self, stmt: statements.Block):
+        return self._in_frame(stmt.size, lambda: self.compile_all(stmt.statements))
+
+    def visit_if(self, stmt: statements.If):
+        condition = self.condition(stmt.condition)
+        then_branch = self.compile(stmt.thenBranch)
+        if stmt.elseBranch is None:
+
+            def execute_if(frame):
+                if condition(frame):
+                    return then_branch(frame)
+                return None
+
+            return execute_if
+
+        else_branch = self.compile(stmt.elseBranch)
+
+        def execute_if_else(frame):
+            if condition(frame):
+                return then_branch(frame)
+            return else_branch(frame)
+
+        return execute_if_else
+
+    def visit_while(self, stmt: statements.While):
+        condition = self.condition(stmt.condition)
+        body = self.compile(stmt.body)
+
+        def execute(frame):
+            while condition(frame):
+                result = body(frame)
+                if result is not None:
+                    return result
+            return None
+
+        return execute
+
+    def visit_for(self, stmt: statements.For):
+        return self._in_frame(stmt.size, lambda: self._for(stmt))
+
+    def _for(self, stmt: statements.For) -> Execute:
+        initialise = _nil
+        if stmt.initialiser is not None:
+            initialise = self.compile(stmt.initialiser)
+        condition = self.condition(stmt.condition)
+        body = self.compile_all(stmt.body)
+        increment = _nil
+        if stmt.increment is not None:
+            increment = self.expression(stmt.increment)
+
+        def loop(frame):
+            while condition(frame):
+                result = body(frame)
+                if result is not None:
+                    return result
+                increment(frame)
+            return None
+
+        counted = counted_loop(stmt)
+        if counted is None:
+
+            def execute(frame):
+                initialise(frame)
+                return loop(frame)
+
+            return execute
+
+        # as CountedLoop.run does, without evaluating the condition and
+        # increment expressions
+        slot, compare, step = counted.slot, counted.compare, counted.step
+        limit = self.expression(counted.limit)
+
+        def execute_counted(frame):
+            initialise(frame)
+            counter = frame[slot]
+            end = limit(frame)
+            if not (type(counter) is float and type(end) is float):
+                # run as usual, to raise the error
+                return loop(frame)
+            while compare(counter, end):
+                result = body(frame)
+                if result is not None:
+                    return result
+                counter += step
+                frame[slot] = counter
+            return None
+
+        return execute_counted
+
+    def _in_frame(self, size: int, compile: typ.Callable[[], Execute]) -> Execute:
+        """Compiles the statements of a block or loop, in a frame of their own
+        if they have one
+        """
+        if not size:
+            return compile()
+        outer_size = self.size
+        self.size = size
+        try:
+            body = compile()
+        finally:
+            self.size = outer_size
+        # nothing outside a function has upvalues
+        new_frame = [None] * size + [()]
+
+        def execute(frame):
+            return body(new_frame[:])
+
+        return execute
+
+    def _define(
+        self, name: str, slot: typ.Optional[int], captured: bool, evaluate: Evaluate
+    ) -> Execute:
+        if slot is None:
+            cell = self.interpreter.globals.cell(name)
+
+            def define_global(frame):
+                cell.value = evaluate(frame)
+
+            return define_global
+        if captured:
+            # a new cell each time, so that closures made by different runs of
+            # the declaration, as in a loop, each get their own
+            def define_cell(frame):
+                frame[slot] = Cell(evaluate(frame))
+
+            return define_cell
+
+        def define_local(frame):
+            frame[slot] = evaluate(frame)
+
+        return define_local
+
+    # expressions
+
+    def visit_literal_expression(self, expr: expressions.Literal):
+        value = expr.value
+
+        def evaluate(frame):
+            return value
+
+        return evaluate
+
+    def visit_grouping_expression(self, expr: expressions.Grouping):
+        return self.expression(expr.expression)
+
+    def visit_variable_expression(self, expr: expressions.Variable):
+        slot = expr.slot
+        if expr.depth == 0:
+            if not expr.captured:
+                return itemgetter(slot)
+
+            def get_cell(frame):
+                return frame[slot].value
+
+            return get_cell
+
+        if expr.depth is None:
+            cell = self.interpreter.globals.cell(expr.identifier.lexeme)
+
+            def get_global(frame):
+                value = cell.value
+                if value is UNDEFINED:
+                    raise _undefined(expr)
+                return value
+
+            return get_global
+
+        upvalues = self.size
+
+        def get_upvalue(frame):
+            return frame[upvalues][slot].value
+
+        return get_upvalue
+
+    def visit_assignment_expression(self, expr: expressions.Assignment):
+        evaluate = self.expression(expr.expression)
+        slot = expr.slot
+        if expr.depth == 0:
+            if expr.captured:
+
+                def set_cell(frame):
+                    value = frame[slot].value = evaluate(frame)
+                    return value
+
+                return set_cell
+
+            def set_local(frame):
+                value = frame[slot] = evaluate(frame)
+                return value
+
+            return set_local
+
+        if expr.depth is None:
+            cell = self.interpreter.globals.cell(expr.identifier.lexeme)
+
+            def set_global(frame):
+                value = evaluate(frame)
+                if cell.value is UNDEFINED:
+                    raise _undefined(expr)
+                cell.value = value
+                return value
+
+            return set_global
+
+        upvalues = self.size
+
+        def set_upvalue(frame):
+            value = frame[upvalues][slot].value = evaluate(frame)
+            return value
+
+        return set_upvalue
+
+    def visit_call(self, expr: expressions.Call):
+        callee = self.expression(expr.callee)
+        args = [self.expression(arg) for arg in expr.args]
+        count = len(args)
+        interpreter = self.interpreter
+
+        def call(frame):
+            function = callee(frame)
+            values = [arg(frame) for arg in args]
+            if type(function) is ClosureFunction and function._arity == count:
+                # as ClosureFunction.call does, without another Python call
+                # for each Lox call
+                new_frame = values + function._rest
+                for slot in function._captured_params:
+                    new_frame[slot] = Cell(new_frame[slot])
+                result = function._body(new_frame)
+                return None if result is None else result[0]
+
+            if not isinstance(function, Callable):
+                raise InterpreterException(
+                    expr, expr.closing_paren, "Can only call functions and classes"
+                )
+            if count != function.arity():
+                raise InterpreterException(
+                    expr,
+                    expr.closing_paren,
+                    f"Expected {function.arity()} args, got {count}",
+                )
+            return function.call(interpreter, values)
+
+        return call
+
+    def visit_logical_expression(self, expr: expressions.Logical):
+        left = self.expression(expr.left)
+        right = self.expression(expr.right)
+
+        if expr.operator.type == t.OR:
+
+            def evaluate_or(frame):
+                value = left(frame)
+                if value is not None and value is not False:
+                    return value
+                return right(frame)
+
+            return evaluate_or
+
+        def evaluate_and(frame):
+            value = left(frame)
+            if value is None or value is False:
+                return value
+            return right(frame)
+
+        return evaluate_and
+
+    def visit_unary_expression(self, expr: expressions.Unary):
+        right = self.expression(expr.right)
+
+        if expr.operator.type == t.BANG:
+
+            def evaluate_not(frame):
+                value = right(frame)
+                return value is None or value is False
+
+            return evaluate_not
+
+        if expr.operand_type is not None:
+            # a number, as the TypeInferrer has made sure
+
+            def negate_number(frame):
+                return -right(frame)
+
+            return negate_number
+
+        def negate(frame):
+            value = right(frame)
+            if type(value) is float:
+                return -value
+            raise InterpreterException(expr, expr.operator, "operand must be a number")
+
+        return negate
+
+    def visit_binary_expression(self, expr: expressions.Binary):
+        left = self.expression(expr.left)
+        right = self.expression(expr.right)
+
+        if expr.operand_type is not None:
+            # the TypeInferrer has made sure the operands are valid
+            operator = UNCHECKED_OPERATORS[expr.operator.type]
+
+            def evaluate(frame):
+                return operator(left(frame), right(frame))
+
+            return evaluate
+
+        return BINARY_COMPILERS[expr.operator.type](expr, left, right)
+
+
+class ClosureFunction(Callable):
+    """A function of the ClosureInterpreter. Each call runs in a new frame,
+    made from its args and its closure's upvalues.
+    """
+
+    def __init__(
+        self,
+        declaration: statements.FunctionDeclaration,
+        body: Execute,
+        upvalues: typ.List[Cell],
+    ):
+        self._declaration = declaration
+        self._body = body
+        self._arity = len(declaration.params)
+        self._captured_params = declaration.captured_params
+        # the params are the first slots, and the upvalues follow the locals
+        self._rest = [None] * (declaration.size - self._arity) + [upvalues]
+
+    def call(self, interpreter, args):
+        frame = args + self._rest
+        for slot in self._captured_params:
+            frame[slot] = Cell(frame[slot])
+        result = self._body(frame)
+        return None if result is None else result[0]
+
+    def arity(self):
+        return self._arity
+
+    def __repr__(self):
+        return f"<fn {self._declaration.name.lexeme}>"
+
+
+def _nil(frame):
+    """evaluates to nil, or executes nothing"""
+    return None
+
+
+def _return_nil(frame):
+    return (None,)
+
+
+def _undefined(expr: expressions.Variable | expressions.Assignment):
+    return InterpreterException(
+        expr, expr.identifier, f"Undefined variable {expr.identifier.lexeme}"
+    )
+
+
+def _number_operands(expr: expressions.Binary):
+    return InterpreterException(expr, expr.operator, "operands must be numbers")
+
+
+# Binary operators, with their operands' types checked as the Interpreter
+# checks them. Each is written out, so the operation itself is inline.
+
+Operator = typ.Callable[[expressions.Binary, Evaluate, Evaluate], Evaluate]
+
+
+def _subtract(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        if type(a) is float and type(b) is float:
+            return a - b
+        raise _number_operands(expr)
+
+    return evaluate
+
+
+def _divide(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        if type(a) is float and type(b) is float:
+            return a / b
+        raise _number_operands(expr)
+
+    return evaluate
+
+
+def _multiply(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        if type(a) is float and type(b) is float:
+            return a * b
+        raise _number_operands(expr)
+
+    return evaluate
+
+
+def _add(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        if type(a) is type(b) and (type(a) is float or type(a) is str):
+            return a + b
+        raise InterpreterException(
+            expr, expr.operator, "invalid operands for binary expression"
+        )
+
+    return evaluate
+
+
+def _greater(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        if type(a) is float and type(b) is float:
+            return a > b
+        raise _number_operands(expr)
+
+    return evaluate
+
+
+def _greater_equal(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        if type(a) is float and type(b) is float:
+            return a >= b
+        raise _number_operands(expr)
+
+    return evaluate
+
+
+def _less(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        if type(a) is float and type(b) is float:
+            return a < b
+        raise _number_operands(expr)
+
+    return evaluate
+
+
+def _less_equal(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        if type(a) is float and type(b) is float:
+            return a <= b
+        raise _number_operands(expr)
+
+    return evaluate
+
+
+def _equal(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        # nil is only equal to nil, and values of different types differ
+        return type(a) is type(b) and a == b
+
+    return evaluate
+
+
+def _not_equal(expr: expressions.Binary, left: Evaluate, right: Evaluate):
+    def evaluate(frame):
+        a = left(frame)
+        b = right(frame)
+        return type(a) is not type(b) or a != b
+
+    return evaluate
+
+
+# What compiles each binary operator: a function of the Binary node and its
+# operands' closures, that returns the node's closure
+BINARY_COMPILERS: typ.Dict[t, Operator] = {
+    t.MINUS: _subtract,
+    t.SLASH: _divide,
+    t.STAR: _multiply,
+    t.PLUS: _add,
+    t.GREATER: _greater,
+    t.GREATER_EQUAL: _greater_equal,
+    t.LESS: _less,
+    t.LESS_EQUAL: _less_equal,
+    t.EQUAL_EQUAL: _equal,
+    t.BANG_EQUAL: _not_equal,
+}
@@ -0,0 +1,155 @@
+import operator
+import typing as typ
+
+from .optimiser.transformer import AstTransformer
+from .parser import expressions, statements
+from .token_types import TokenTypes as t
+
+if typ.TYPE_CHECKING:
+    from .interpreter import Interpreter
+
+COMPARISONS = {
+    t.LESS: operator.lt,
+    t.LESS_EQUAL: operator.le,
+    t.GREATER: operator.gt,
+    t.GREATER_EQUAL: operator.ge,
+}
+
+STEPS = {t.PLUS: 1.0, t.MINUS: -1.0}
+
+
+class CountedLoop:
+    """A for loop of the form
+
+        for (var i = start; i < limit; i = i + step) body
+
+    where the body never assigns to i, and limit is a literal, or a variable
+    that the body can't change (it doesn't assign to it, or call anything).
+    The comparison may be any of < <= > >=, the increment may subtract, and
+    step must be a literal number.
+
+    Such a loop is run in Python: the counter is compared and incremented
+    without evaluating the condition and increment expressions. The body
+    still reads the counter from the loop's environment, where it is stored
+    after each increment.
+    """
+
+    __slots__ = ("slot", "compare", "limit", "step")
+
+    def __init__(
+        self,
+        slot: int,
+        compare: typ.Callable[[float, float], bool],
+        limit: expressions.Literal | expressions.Variable,
+        step: float,
+    ):
+        self.slot = slot
+        self.compare = compare
+        self.limit = limit
+        self.step = step
+
+    def run(self, interpreter: "Interpreter", body: typ.List[statements.Statement]):
+        """Runs the loop in interpreter.env, which must hold the counter.
+        Returns False without running anything, if the counter or limit
+        aren't numbers. The loop must then run as usual, to raise the error.
+        Otherwise returns the loop's completion, as Interpreter._execute does.
+        """
+        values = interpreter.env.values
+        counter = values[self.slot]
+        limit = interpreter._evaluate(self.limit)
+        if not (isinstance(counter, float) and isinstance(limit, float)):
+            return False
+
+        compare, step, slot = self.compare, self.step, self.slot
+        execute = interpreter._execute
+        while compare(counter, limit):
+            for stmt in body:
+                completion = execute(stmt)
+                if completion is not None:
+                    return completion
+            counter += step
+            values[slot] = counter
+        return None
+
+
+def counted_loop(stmt: statements.For) -> typ.Optional[CountedLoop]:
+    """Returns a CountedLoop for stmt, if it is one"""
+    initialiser = stmt.initialiser
+    if not isinstance(initialiser, statements.VariableDeclaration):
+        return None
+    if initialiser.captured or initialiser.slot is None:
+        # the counter's slot holds a Cell, which run doesn't handle
+        return None
+    name = initialiser.identifier.lexeme
+
+    # The loop's scope holds nothing but the counter, so a variable named
+    # after it in the condition or increment is it.
+    condition = stmt.condition
+    if not (
+        isinstance(condition, expressions.Binary)
+        and condition.operator.type in COMPARISONS
+        and _is_variable(condition.left, name)
+    ):
+        return None
+    if not isinstance(condition.right, (expressions.Literal, expressions.Variable)):
+        return None
+    limit: expressions.Literal | expressions.Variable = condition.right
+
+    step = _step(stmt.increment, name)
+    if step is None:
+        return None
+
+    writes = Writes()
+    writes.transform_all(stmt.body)
+    if name in writes.names:
+        return None
+    if isinstance(limit, expressions.Variable):
+        limit_name = limit.identifier.lexeme
+        if limit_name == name or limit_name in writes.names or writes.calls:
+            return None
+
+    return CountedLoop(
+        initialiser.slot, COMPARISONS[condition.operator.type], limit, step
+    )
+
+
+def _step(increment: typ.Optional[expressions.Expression], name: str):
+    """The step of increment, if it's name = name + step or name - step"""
+    if not (
+        isinstance(increment, expressions.Assignment)
+        and increment.identifier.lexeme == name
+    ):
+        return None
+    value = increment.expression
+    if not (
+        isinstance(value, expressions.Binary)
+        and value.operator.type in STEPS
+        and _is_variable(value.left, name)
+        and isinstance(value.right, expressions.Literal)
+        and isinstance(value.right.value, float)
+    ):
+        return None
+    return STEPS[value.operator.type] * value.right.value
+
+
+def _is_variable(expr: expressions.Expression, name: str) -> bool:
+    return isinstance(expr, expressions.Variable) and expr.identifier.lexeme == name
+
+
+class Writes(AstTransformer):
+    """Finds the names that statements assign to, including in functions
+    they declare, and whether they make any calls. Changes nothing.
+    """
+
+    def __init__(self):
+        super().__init__({})
+        self.names: typ.Set[str] = set()
+        self.calls = False
+
+    def visit_assignment_expression(self, expr: expressions.Assignment):
+        self.names.add(expr.identifier.lexeme)
+        return super().visit_assignment_expression(expr)
+
+    def visit_call(self, expr: expressions.Call):
+        self.calls = True
+        return super().visit_call(expr)
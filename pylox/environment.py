@@ -2,45 +2,71 @@ from __future__ import annotations
 from .token import Token
 import typing as t
 
+# the value of a global that has been referred to, but not defined yet
+UNDEFINED: t.Any = object()
+
+
+class Cell:
+    """Holds the value of a global variable, or of a local that closures
+    have captured.
+
+    Variable and Assignment nodes cache the cell of the global they refer
+    to, so that reading or writing it after the first time doesn't look up
+    its name. table is the Environment that a global's cell belongs to, and
+    None for a local's.
+    """
+
+    __slots__ = ("value", "table")
+
+    def __init__(self, value: t.Any = UNDEFINED, table: Environment | None = None):
+        self.value = value
+        self.table = table
+
 
 class Environment:
-    def __init__(self, parent: t.Optional[Environment] = None):
-        self.parent = parent
-        self.values: t.Dict[str, t.Any] = {}
+    """The global variables, in cells that are made the first time a name is
+    defined or referred to, and never removed. Redefining a global changes
+    the value in its cell.
+    """
+
+    def __init__(self):
+        self.cells: t.Dict[str, Cell] = {}
+
+    def cell(self, name: str) -> Cell:
+        cell = self.cells.get(name)
+        if cell is None:
+            cell = self.cells[name] = Cell(table=self)
+        return cell
 
     def define(self, name: str, value):
-        self.values[name] = value
+        self.cell(name).value = value
 
     def assign(self, name: Token, value):
-        if name.lexeme in self.values:
-            self.values[name.lexeme] = value
-            return
-        if self.parent:
-            self.parent.assign(name, value)
-            return
-        raise EnvironmentException(f"Undefined variable {name.lexeme}")
-
-    def assign_at(self, distance: int, name: Token, value):
-        self._ancestor(distance).values[name.lexeme] = value
+        cell = self.cell(name.lexeme)
+        if cell.value is UNDEFINED:
+            raise EnvironmentException(f"Undefined variable {name.lexeme}")
+        cell.value = value
 
     def get(self, name: Token):
-        if name.lexeme in self.values:
-            return self.values[name.lexeme]
-        if self.parent:
-            return self.parent.get(name)
-        raise EnvironmentException(f"Undefined variable {name.lexeme}")
-
-    def get_at(self, distance, name: str):
-        return self._ancestor(distance).values.get(name)
-
-    def _ancestor(self, distance: int):
-        env = self
-        for _ in range(distance):
-            if env.parent:
-                env = env.parent
-            else:
-                raise EnvironmentException("too far!")
-        return env
+        value = self.cell(name.lexeme).value
+        if value is UNDEFINED:
+            raise EnvironmentException(f"Undefined variable {name.lexeme}")
+        return value
+
+
+class Frame:
+    """The locals of a function call, or of a block or loop that isn't in a
+    function. They're stored by the slot that the Resolver gave them, rather
+    than by name. A captured local's slot holds its Cell. upvalues are the
+    cells of the variables that the function uses from the functions it's
+    in, copied from their frames when its closure was made.
+    """
+
+    __slots__ = ("upvalues", "values")
+
+    def __init__(self, upvalues: t.Sequence[Cell], size: int):
+        self.upvalues = upvalues
+        self.values: t.List[t.Any] = [None] * size
 
 
 class EnvironmentException(Exception):
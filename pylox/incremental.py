@@ -0,0 +1,232 @@
+import bisect
+import typing as typ
+
+from .parser.parser import Parser, ParserException
+from .parser.statements import Statement
+from .scanner import Scanner, ScannerError
+from .token import Token
+from .token_types import TokenTypes as t
+
+
+class IncrementalFrontEnd:
+    """Scans and parses a source buffer, then keeps it up to date as the
+    buffer is edited. An edit only re-scans and re-parses the top level
+    statements it touches; all other statements (and their tokens) are
+    reused as-is.
+
+    The buffer is split into segments, one per top level statement. Each
+    segment starts right after the last token of the previous statement,
+    so it owns its leading whitespace and comments, and the scanner is
+    always in a clean state at a segment boundary. An edit re-parses the
+    segments it touches. If the result doesn't end cleanly at the last
+    touched segment (eg. the edit opened a block or a string), more
+    segments are pulled in until it does.
+
+    Segments with syntax errors are kept as 'broken' segments with no
+    statement. They're re-parsed when they are next edited.
+
+    An edit moves every later segment, but they're not all moved there and
+    then. The segments from _shift_from on are all out by the same _delta
+    chars and _line_delta lines, as in a gap buffer, and the next edit only
+    moves the segments between it and this one. Tokens' lines are only
+    brought up to date when their statements are asked for. So an edit's
+    cost grows with its size and its distance from the last edit, rather
+    than with the size of the buffer.
+    """
+
+    def __init__(self, source: str = ""):
+        self.source = source
+        self._segments = self._parse_source()
+        self._shift_from = len(self._segments)
+        self._delta = 0
+        self._line_delta = 0
+        self.rescanned_chars = len(source)
+
+    @property
+    def statements(self) -> typ.List[Statement]:
+        self._settle()
+        return [s.statement for s in self._segments if s.statement is not None]
+
+    @property
+    def errors(self) -> typ.List[ParserException | ScannerError]:
+        self._settle()
+        return [s.error for s in self._segments if s.error is not None]
+
+    def edit(self, start: int, end: int, text: str):
+        """Replace source[start:end] with text"""
+        old_source = self.source
+        self.source = old_source[:start] + text + old_source[end:]
+        delta = len(text) - (end - start)
+        line_delta = text.count("\n") - old_source.count("\n", start, end)
+
+        segments = self._segments
+        if not segments:
+            self._segments = self._parse_source()
+            self._shift_from = len(self._segments)
+            self.rescanned_chars = len(self.source)
+            return
+
+        # Include the segments either side of the edit if it's on a
+        # boundary, since inserted text may join onto either of them.
+        first = self._segment_index_at(max(start - 1, 0))
+        last = self._segment_index_at(min(end, len(old_source) - 1))
+
+        region_start = self._start(first)
+        line = self._line(first)
+        while True:
+            region_end = self._end(last) + delta
+            new_segments = self._parse_region(region_start, region_end, line)
+            if new_segments is not None:
+                break
+            # The edit affects more than the touched segments. Grow the
+            # region quickly, so that a big change doesn't re-parse the
+            # same text over and over.
+            last = min(len(segments) - 1, last + (last - first + 1))
+
+        # Move the pending shift to start right after the edit, so the
+        # edit's own delta can be added to it.
+        shift_from = self._shift_from
+        for segment in segments[shift_from:first]:
+            segment.shift(self._delta, self._line_delta)
+        for segment in segments[last + 1 : shift_from]:
+            segment.shift(-self._delta, -self._line_delta)
+        segments[first : last + 1] = new_segments
+        self._shift_from = first + len(new_segments)
+        self._delta += delta
+        self._line_delta += line_delta
+        self.rescanned_chars = region_end - region_start
+
+    def _start(self, index: int) -> int:
+        segment = self._segments[index]
+        return (
+            segment.start + self._delta if index >= self._shift_from else segment.start
+        )
+
+    def _end(self, index: int) -> int:
+        segment = self._segments[index]
+        return segment.end + self._delta if index >= self._shift_from else segment.end
+
+    def _line(self, index: int) -> int:
+        segment = self._segments[index]
+        if index >= self._shift_from:
+            return segment.line + self._line_delta
+        return segment.line
+
+    def _segment_index_at(self, offset: int) -> int:
+        indexes = range(len(self._segments))
+        idx = bisect.bisect_right(indexes, offset, key=self._start)
+        return max(idx - 1, 0)
+
+    def _settle(self):
+        """Applies the pending shift, and brings every token's line up to
+        date, for the statements and errors to be handed out.
+        """
+        for segment in self._segments[self._shift_from :]:
+            segment.shift(self._delta, self._line_delta)
+        self._shift_from = len(self._segments)
+        self._delta = self._line_delta = 0
+        for segment in self._segments:
+            segment.settle()
+
+    def _parse_source(self) -> typ.List["_Segment"]:
+        segments = self._parse_region(0, len(self.source), 1)
+        # the whole source always makes sense on its own
+        assert segments is not None
+        return segments
+
+    def _parse_region(
+        self, start: int, end: int, line: int
+    ) -> typ.Optional[typ.List["_Segment"]]:
+        """Scan and parse source[start:end] into segments. Returns None if the
+        region doesn't make sense on its own, and the text after it must be
+        included.
+        """
+        text = self.source[start:end]
+        at_end_of_source = end == len(self.source)
+
+        scanner = Scanner(text, line)
+        tokens: typ.List[Token] = []
+        token_ends: typ.List[int] = []
+        for token in scanner.scan_tokens(skip_trivia=True):
+            if isinstance(token, ScannerError):
+                # eg. an unterminated string, which may end after the region
+                if scanner.current_idx == len(text) and not at_end_of_source:
+                    return None
+                return [_Segment(start, end, line, [], None, token)]
+            tokens.append(token)
+            token_ends.append(scanner.current_idx)
+
+        segments = []
+        segment_start = start
+        segment_line = line
+        first_token = 0
+        parser = Parser(tokens, recover=False)
+        try:
+            for statement in parser.parse():
+                last_token = parser.current_idx - 1
+                segment_end = start + token_ends[last_token]
+                segments.append(
+                    _Segment(
+                        segment_start,
+                        segment_end,
+                        segment_line,
+                        tokens[first_token : last_token + 1],
+                        statement,
+                    )
+                )
+                segment_start = segment_end
+                segment_line = tokens[last_token].line
+                first_token = parser.current_idx
+        except ParserException as e:
+            if e.token.type == t.EOF and not at_end_of_source:
+                return None
+            broken = _Segment(
+                segment_start, end, segment_line, tokens[first_token:], None, e
+            )
+            return segments + [broken]
+
+        trailing_trivia = text[segment_start - start :]
+        if not at_end_of_source and "//" in trailing_trivia.rsplit("\n", 1)[-1]:
+            # a comment that would continue into the next segment
+            return None
+
+        if segments:
+            segments[-1].end = end
+        elif end > start:
+            segments.append(_Segment(start, end, line, [], None))
+        return segments
+
+
+class _Segment:
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        line: int,
+        tokens: typ.List[Token],
+        statement: typ.Optional[Statement],
+        error: typ.Optional[ParserException | ScannerError] = None,
+    ):
+        self.start = start
+        self.end = end
+        self.line = line
+        self.tokens = tokens
+        self.statement = statement
+        self.error = error
+        # the line that the tokens' lines count from, until settle()
+        self.tokens_line = line
+
+    def shift(self, delta: int, line_delta: int):
+        self.start += delta
+        self.end += delta
+        self.line += line_delta
+
+    def settle(self):
+        """Moves the tokens to the segment's line"""
+        line_delta = self.line - self.tokens_line
+        if line_delta:
+            for token in self.tokens:
+                token.line += line_delta
+            if isinstance(self.error, ScannerError):
+                self.error.line += line_delta
+            self.tokens_line = self.line
@@ -1,16 +1,21 @@
 import typing as typ
 
 from pylox.callable import Callable
+from pylox.counted_loop import counted_loop
 from pylox.lox_function import LoxFunction
 from pylox.native_funcs import Clock
-from pylox.return_exception import ReturnException
 
+from .operators import OperandError, is_truthy
 from .parser import expressions
 from .parser import statements
-from .token_types import TokenTypes as t
 from .token import Token
 from .io import OutputStream, StdOutputStream
-from .environment import Environment
+from .environment import UNDEFINED, Cell, Environment, Frame
+
+# What running a statement returns: None once it has run, or a 1-tuple of the
+# value, if it ran a return statement. Blocks and loops stop at the first
+# statement that returns, and pass its completion on to the function call.
+Completion = typ.Optional[typ.Tuple[typ.Any]]
 
 
 class Interpreter:
@@ -20,9 +25,10 @@ class Interpreter:
         environment: typ.Optional[Environment] = None,
     ):
         self.out = output or StdOutputStream()
-        self.env = environment or Environment()
-        self.globals = self.env
-        self.locals: typ.Dict[expressions.Expression | statements.Statement, int] = {}
+        self.globals = environment or Environment()
+        # the frame of the call, or the block or loop outside any function,
+        # that is running. Empty at the top level, where variables are global.
+        self.env = Frame((), 0)
 
         self.globals.define("clock", Clock())
 
@@ -31,8 +37,23 @@ class Interpreter:
             self._execute(statement)
 
     def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
-        func = LoxFunction(stmt, self.env)
-        self.env.define(stmt.name.lexeme, func)
+        env = self.env
+        slot = stmt.slot
+        cell = None
+        if slot is not None and stmt.captured:
+            # The function's cell is made before the closure, which needs it
+            # if the function calls itself.
+            cell = env.values[slot] = Cell(None)
+        # the closure keeps only the cells it uses, not the frame
+        upvalues = [
+            env.values[index] if in_frame else env.upvalues[index]
+            for in_frame, index in stmt.upvalues
+        ]
+        func = LoxFunction(stmt, upvalues)
+        if cell is None:
+            self._define(stmt.name.lexeme, slot, func, False)
+        else:
+            cell.value = func
 
     def visit_call(self, expr: expressions.Call):
         callee: Callable = self._evaluate(expr.callee)
@@ -57,22 +78,48 @@ class Interpreter:
         if stmt.initialiser:
             value = self._evaluate(stmt.initialiser)
         if not stmt.identifier.lexeme:
+            # declarations the parser makes always have a name
+            expression = typ.cast(expressions.Expression, stmt.initialiser)
             raise InterpreterException(
-                stmt.initialiser, stmt.identifier, "Identifier must not be empty"
+                expression, stmt.identifier, "Identifier must not be empty"
             )
-        self.env.define(stmt.identifier.lexeme, value)
+        self._define(stmt.identifier.lexeme, stmt.slot, value, stmt.captured)
 
     def visit_assignment_expression(self, expr: expressions.Assignment):
         value = self._evaluate(expr.expression)
-        dist = self.locals.get(expr)
-        if dist:
-            self.env.assign_at(dist, expr.identifier, value)
-        else:
-            self.globals.assign(expr.identifier, value)
+        slot = expr.slot
+        if slot is not None:
+            if expr.depth:
+                self.env.upvalues[slot].value = value
+            elif expr.captured:
+                self.env.values[slot].value = value
+            else:
+                self.env.values[slot] = value
+            return value
+        cell = expr.cell
+        if cell is None or cell.table is not self.globals:
+            cell = expr.cell = self.globals.cell(expr.identifier.lexeme)
+        if cell.value is UNDEFINED:
+            raise self._undefined(expr)
+        cell.value = value
         return value
 
     def visit_variable_expression(self, expr: expressions.Variable):
-        return self._lookup_variable(expr.identifier, expr)
+        slot = expr.slot
+        if slot is None:
+            # a global. The cached cell may be another interpreter's, if a
+            # compiled program has been run more than once
+            cell = expr.cell
+            if cell is None or cell.table is not self.globals:
+                cell = expr.cell = self.globals.cell(expr.identifier.lexeme)
+            value = cell.value
+            if value is UNDEFINED:
+                raise self._undefined(expr)
+            return value
+        if expr.depth:
+            return self.env.upvalues[slot].value
+        value = self.env.values[slot]
+        return value.value if expr.captured else value
 
     def visit_expression_statement(self, stmt: statements.ExpressionStatement):
         self._evaluate(stmt.expression)
@@ -83,67 +130,52 @@ class Interpreter:
             value = "nil"
         self.out.send(value)
 
-    def visit_return_statement(self, stmt: statements.Return):
-        value = None
-        if stmt.value is not None:
-            value = self._evaluate(stmt.value)
-        raise ReturnException(value)
-
-    def visit_if(self, stmt: statements.If):
-        if self._is_truthy(self._evaluate(stmt.condition)):
-            self._execute(stmt.thenBranch)
-        elif stmt.elseBranch:
-            self._execute(stmt.elseBranch)
-
-    def visit_while(self, stmt: statements.While):
-        while self._is_truthy(self._evaluate(stmt.condition)):
-            self._execute(stmt.body)
+    def visit_return_statement(self, stmt: statements.Return) -> Completion:
+        if stmt.value is None:
+            return (None,)
+        return (self._evaluate(stmt.value),)
+
+    def visit_if(self, stmt: statements.If) -> Completion:
+        if is_truthy(self._evaluate(stmt.condition)):
+            return self._execute(stmt.thenBranch)
+        if stmt.elseBranch:
+            return self._execute(stmt.elseBranch)
+        return None
+
+    def visit_while(self, stmt: statements.While) -> Completion:
+        while is_truthy(self._evaluate(stmt.condition)):
+            completion = self._execute(stmt.body)
+            if completion is not None:
+                return completion
+        return None
+
+    def visit_for(self, stmt: statements.For) -> Completion:
+        if not stmt.size:
+            return self._run_for(stmt)
+        backup_env = self.env
+        try:
+            self.env = Frame((), stmt.size)
+            return self._run_for(stmt)
+        finally:
+            self.env = backup_env
 
-    def visit_block(self, block: statements.Block):
-        self.execute_block(block.statements, Environment(self.env))
+    def visit_block(self, block: statements.Block) -> Completion:
+        # most blocks keep their locals in the frame of the call they're in
+        if block.size:
+            return self.execute_block(block.statements, Frame((), block.size))
+        for stmt in block.statements:
+            completion = self._execute(stmt)
+            if completion is not None:
+                return completion
+        return None
 
     def visit_binary_expression(self, expr: expressions.Binary):
         left = self._evaluate(expr.left)
         right = self._evaluate(expr.right)
-
-        # arithmetic
-        if expr.operator.type == t.MINUS:
-            self._ensure_number_operands(expr, expr.operator, left, right)
-            return left - right
-        if expr.operator.type == t.SLASH:
-            self._ensure_number_operands(expr, expr.operator, left, right)
-            return left / right
-        if expr.operator.type == t.STAR:
-            self._ensure_number_operands(expr, expr.operator, left, right)
-            return left * right
-        if expr.operator.type == t.PLUS:
-            if isinstance(left, float) and isinstance(right, float):
-                return left + right
-            if isinstance(left, str) and isinstance(right, str):
-                return left + right
-            raise InterpreterException(
-                expr, expr.operator, "invalid operands for binary expression"
-            )
-
-        # comparison
-        if expr.operator.type == t.GREATER:
-            self._ensure_number_operands(expr, expr.operator, left, right)
-            return left > right
-        if expr.operator.type == t.GREATER_EQUAL:
-            self._ensure_number_operands(expr, expr.operator, left, right)
-            return left >= right
-        if expr.operator.type == t.LESS:
-            self._ensure_number_operands(expr, expr.operator, left, right)
-            return left < right
-        if expr.operator.type == t.LESS_EQUAL:
-            self._ensure_number_operands(expr, expr.operator, left, right)
-            return left <= right
-        if expr.operator.type == t.BANG_EQUAL:
-            return not self._is_equal(left, right)
-        if expr.operator.type == t.EQUAL_EQUAL:
-            return self._is_equal(left, right)
-
-        raise Exception("shouldn't get here")
+        try:
+            return expr.operate(left, right)
+        except OperandError as error:
+            raise InterpreterException(expr, expr.operator, error.message) from None
 
     def visit_grouping_expression(self, expr: expressions.Grouping):
         return self._evaluate(expr.expression)
@@ -153,81 +185,79 @@ class Interpreter:
 
     def visit_unary_expression(self, expr: expressions.Unary):
         right = self._evaluate(expr.right)
-
-        if expr.operator.type == t.MINUS:
-            if not isinstance(right, float):
-                raise InterpreterException(
-                    expr, expr.operator, "operand must be a number"
-                )
-            return -right
-        elif expr.operator.type == t.BANG:
-            return not self._is_truthy(right)
-
-        raise Exception("shouldn't get here")
+        try:
+            return expr.operate(right)
+        except OperandError as error:
+            raise InterpreterException(expr, expr.operator, error.message) from None
 
     def visit_logical_expression(self, expr: expressions.Logical):
         left = self._evaluate(expr.left)
-
-        if expr.operator.type == t.OR:
-            if self._is_truthy(left):
-                return left
-        else:
-            if not self._is_truthy(left):
-                return left
-
+        if expr.short_circuits(left):
+            return left
         return self._evaluate(expr.right)
 
     def execute_block(
-        self, stmts: typ.List[statements.Statement], environment: Environment
-    ):
+        self, stmts: typ.List[statements.Statement], environment: Frame
+    ) -> Completion:
         backup_env = self.env
         try:
             self.env = environment
 
             for stmt in stmts:
-                self._execute(stmt)
+                completion = self._execute(stmt)
+                if completion is not None:
+                    return completion
+            return None
         finally:
             self.env = backup_env
 
-    def _execute(self, statement: statements.Statement):
-        statement.accept(self)
-
-    def resolve(self, expr: expressions.Expression, depth: int):
-        self.locals[expr] = depth
-
-    def _lookup_variable(self, name: Token, expr: expressions.Expression):
-        dist = self.locals.get(expr)
-        if dist is not None:
-            return self.env.get_at(dist, name.lexeme)
+    def _execute(self, statement: statements.Statement) -> Completion:
+        return statement.accept(self)
+
+    def _run_for(self, stmt: statements.For) -> Completion:
+        if stmt.initialiser is not None:
+            self._execute(stmt.initialiser)
+
+        if stmt.counted_loop is None:
+            stmt.counted_loop = counted_loop(stmt) or False
+        if stmt.counted_loop:
+            completion = stmt.counted_loop.run(self, stmt.body)
+            if completion is not False:
+                return completion
+
+        while is_truthy(self._evaluate(stmt.condition)):
+            for body_stmt in stmt.body:
+                completion = self._execute(body_stmt)
+                if completion is not None:
+                    return completion
+            if stmt.increment is not None:
+                self._evaluate(stmt.increment)
+        return None
+
+    def resolve(
+        self, expr: expressions.Variable | expressions.Assignment, depth: int, slot: int
+    ):
+        expr.depth = depth
+        expr.slot = slot
+
+    def _undefined(self, expr: expressions.Variable | expressions.Assignment):
+        return InterpreterException(
+            expr, expr.identifier, f"Undefined variable {expr.identifier.lexeme}"
+        )
+
+    def _define(self, name: str, slot: typ.Optional[int], value, captured: bool):
+        if slot is None:
+            self.globals.define(name, value)
+        elif captured:
+            # a new cell each time, so that closures made by different runs of
+            # the declaration, as in a loop, each get their own
+            self.env.values[slot] = Cell(value)
         else:
-            return self.globals.get(name)
+            self.env.values[slot] = value
 
     def _evaluate(self, expression: expressions.Expression):
         return expression.accept(self)
 
-    def _is_truthy(self, object):
-        if object is None:
-            return False
-        if isinstance(object, bool):
-            return object
-        return True
-
-    def _is_equal(self, left, right):
-        if left is None and right is None:
-            return True
-        if left is None:
-            return False
-        if type(left) is not type(right):
-            return False
-        return left == right
-
-    def _ensure_number_operands(
-        self, expr: expressions.Expression, token: Token, left, right
-    ):
-        if isinstance(left, float) and isinstance(right, float):
-            return
-        raise InterpreterException(expr, token, "operands must be numbers")
-
 
 class InterpreterException(Exception):
     def __init__(self, expression: expressions.Expression, token: Token, message: str):
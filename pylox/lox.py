@@ -1,13 +1,25 @@
+import mmap
+import os
 import typing as typ
+from collections.abc import Buffer
 
 from pylox.resolver import Resolver
 
+from .closure_compiler import ClosureInterpreter
 from .scanner import Scanner, ScannerError
-from .parser.parser import Parser, ParserException
+from .regex_scanner import RegexScanner
+from .parser.parser import Parser, ParserErrors, ParserException
 from .interpreter import Interpreter, InterpreterException
+from .ast_cache import AstCache, CompiledProgram
+from .optimiser import Optimiser
+from .parser import expressions
 from .parser.ast_printer import AstPrinter
+from .token import Token
+from .token_buffer import TokenBuffer
 from .token_types import TokenTypes as t
+from .transpiler import PythonInterpreter
 from .io import OutputStream, StdOutputStream
+from .vm import VirtualMachine
 
 
 class Lox:
@@ -16,19 +28,54 @@ class Lox:
         output: typ.Optional[OutputStream] = None,
         debug: bool = False,
         throw: bool = True,
+        scanner: str = "char",
+        scan_workers: int = 1,
+        optimise: bool = True,
+        engine: str = "tree",
     ):
         self.out = output or StdOutputStream()
-        self.interpreter = Interpreter(self.out)
+        self.interpreter = ENGINES[engine](self.out)
         self.resolver = Resolver(self.interpreter)
         self.print_tokens = debug
         self.print_ast = debug
         self.throw = throw
+        self.scanner = SCANNERS[scanner]
+        # processes to scan with. Only used by the regex scanner.
+        self.scan_workers = scan_workers
+        # expressions replaced by the optimiser: the expressions they replaced
+        self.originals: typ.Dict[expressions.Expression, expressions.Expression] = {}
+        self.optimiser = None
+        if optimise:
+            self.optimiser = Optimiser(self.originals)
 
-    def execute(self, input: str):
+    def execute(self, input: str | Buffer):
+        self._report_errors(self._execute, input)
+
+    def execute_compiled(self, program: CompiledProgram):
+        """Run a program from compile(), eg. one loaded from an AstCache"""
+        self._report_errors(self._execute_compiled, program)
+
+    def compile(self, input: str | Buffer, tree_shake: bool = False) -> CompiledProgram:
+        """Scan, parse and resolve input, without running it. Raises the
+        same errors as execute.
+
+        tree_shake removes top level functions that the program never
+        calls. Needs the optimiser to be on.
+        """
+        statements = list(Parser(self._scan(input)).parse())
+        interpreter = Interpreter()
+        Resolver(interpreter)._resolve_all(statements)
+        originals: typ.Dict[expressions.Expression, expressions.Expression] = {}
+        if self.optimiser is not None:
+            optimiser = Optimiser(originals, tree_shake)
+            statements = optimiser.optimise(statements)
+        return CompiledProgram(statements, originals)
+
+    def _report_errors(self, run: typ.Callable[[typ.Any], None], input: typ.Any):
         error_message = None
 
         try:
-            self._execute(input)
+            run(input)
         except ParserException as p:
             error_message = self._parser_exception_to_message(p)
             p.add_note(error_message)
@@ -43,30 +90,76 @@ class Lox:
         if error_message:
             self.out.send(error_message)
 
-    def _execute(self, input: str):
-        tokens = list(Scanner(input).scan_tokens())
+    def _execute(self, input: str | Buffer):
+        # Each top level statement is resolved and run as soon as it has been
+        # parsed, so output starts straight away, and statements that have
+        # run can be freed.
+        parser = Parser(self._scan(input))
+        for statement in parser.parse():
+            if parser.errors:
+                # keep parsing, to report every syntax error, but don't run
+                # anything after one
+                continue
 
-        for t in tokens:
-            if isinstance(t, ScannerError):
-                raise Exception(f'Scanner error: line {t.line}, {t.message}')
+            if self.print_ast:
+                ast = AstPrinter().to_string(statement)
+                self._output(ast)
 
+            self.resolver._resolve(statement)
+            statements = [statement]
+            if self.optimiser is not None:
+                statements = self.optimiser.optimise(statements)
+            self.interpreter.interpret(statements)
+
+    def _execute_compiled(self, program: CompiledProgram):
+        self.originals.update(program.originals)
+        self.interpreter.interpret(program.statements)
+
+    def _scan(
+        self, input: str | Buffer
+    ) -> typ.List[Token] | TokenBuffer | typ.Iterator[Token]:
+        # a memory mapped file, or other buffer, is scanned as bytes
+        source = typ.cast(str | bytes, input)
         if self.print_tokens:
+            tokens = list(self.scanner(source).scan_tokens())
+            self._raise_first_scanner_error(tokens)
             for token in tokens:
                 self._output(token)
+            return tokens
 
-        statements = list(Parser(tokens).parse())
-        for statement in statements:
-            if self.print_ast:
-                ast = AstPrinter().to_string(statement)
-                self._output(ast)
+        # the parser doesn't need trivia tokens, so don't create them
+        if self.scanner is RegexScanner:
+            buffer = RegexScanner(source).scan_buffer(self.scan_workers)
+            self._raise_first_scanner_error(buffer.errors)
+            return buffer
+
+        # scanned as the parser asks for tokens
+        return self._raise_scanner_errors(
+            self.scanner(source).scan_tokens(skip_trivia=True)
+        )
 
-        self.resolver._resolve_all(statements)
-        self.interpreter.interpret(statements)
+    def _raise_first_scanner_error(self, tokens):
+        for token in tokens:
+            if isinstance(token, ScannerError):
+                raise Exception(f"Scanner error: line {token.line}, {token.message}")
+
+    def _raise_scanner_errors(
+        self, tokens: typ.Iterator[Token | ScannerError]
+    ) -> typ.Iterator[Token]:
+        """Passes tokens on, raising the first scanner error when it's reached"""
+        for token in tokens:
+            if isinstance(token, ScannerError):
+                self._raise_first_scanner_error([token])
+            yield token  # type: ignore
 
     def _output(self, data):
         self.out.send(data)
 
     def _parser_exception_to_message(self, exception: ParserException):
+        if isinstance(exception, ParserErrors):
+            return "\n".join(
+                self._parser_exception_to_message(error) for error in exception.errors
+            )
         if exception.token.type == t.EOF:
             position_msg = "at end of file"
         else:
@@ -76,10 +169,29 @@ class Lox:
         return f"{position_msg}: {exception.message}"
 
     def _interpreter_exception_to_message(self, exception: InterpreterException):
-        expression_str = AstPrinter().to_string(exception.expression)
+        # show the expression as written, not as optimised
+        expression = self.originals.get(exception.expression, exception.expression)
+        expression_str = AstPrinter().to_string(expression)
         return f'at expression "{expression_str}": {exception.message}'
 
 
+SCANNERS: typ.Dict[str, typ.Type[Scanner] | typ.Type[RegexScanner]] = {
+    "char": Scanner,
+    "regex": RegexScanner,
+}
+
+# tree: visit the AST of each statement as it runs. closure: compile each
+# statement into Python closures, then run those. vm: compile each statement
+# to bytecode, then run that on a stack machine. python: transpile each
+# statement into Python source, then compile and run that.
+ENGINES: typ.Dict[str, typ.Type[Interpreter]] = {
+    "tree": Interpreter,
+    "closure": ClosureInterpreter,
+    "vm": VirtualMachine,
+    "python": PythonInterpreter,
+}
+
+
 class LoxRepl:
     def __init__(self, lox: Lox):
         self.lox = lox
@@ -91,10 +203,56 @@ class LoxRepl:
 
 
 class LoxFileRunner:
-    def __init__(self, lox: Lox):
+    """memory_map: map the file into memory and scan its bytes directly,
+    rather than reading it into a string. Keeps memory use down for very
+    large files. Best used with the regex scanner, which scans bytes without
+    decoding them up front.
+
+    cache: load the compiled program from this cache when the file hasn't
+    changed, and store it there when it has.
+    """
+
+    def __init__(
+        self,
+        lox: Lox,
+        memory_map: bool = False,
+        cache: typ.Optional[AstCache] = None,
+    ):
         self.lox = lox
+        self.memory_map = memory_map
+        self.cache = cache
 
     def run(self, path: str):
+        if self.cache is not None:
+            self._run_cached(path, self.cache)
+            return
+        if self.memory_map:
+            self._run_mapped(path)
+            return
         with open(path) as infile:
             contents = infile.read()
             self.lox.execute(contents)
+
+    def _run_mapped(self, path: str):
+        with open(path, "rb") as infile:
+            if os.fstat(infile.fileno()).st_size == 0:
+                # empty files can't be mapped
+                self.lox.execute(b"")
+                return
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                self.lox.execute(mapped)
+
+    def _run_cached(self, path: str, cache: AstCache):
+        with open(path, "rb") as infile:
+            source = infile.read()
+        optimised = self.lox.optimiser is not None
+        program = cache.load(path, source, optimised)
+        if program is None:
+            try:
+                program = self.lox.compile(source)
+            except Exception:
+                # run it as usual, to report the errors
+                self.lox.execute(source)
+                return
+            cache.store(path, source, optimised, program)
+        self.lox.execute_compiled(program)
@@ -1,25 +1,42 @@
+import typing as typ
+
 from pylox.callable import Callable
-from pylox.environment import Environment
+from pylox.environment import Cell, Frame
 from pylox.parser import statements
-from pylox.return_exception import ReturnException
 
 
 class LoxFunction(Callable):
     def __init__(
-        self, declaration: statements.FunctionDeclaration, closure: Environment
+        self,
+        declaration: statements.FunctionDeclaration,
+        upvalues: typ.List[Cell],
     ):
         self._declaration = declaration
-        self._closure = closure
+        # the cells of the variables it uses from the functions it's in
+        self._upvalues = upvalues
+        # Frames of finished calls, to reuse. Closures made during a call
+        # keep the cells they need, not its frame.
+        self._free_frames: typ.List[Frame] = []
+        self._cleared = (None,) * declaration.size
 
     def call(self, interpreter, args):
-        env = Environment(self._closure)
-        for i, p in enumerate(self._declaration.params):
-            env.define(p.lexeme, args[i])
+        declaration = self._declaration
+        if self._free_frames:
+            env = self._free_frames.pop()
+        else:
+            env = Frame(self._upvalues, declaration.size)
+        values = env.values
+        # the params are the first slots
+        values[: len(args)] = args
+        for slot in declaration.captured_params:
+            values[slot] = Cell(values[slot])
         try:
-            interpreter.execute_block(self._declaration.body, env)
-        except ReturnException as r:
-            return r.value
-        return None
+            completion = interpreter.execute_block(declaration.body, env)
+        finally:
+            # so a free frame doesn't keep the call's values alive
+            values[:] = self._cleared
+            self._free_frames.append(env)
+        return None if completion is None else completion[0]
 
     def arity(self):
         return len(self._declaration.params)
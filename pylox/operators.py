@@ -0,0 +1,142 @@
+"""What Lox's operators do, as tables of functions keyed by token type.
+
+Binary, Unary and Logical nodes look their operator's function up once,
+when they're made, so that evaluating one is a single call, rather than a
+comparison of its operator against each of the others in turn.
+
+The checked functions raise OperandError for operands their operator
+doesn't take, which the Interpreter raises as an InterpreterException for
+the node.
+"""
+
+import operator
+import typing as typ
+
+from .token_types import TokenTypes as t
+
+BinaryOperator = typ.Callable[[typ.Any, typ.Any], typ.Any]
+UnaryOperator = typ.Callable[[typ.Any], typ.Any]
+
+
+class OperandError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+def is_truthy(value) -> bool:
+    return value is not None and value is not False
+
+
+def is_falsey(value) -> bool:
+    return value is None or value is False
+
+
+def subtract(left, right):
+    if type(left) is float and type(right) is float:
+        return left - right
+    raise OperandError("operands must be numbers")
+
+
+def divide(left, right):
+    if type(left) is float and type(right) is float:
+        return left / right
+    raise OperandError("operands must be numbers")
+
+
+def multiply(left, right):
+    if type(left) is float and type(right) is float:
+        return left * right
+    raise OperandError("operands must be numbers")
+
+
+def add(left, right):
+    if type(left) is type(right) and (type(left) is float or type(left) is str):
+        return left + right
+    raise OperandError("invalid operands for binary expression")
+
+
+def greater(left, right):
+    if type(left) is float and type(right) is float:
+        return left > right
+    raise OperandError("operands must be numbers")
+
+
+def greater_equal(left, right):
+    if type(left) is float and type(right) is float:
+        return left >= right
+    raise OperandError("operands must be numbers")
+
+
+def less(left, right):
+    if type(left) is float and type(right) is float:
+        return left < right
+    raise OperandError("operands must be numbers")
+
+
+def less_equal(left, right):
+    if type(left) is float and type(right) is float:
+        return left <= right
+    raise OperandError("operands must be numbers")
+
+
+def equal(left, right) -> bool:
+    # nil is only equal to nil, and values of different types differ
+    return type(left) is type(right) and left == right
+
+
+def not_equal(left, right) -> bool:
+    return type(left) is not type(right) or left != right
+
+
+def negate(right):
+    if type(right) is float:
+        return -right
+    raise OperandError("operand must be a number")
+
+
+BINARY_OPERATORS: typ.Dict[t, BinaryOperator] = {
+    t.MINUS: subtract,
+    t.SLASH: divide,
+    t.STAR: multiply,
+    t.PLUS: add,
+    t.GREATER: greater,
+    t.GREATER_EQUAL: greater_equal,
+    t.LESS: less,
+    t.LESS_EQUAL: less_equal,
+    t.EQUAL_EQUAL: equal,
+    t.BANG_EQUAL: not_equal,
+}
+
+# What each binary operator does to operands of the types it's valid for,
+# with no checks. For expressions whose operand_type the TypeInferrer has
+# found.
+UNCHECKED_OPERATORS: typ.Dict[t, BinaryOperator] = {
+    t.MINUS: operator.sub,
+    t.SLASH: operator.truediv,
+    t.STAR: operator.mul,
+    t.PLUS: operator.add,
+    t.GREATER: operator.gt,
+    t.GREATER_EQUAL: operator.ge,
+    t.LESS: operator.lt,
+    t.LESS_EQUAL: operator.le,
+    t.EQUAL_EQUAL: operator.eq,
+    t.BANG_EQUAL: operator.ne,
+}
+
+UNARY_OPERATORS: typ.Dict[t, UnaryOperator] = {
+    t.MINUS: negate,
+    t.BANG: is_falsey,
+}
+
+UNCHECKED_UNARY_OPERATORS: typ.Dict[t, UnaryOperator] = {
+    t.MINUS: operator.neg,
+    t.BANG: is_falsey,
+}
+
+# For each logical operator, whether its left operand's value is its
+# result, without the right operand being evaluated
+SHORT_CIRCUITS: typ.Dict[t, UnaryOperator] = {
+    t.OR: is_truthy,
+    t.AND: is_falsey,
+}
@@ -0,0 +1,62 @@
+import typing as typ
+
+from ..parser import expressions, statements
+from .common_subexpressions import CommonSubexpressionEliminator
+from .constant_folding import ConstantFolder
+from .dead_code import DeadCodeEliminator, shake_tree
+from .transformer import AstTransformer
+from .type_inference import TypeInferrer
+
+__all__ = [
+    "AstTransformer",
+    "CommonSubexpressionEliminator",
+    "ConstantFolder",
+    "DeadCodeEliminator",
+    "Optimiser",
+    "shake_tree",
+    "TypeInferrer",
+]
+
+
+class Optimiser:
+    """Runs optimisation passes over statements after they've been resolved,
+    and before they are interpreted.
+
+    originals maps each expression that a pass put in place of another, to
+    the expression as it was parsed. Use original() to show an expression
+    in an error message.
+
+    tree_shake also removes top level functions that nothing calls. Only
+    use it when optimise() is given the whole program at once.
+
+    The types that can be inferred are then marked on the optimised
+    statements, for the Interpreter to skip checking operands.
+    """
+
+    def __init__(
+        self,
+        originals: typ.Optional[
+            typ.Dict[expressions.Expression, expressions.Expression]
+        ] = None,
+        tree_shake: bool = False,
+    ):
+        self.originals = {} if originals is None else originals
+        self.tree_shake = tree_shake
+        self.passes: typ.List[AstTransformer] = [
+            ConstantFolder(self.originals),
+            DeadCodeEliminator(self.originals),
+            CommonSubexpressionEliminator(self.originals),
+        ]
+
+    def optimise(
+        self, stmts: typ.List[statements.Statement]
+    ) -> typ.List[statements.Statement]:
+        for optimisation in self.passes:
+            stmts = optimisation.transform_all(stmts)
+        if self.tree_shake:
+            stmts = shake_tree(stmts)
+        TypeInferrer().infer_all(stmts)
+        return stmts
+
+    def original(self, expr: expressions.Expression) -> expressions.Expression:
+        return self.originals.get(expr, expr)
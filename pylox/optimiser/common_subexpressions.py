@@ -0,0 +1,308 @@
+import contextlib
+import typing as typ
+
+from ..parser import expressions, statements
+from ..token import Token
+from ..token_types import TokenTypes as t
+from .transformer import AstTransformer
+
+# Identifies what a pure expression computes: two expressions with the same
+# key, evaluated with no change to their variables in between, have the
+# same value. See expression_key.
+Key = typ.Tuple[typ.Any, ...]
+
+# the expressions that are stored, when repeated
+Stored = expressions.Unary | expressions.Binary
+
+
+class CommonSubexpressionEliminator(AstTransformer):
+    """Evaluates pure expressions that are repeated within a block only once,
+    into a temporary local. Eg.
+
+        {                               {
+            var x = a * b + c;              var $0;
+            var y = a * b + c;    becomes   var x = $0 = a * b + c;
+            print x * y;                    var y = $0;
+        }                                   print x * y;
+                                        }
+
+    Only unary and binary expressions are stored. Their operands may be
+    literals, variables, and other unary and binary expressions. None of
+    these have side effects, so the first evaluation is the one that raises
+    any error, at the same point as before.
+
+    Within a block, assigning to or declaring a variable forgets the stored
+    expressions that use it. Calls, and statements that run other statements
+    (if, while, for and blocks), forget everything. Variables are told apart by
+    the depth and slot the Resolver gave them as well as their name.
+
+    Temporaries are block locals, so top level statements are left as they
+    are. Each gets a slot after those the Resolver gave out, in the frame
+    that the block's locals are in.
+    """
+
+    def __init__(
+        self, originals: typ.Dict[expressions.Expression, expressions.Expression]
+    ):
+        super().__init__(originals)
+        self.temporaries = 0
+        # the temporary each first use is stored in, and each reuse reads
+        self.first_uses: typ.Dict[expressions.Expression, Temporary] = {}
+        self.reuses: typ.Dict[expressions.Expression, Temporary] = {}
+        # the nodes with frames that the current statements are in
+        self.frames: typ.List[Scoped] = []
+
+    def visit_block(self, stmt: statements.Block):
+        with self.scope(stmt):
+            stmt.statements = self.eliminate(stmt.statements)
+        return stmt
+
+    def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
+        with self.scope(stmt):
+            stmt.body = self.eliminate(stmt.body)
+        return stmt
+
+    def visit_for(self, stmt: statements.For):
+        with self.scope(stmt):
+            return super().visit_for(stmt)
+
+    def visit_unary_expression(self, expr: expressions.Unary):
+        if expr in self.reuses:
+            return self.reuse(expr)
+        return self.first_use(expr, super().visit_unary_expression(expr))
+
+    def visit_binary_expression(self, expr: expressions.Binary):
+        if expr in self.reuses:
+            return self.reuse(expr)
+        return self.first_use(expr, super().visit_binary_expression(expr))
+
+    @contextlib.contextmanager
+    def scope(self, node: "Scoped"):
+        """Transforms in the scope of node. As in the Resolver, functions
+        have frames, as do blocks and loops that aren't in a function or
+        another block.
+        """
+        has_frame = isinstance(node, statements.FunctionDeclaration) or not self.frames
+        if has_frame:
+            self.frames.append(node)
+        try:
+            yield
+        finally:
+            if has_frame:
+                self.frames.pop()
+
+    def eliminate(
+        self, stmts: typ.List[statements.Statement]
+    ) -> typ.List[statements.Statement]:
+        """Eliminates repeats in stmts, the statements of a block or function"""
+        declarations: typ.List[statements.Statement] = []
+        for occurrences in RepeatedExpressions().find(stmts):
+            temporary = self.temporary(occurrences[0])
+            declaration = statements.VariableDeclaration(temporary.name, None)
+            declaration.slot = temporary.slot
+            declarations.append(declaration)
+            self.first_uses[occurrences[0]] = temporary
+            for occurrence in occurrences[1:]:
+                self.reuses[occurrence] = temporary
+        return declarations + self.transform_all(stmts)
+
+    def temporary(self, expr: Stored) -> "Temporary":
+        # not a valid identifier, so can't clash with the program's names
+        name = Token(t.IDENTIFIER, f"${self.temporaries}", None, expr.operator.line)
+        self.temporaries += 1
+        frame = self.frames[-1]
+        frame.size += 1
+        return Temporary(name, frame.size - 1)
+
+    def first_use(
+        self, expr: expressions.Expression, transformed: expressions.Expression
+    ) -> expressions.Expression:
+        temporary = self.first_uses.pop(expr, None)
+        if temporary is None:
+            return transformed
+        assignment = expressions.Assignment(temporary.name, transformed)
+        assignment.depth, assignment.slot = 0, temporary.slot
+        return assignment
+
+    def reuse(self, expr: expressions.Expression) -> expressions.Expression:
+        temporary = self.reuses.pop(expr)
+        variable = expressions.Variable(temporary.name)
+        variable.depth, variable.slot = 0, temporary.slot
+        return variable
+
+
+Scoped = statements.Block | statements.For | statements.FunctionDeclaration
+
+
+class Temporary(typ.NamedTuple):
+    name: Token
+    slot: int
+
+
+class RepeatedExpressions:
+    """Finds the pure expressions that a list of statements evaluates more than
+    once, with nothing in between that could change their values. Doesn't
+    look inside statements that run other statements.
+
+    Only the outermost repeat is counted: in (a * b + c) + (a * b + c), the
+    second a * b is part of a repeat of a * b + c, so isn't a repeat itself.
+    """
+
+    def __init__(self):
+        self.keys: typ.Dict[expressions.Expression, typ.Optional[Key]] = {}
+        # expressions whose values are known, by key, to their occurrences
+        self.available: typ.Dict[Key, typ.List[Stored]] = {}
+        self.found: typ.List[typ.List[Stored]] = []
+
+    def find(self, stmts: typ.List[statements.Statement]) -> typ.List[typ.List[Stored]]:
+        """Returns lists of occurrences of the same expression, first one
+        first.
+        """
+        for stmt in stmts:
+            stmt.accept(self)
+        return [occurrences for occurrences in self.found if len(occurrences) > 1]
+
+    def key(self, expr: expressions.Expression) -> typ.Optional[Key]:
+        if expr not in self.keys:
+            self.keys[expr] = expression_key(expr, self.key)
+        return self.keys[expr]
+
+    def occurrence(self, expr: Stored) -> bool:
+        """Record expr if it's pure. Returns whether its operands still need
+        visiting.
+        """
+        key = self.key(expr)
+        if key is None:
+            return True
+        if key in self.available:
+            self.available[key].append(expr)
+            return False
+        occurrences = [expr]
+        self.available[key] = occurrences
+        self.found.append(occurrences)
+        return True
+
+    def forget(self, name: str):
+        self.available = {
+            key: occurrences
+            for key, occurrences in self.available.items()
+            if name not in variable_names(key)
+        }
+
+    def forget_all(self):
+        self.available = {}
+
+    # expressions
+
+    def visit_binary_expression(self, expr: expressions.Binary):
+        if self.occurrence(expr):
+            expr.left.accept(self)
+            expr.right.accept(self)
+
+    def visit_unary_expression(self, expr: expressions.Unary):
+        if self.occurrence(expr):
+            expr.right.accept(self)
+
+    def visit_grouping_expression(self, expr: expressions.Grouping):
+        expr.expression.accept(self)
+
+    def visit_logical_expression(self, expr: expressions.Logical):
+        expr.left.accept(self)
+        # The right operand may not be evaluated, so what it stores can't be
+        # used after it. What it forgets must be forgotten.
+        before = dict(self.available)
+        expr.right.accept(self)
+        self.available = {
+            key: occurrences
+            for key, occurrences in before.items()
+            if self.available.get(key) is occurrences
+        }
+
+    def visit_assignment_expression(self, expr: expressions.Assignment):
+        expr.expression.accept(self)
+        self.forget(expr.identifier.lexeme)
+
+    def visit_call(self, expr: expressions.Call):
+        expr.callee.accept(self)
+        for arg in expr.args:
+            arg.accept(self)
+        # the function may assign to any variable it can see
+        self.forget_all()
+
+    def visit_literal_expression(self, expr: expressions.Literal):
+        pass
+
+    def visit_variable_expression(self, expr: expressions.Variable):
+        pass
+
+    # statements
+
+    def visit_expression_statement(self, stmt: statements.ExpressionStatement):
+        stmt.expression.accept(self)
+
+    def visit_print_statement(self, stmt: statements.Print):
+        stmt.expression.accept(self)
+
+    def visit_return_statement(self, stmt: statements.Return):
+        if stmt.value is not None:
+            stmt.value.accept(self)
+
+    def visit_variable_declaration(self, stmt: statements.VariableDeclaration):
+        if stmt.initialiser is not None:
+            stmt.initialiser.accept(self)
+        self.forget(stmt.identifier.lexeme)
+
+    def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
+        self.forget(stmt.name.lexeme)
+
+    def visit_block(self, stmt: statements.Block):
+        self.forget_all()
+
+    def visit_if(self, stmt: statements.If):
+        stmt.condition.accept(self)
+        self.forget_all()
+
+    def visit_while(self, stmt: statements.While):
+        self.forget_all()
+
+    def visit_for(self, stmt: statements.For):
+        self.forget_all()
+
+
+def expression_key(
+    expr: expressions.Expression,
+    key: typ.Callable[[expressions.Expression], typ.Optional[Key]],
+) -> typ.Optional[Key]:
+    """The key of a pure expression, or None if expr isn't pure. key gives
+    the keys of sub-expressions.
+    """
+    if isinstance(expr, expressions.Literal):
+        if type(expr.value) is float:
+            # 0.0 == -0.0, but they aren't the same value to Lox
+            return ("literal", float, expr.value.hex())
+        return ("literal", type(expr.value), expr.value)
+    if isinstance(expr, expressions.Variable):
+        return ("variable", expr.identifier.lexeme, expr.depth, expr.slot)
+    if isinstance(expr, expressions.Grouping):
+        return key(expr.expression)
+    if isinstance(expr, expressions.Unary):
+        right = key(expr.right)
+        return None if right is None else (expr.operator.type, right)
+    if isinstance(expr, expressions.Binary):
+        left = key(expr.left)
+        right = key(expr.right)
+        if left is None or right is None:
+            return None
+        return (expr.operator.type, left, right)
+    return None
+
+
+def variable_names(key: Key) -> typ.Set[str]:
+    if key[0] == "literal":
+        return set()
+    if key[0] == "variable":
+        return {key[1]}
+    names = set()
+    for operand in key[1:]:
+        names |= variable_names(operand)
+    return names
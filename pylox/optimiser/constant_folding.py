@@ -0,0 +1,102 @@
+import operator
+import typing as typ
+
+from ..operators import equal, is_truthy
+from ..parser import expressions
+from ..token_types import TokenTypes as t
+from .transformer import AstTransformer
+from .type_inference import is_boolean
+
+
+class ConstantFolder(AstTransformer):
+    """Evaluates expressions whose operands are all literals, once, ahead
+    of time, and replaces them with the resulting literal. Eg.
+
+        (1 + 4/2) * 3*2 - 10    becomes    8
+
+    Anything that would raise an error at runtime is left as it is, so
+    that the error is still raised when (and if) it is run. Eg. "a" - 1,
+    -"a" and 1 / 0.
+
+    Also applies a few identities that are always safe, and drops grouping
+    parens, which only matter to the parser.
+    """
+
+    def visit_grouping_expression(self, expr: expressions.Grouping):
+        return self.transform(expr.expression)
+
+    def visit_unary_expression(self, expr: expressions.Unary):
+        expr = super().visit_unary_expression(expr)
+        right = expr.right
+        if isinstance(right, expressions.Literal):
+            value = fold_unary(expr.operator.type, right.value)
+            if value is not NOT_FOLDED:
+                return self.replaced(expr, expressions.Literal(value))
+        # !!x is x, when x is already true or false
+        if (
+            expr.operator.type == t.BANG
+            and isinstance(right, expressions.Unary)
+            and right.operator.type == t.BANG
+            and is_boolean(right.right)
+        ):
+            return right.right
+        return expr
+
+    def visit_binary_expression(self, expr: expressions.Binary):
+        expr = super().visit_binary_expression(expr)
+        left, right = expr.left, expr.right
+        if isinstance(left, expressions.Literal) and isinstance(
+            right, expressions.Literal
+        ):
+            value = fold_binary(expr.operator.type, left.value, right.value)
+            if value is not NOT_FOLDED:
+                return self.replaced(expr, expressions.Literal(value))
+        return expr
+
+    def visit_logical_expression(self, expr: expressions.Logical):
+        expr = super().visit_logical_expression(expr)
+        left = expr.left
+        if not isinstance(left, expressions.Literal):
+            return expr
+        # The left operand decides whether the right is the result. Either
+        # way, the result is an operand as it is, not converted to a bool.
+        if is_truthy(left.value) == (expr.operator.type == t.OR):
+            return left
+        return expr.right
+
+
+# returned by the fold functions for operations that would raise an error
+NOT_FOLDED: typ.Any = object()
+
+NUMBER_OPERATORS: typ.Dict[t, typ.Callable[[float, float], typ.Any]] = {
+    t.MINUS: operator.sub,
+    t.SLASH: operator.truediv,
+    t.STAR: operator.mul,
+    t.PLUS: operator.add,
+    t.GREATER: operator.gt,
+    t.GREATER_EQUAL: operator.ge,
+    t.LESS: operator.lt,
+    t.LESS_EQUAL: operator.le,
+}
+
+
+def fold_binary(type: t, left, right):
+    if type == t.EQUAL_EQUAL:
+        return equal(left, right)
+    if type == t.BANG_EQUAL:
+        return not equal(left, right)
+    if type == t.PLUS and isinstance(left, str) and isinstance(right, str):
+        return left + right
+    if not (isinstance(left, float) and isinstance(right, float)):
+        return NOT_FOLDED
+    if type == t.SLASH and right == 0:
+        return NOT_FOLDED
+    return NUMBER_OPERATORS[type](left, right)
+
+
+def fold_unary(type: t, right):
+    if type == t.BANG:
+        return not is_truthy(right)
+    if isinstance(right, float):
+        return -right
+    return NOT_FOLDED
@@ -0,0 +1,136 @@
+import typing as typ
+
+from ..operators import is_truthy
+from ..parser import expressions, statements
+from .transformer import AstTransformer
+
+
+class DeadCodeEliminator(AstTransformer):
+    """Removes statements that can never run, or that do nothing:
+
+    - branches of ifs whose condition is a literal, eg. after constant
+      folding. The branch that is taken replaces the if.
+    - while and for loops whose condition is a literal false
+    - statements after a return, in the same block or function body
+    - empty blocks
+
+    Runs after ConstantFolder, which turns conditions like 1 > 2 into
+    literals.
+    """
+
+    def transform_all(
+        self, stmts: typ.List[statements.Statement]
+    ) -> typ.List[statements.Statement]:
+        transformed = super().transform_all(stmts)
+        for idx, stmt in enumerate(transformed):
+            if isinstance(stmt, statements.Return):
+                return transformed[: idx + 1]
+        return transformed
+
+    def visit_block(self, stmt: statements.Block):
+        stmt = super().visit_block(stmt)
+        if not stmt.statements:
+            return None
+        return stmt
+
+    def visit_if(self, stmt: statements.If):
+        stmt.condition = self.transform(stmt.condition)
+        if isinstance(stmt.condition, expressions.Literal):
+            if is_truthy(stmt.condition.value):
+                return self.transform(stmt.thenBranch)
+            return self.transform(stmt.elseBranch)
+
+        stmt.thenBranch = self.transform(stmt.thenBranch)
+        stmt.elseBranch = self.transform(stmt.elseBranch)
+        if stmt.thenBranch is None and stmt.elseBranch is None:
+            # still evaluated, for its side effects and errors
+            return statements.ExpressionStatement(stmt.condition)
+        if stmt.thenBranch is None:
+            stmt.thenBranch = statements.Block([])
+        return stmt
+
+    def visit_while(self, stmt: statements.While):
+        stmt.condition = self.transform(stmt.condition)
+        if isinstance(stmt.condition, expressions.Literal) and not is_truthy(
+            stmt.condition.value
+        ):
+            return None
+
+        stmt.body = self.transform(stmt.body)
+        if stmt.body is None:
+            stmt.body = statements.Block([])
+        return stmt
+
+    def visit_for(self, stmt: statements.For):
+        stmt.condition = self.transform(stmt.condition)
+        if isinstance(stmt.condition, expressions.Literal) and not is_truthy(
+            stmt.condition.value
+        ):
+            # the initialiser still runs, in the loop's scope
+            if stmt.initialiser is None:
+                return None
+            block = statements.Block([stmt.initialiser])
+            # the initialiser's slot is in the loop's frame, if it has one
+            block.size = stmt.size
+            return self.transform(block)
+        return super().visit_for(stmt)
+
+
+def shake_tree(stmts: typ.List[statements.Statement]) -> typ.List[statements.Statement]:
+    """Removes top level function declarations that nothing refers to.
+    Only makes sense for a whole program: a function declared in one
+    statement may be called by any statement after it.
+
+    The other top level statements are the roots. A function is kept if
+    a root refers to its name, or a function that is kept does. Names are
+    compared as strings, so a local with the same name keeps a function
+    alive; that only means the result is less small.
+    """
+    functions: typ.Dict[str, typ.List[statements.FunctionDeclaration]] = {}
+    roots = []
+    for stmt in stmts:
+        if isinstance(stmt, statements.FunctionDeclaration):
+            functions.setdefault(stmt.name.lexeme, []).append(stmt)
+        else:
+            roots.append(stmt)
+
+    todo = GlobalNames().find(roots)
+    used: typ.Set[str] = set()
+    while todo:
+        name = todo.pop()
+        if name in used:
+            continue
+        used.add(name)
+        for function in functions.get(name, []):
+            todo.extend(GlobalNames().find(function.body))
+
+    return [
+        stmt
+        for stmt in stmts
+        if not isinstance(stmt, statements.FunctionDeclaration)
+        or stmt.name.lexeme in used
+    ]
+
+
+class GlobalNames(AstTransformer):
+    """Finds the names of global variables that statements use. Changes
+    nothing.
+    """
+
+    def __init__(self):
+        super().__init__({})
+        self.names: typ.List[str] = []
+
+    def find(self, stmts: typ.List[statements.Statement]) -> typ.List[str]:
+        self.transform_all(stmts)
+        return self.names
+
+    def visit_variable_expression(self, expr: expressions.Variable):
+        if expr.depth is None:
+            self.names.append(expr.identifier.lexeme)
+        return expr
+
+    def visit_assignment_expression(self, expr: expressions.Assignment):
+        if expr.depth is None:
+            self.names.append(expr.identifier.lexeme)
+        return super().visit_assignment_expression(expr)
@@ -0,0 +1,141 @@
+import typing as typ
+
+from ..parser import expressions, statements
+
+
+class AstTransformer:
+    """Base for optimisation passes that rewrite the AST. Each visit method
+    returns what should take the place of the node it visited. By default
+    children are transformed, and nothing else changes.
+
+    Expressions are never changed in place. An expression whose children
+    changed is rebuilt, and replaced() records the expression it replaces in
+    originals, so that runtime errors can show the expression as it was
+    written. Statements aren't shown in errors, so they are updated in
+    place. A statement visit may return None, to remove the statement.
+
+    Passes run after the Resolver. Rebuilt assignment expressions take over
+    the depth and slot it gave them.
+    """
+
+    def __init__(
+        self, originals: typ.Dict[expressions.Expression, expressions.Expression]
+    ):
+        self.originals = originals
+
+    def transform_all(
+        self, stmts: typ.List[statements.Statement]
+    ) -> typ.List[statements.Statement]:
+        transformed = []
+        for stmt in stmts:
+            new = stmt.accept(self)
+            if new is not None:
+                transformed.append(new)
+        return transformed
+
+    def transform(self, node):
+        if node is None:
+            return None
+        return node.accept(self)
+
+    def replaced(
+        self, old: expressions.Expression, new: expressions.Expression
+    ) -> expressions.Expression:
+        """Record that new takes the place of old, and return new"""
+        self.originals[new] = self.originals.pop(old, old)
+        if isinstance(old, expressions.Assignment) and isinstance(
+            new, expressions.Assignment
+        ):
+            new.depth, new.slot, new.captured = old.depth, old.slot, old.captured
+        return new
+
+    # expressions
+
+    def visit_binary_expression(self, expr: expressions.Binary):
+        left = self.transform(expr.left)
+        right = self.transform(expr.right)
+        if left is expr.left and right is expr.right:
+            return expr
+        return self.replaced(expr, expressions.Binary(left, expr.operator, right))
+
+    def visit_logical_expression(self, expr: expressions.Logical):
+        left = self.transform(expr.left)
+        right = self.transform(expr.right)
+        if left is expr.left and right is expr.right:
+            return expr
+        return self.replaced(expr, expressions.Logical(left, expr.operator, right))
+
+    def visit_unary_expression(self, expr: expressions.Unary):
+        right = self.transform(expr.right)
+        if right is expr.right:
+            return expr
+        return self.replaced(expr, expressions.Unary(expr.operator, right))
+
+    def visit_grouping_expression(self, expr: expressions.Grouping):
+        inner = self.transform(expr.expression)
+        if inner is expr.expression:
+            return expr
+        return self.replaced(expr, expressions.Grouping(inner))
+
+    def visit_assignment_expression(self, expr: expressions.Assignment):
+        value = self.transform(expr.expression)
+        if value is expr.expression:
+            return expr
+        return self.replaced(expr, expressions.Assignment(expr.identifier, value))
+
+    def visit_call(self, expr: expressions.Call):
+        callee = self.transform(expr.callee)
+        args = [self.transform(arg) for arg in expr.args]
+        if callee is expr.callee and all(a is b for a, b in zip(args, expr.args)):
+            return expr
+        return self.replaced(expr, expressions.Call(callee, expr.closing_paren, args))
+
+    def visit_literal_expression(self, expr: expressions.Literal):
+        return expr
+
+    def visit_variable_expression(self, expr: expressions.Variable):
+        return expr
+
+    # statements
+
+    def visit_expression_statement(self, stmt: statements.ExpressionStatement):
+        stmt.expression = self.transform(stmt.expression)
+        return stmt
+
+    def visit_print_statement(self, stmt: statements.Print):
+        stmt.expression = self.transform(stmt.expression)
+        return stmt
+
+    def visit_return_statement(self, stmt: statements.Return):
+        stmt.value = self.transform(stmt.value)
+        return stmt
+
+    def visit_variable_declaration(self, stmt: statements.VariableDeclaration):
+        stmt.initialiser = self.transform(stmt.initialiser)
+        return stmt
+
+    def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
+        stmt.body = self.transform_all(stmt.body)
+        return stmt
+
+    def visit_block(self, stmt: statements.Block):
+        stmt.statements = self.transform_all(stmt.statements)
+        return stmt
+
+    def visit_if(self, stmt: statements.If):
+        stmt.condition = self.transform(stmt.condition)
+        stmt.thenBranch = self.transform(stmt.thenBranch)
+        stmt.elseBranch = self.transform(stmt.elseBranch)
+        return stmt
+
+    def visit_while(self, stmt: statements.While):
+        stmt.condition = self.transform(stmt.condition)
+        stmt.body = self.transform(stmt.body)
+        return stmt
+
+    def visit_for(self, stmt: statements.For):
+        stmt.initialiser = self.transform(stmt.initialiser)
+        stmt.condition = self.transform(stmt.condition)
+        stmt.increment = self.transform(stmt.increment)
+        stmt.body = self.transform_all(stmt.body)
+        return stmt
@@ -0,0 +1,238 @@
+import typing as typ
+
+from ..operators import (
+    BINARY_OPERATORS,
+    UNARY_OPERATORS,
+    UNCHECKED_OPERATORS,
+    UNCHECKED_UNARY_OPERATORS,
+)
+from ..parser import expressions, statements
+from ..token_types import TokenTypes as t
+
+# A value's type is its Python type: float, str, bool or NoneType. None is
+# for a type that isn't known.
+Type = typ.Optional[type]
+
+# The locals whose types are known, by slot, at a point in a frame
+Types = typ.Dict[int, type]
+
+NIL = type(None)
+
+STRING_OPERATORS = {t.PLUS, t.EQUAL_EQUAL, t.BANG_EQUAL}
+
+COMPARISONS = {
+    t.GREATER,
+    t.GREATER_EQUAL,
+    t.LESS,
+    t.LESS_EQUAL,
+    t.EQUAL_EQUAL,
+    t.BANG_EQUAL,
+}
+
+
+class TypeInferrer:
+    """Works out the types of expressions where it can, and sets the
+    operand_type of each unary and binary expression whose operands are
+    certain to be valid for it: two numbers, two strings for + == and !=, or
+    a number for unary -, and their operate to the function that doesn't
+    check the operands. Changes nothing else.
+
+    Types are known from literals, and from the results of operators, which
+    either have the type they promise or raise an error. The types of
+    locals are followed through the statements of each frame, by their
+    slots: a local has the type of the last value stored in it, on every
+    path to the point where it's read. Globals and captured locals are never
+    known, as any call could change them.
+    """
+
+    def __init__(self):
+        self.types: Types = {}
+
+    def infer_all(self, stmts: typ.List[statements.Statement]):
+        for stmt in stmts:
+            # a top level statement's locals are in a frame of its own
+            self.types = {}
+            self.execute(stmt)
+
+    def execute(self, stmt: typ.Optional[statements.Statement]):
+        if stmt is not None:
+            stmt.accept(self)
+
+    def execute_all(self, stmts: typ.List[statements.Statement]):
+        for stmt in stmts:
+            stmt.accept(self)
+
+    def infer(self, expr: typ.Optional[expressions.Expression]) -> Type:
+        if expr is None:
+            return None
+        return expr.accept(self)
+
+    # statements
+
+    def visit_expression_statement(self, stmt: statements.ExpressionStatement):
+        self.infer(stmt.expression)
+
+    def visit_print_statement(self, stmt: statements.Print):
+        self.infer(stmt.expression)
+
+    def visit_return_statement(self, stmt: statements.Return):
+        self.infer(stmt.value)
+
+    def visit_variable_declaration(self, stmt: statements.VariableDeclaration):
+        value = self.infer(stmt.initialiser) if stmt.initialiser else NIL
+        if stmt.slot is not None and not stmt.captured:
+            self.store(stmt.slot, value)
+
+    def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
+        # the body runs in a frame of its own, with params of any type
+        outer = self.types
+        self.types = {}
+        self.execute_all(stmt.body)
+        self.types = outer
+
+    def visit_block(self, stmt: statements.Block):
+        self.execute_all(stmt.statements)
+
+    def visit_if(self, stmt: statements.If):
+        self.infer(stmt.condition)
+        before = dict(self.types)
+        self.execute(stmt.thenBranch)
+        after_then = self.types
+        self.types = before
+        self.execute(stmt.elseBranch)
+        self.types = join(after_then, self.types)
+
+    def visit_while(self, stmt: statements.While):
+        self.loop(stmt.condition, lambda: self.execute(stmt.body))
+
+    def visit_for(self, stmt: statements.For):
+        self.execute(stmt.initialiser)
+
+        def iteration():
+            self.execute_all(stmt.body)
+            self.infer(stmt.increment)
+
+        self.loop(stmt.condition, iteration)
+
+    def loop(self, condition: expressions.Expression, body: typ.Callable[[], None]):
+        """Infers the types in a loop. The types at the start of an iteration
+        are those known both before the loop, and at the end of every
+        iteration. That is found by running through the loop until they stop
+        changing, which the last run marks the loop's expressions with.
+        """
+        while True:
+            start = dict(self.types)
+            self.infer(condition)
+            body()
+            self.types = join(start, self.types)
+            if self.types == start:
+                break
+        # the loop ends once the condition is false
+        self.infer(condition)
+
+    # expressions
+
+    def visit_literal_expression(self, expr: expressions.Literal) -> Type:
+        return type(expr.value)
+
+    def visit_grouping_expression(self, expr: expressions.Grouping) -> Type:
+        return self.infer(expr.expression)
+
+    def visit_variable_expression(self, expr: expressions.Variable) -> Type:
+        slot = followed_slot(expr)
+        return None if slot is None else self.types.get(slot)
+
+    def visit_assignment_expression(self, expr: expressions.Assignment) -> Type:
+        value = self.infer(expr.expression)
+        slot = followed_slot(expr)
+        if slot is not None:
+            self.store(slot, value)
+        return value
+
+    def visit_call(self, expr: expressions.Call) -> Type:
+        self.infer(expr.callee)
+        for arg in expr.args:
+            self.infer(arg)
+        return None
+
+    def visit_logical_expression(self, expr: expressions.Logical) -> Type:
+        left = self.infer(expr.left)
+        # the right operand might not be evaluated
+        before = dict(self.types)
+        right = self.infer(expr.right)
+        self.types = join(before, self.types)
+        return left if left is right else None
+
+    def visit_unary_expression(self, expr: expressions.Unary) -> Type:
+        right = self.infer(expr.right)
+        if expr.operator.type == t.BANG:
+            expr.operand_type = None
+            return bool
+        if right is float:
+            expr.operand_type = float
+            expr.operate = UNCHECKED_UNARY_OPERATORS[t.MINUS]
+        else:
+            expr.operand_type = None
+            expr.operate = UNARY_OPERATORS[t.MINUS]
+        return float
+
+    def visit_binary_expression(self, expr: expressions.Binary) -> Type:
+        left = self.infer(expr.left)
+        right = self.infer(expr.right)
+        op = expr.operator.type
+        if left is right and (
+            left is float or (left is str and op in STRING_OPERATORS)
+        ):
+            expr.operand_type = left
+            expr.operate = UNCHECKED_OPERATORS[op]
+        else:
+            expr.operand_type = None
+            expr.operate = BINARY_OPERATORS[op]
+
+        if op in COMPARISONS:
+            return bool
+        if op != t.PLUS:
+            return float
+        # + only succeeds if both operands are numbers, or both are strings
+        if float in (left, right):
+            return float
+        if str in (left, right):
+            return str
+        return None
+
+    def store(self, slot: int, value: Type):
+        if value is None:
+            self.types.pop(slot, None)
+        else:
+            self.types[slot] = value
+
+
+def join(a: Types, b: Types) -> Types:
+    """The types that a and b agree on"""
+    return {slot: value for slot, value in a.items() if b.get(slot) is value}
+
+
+def followed_slot(
+    expr: expressions.Variable | expressions.Assignment,
+) -> typ.Optional[int]:
+    """The slot of expr's variable, if its types are followed: it's a local
+    of the current frame that no closure captures.
+    """
+    if expr.depth == 0 and not expr.captured:
+        return expr.slot
+    return None
+
+
+def is_boolean(expr: expressions.Expression) -> bool:
+    """Whether expr's value is certain to be True or False"""
+    if isinstance(expr, expressions.Grouping):
+        return is_boolean(expr.expression)
+    if isinstance(expr, expressions.Literal):
+        return isinstance(expr.value, bool)
+    if isinstance(expr, expressions.Unary):
+        return expr.operator.type == t.BANG
+    if isinstance(expr, expressions.Binary):
+        return expr.operator.type in COMPARISONS
+    if isinstance(expr, expressions.Logical):
+        return is_boolean(expr.left) and is_boolean(expr.right)
+    return False
@@ -0,0 +1,126 @@
+import bisect
+import typing as typ
+from concurrent.futures import ProcessPoolExecutor
+
+from .regex_scanner import ScannedColumns, scan_columns
+
+# Small sources aren't worth starting processes for
+MIN_CHUNK_SIZE = 1 << 20
+
+# More chunks than workers, so a slow chunk doesn't hold everything up
+CHUNKS_PER_WORKER = 2
+
+
+def scan_columns_parallel(
+    source: str | bytes, workers: int, chunk_size: typ.Optional[int] = None
+) -> ScannedColumns:
+    """Scan source in chunks, in a pool of worker processes, then stitch the
+    chunks back together. The result is the same as scan_columns(source).
+
+    Chunks are split after newlines, so the only token that can cross a
+    chunk boundary is a string. Comments end at a newline, and trivia isn't
+    stored. A chunk that ends inside a string has its string re-scanned in
+    the parent process, along with the start of the chunks after it, until
+    the re-scan lines up with a token the worker found. Line numbers don't
+    need fixing up, since the positions of tokens are all relative to the
+    whole source, and lines are looked up from those.
+    """
+    if chunk_size is None:
+        chunk_size = max(len(source) // (workers * CHUNKS_PER_WORKER), MIN_CHUNK_SIZE)
+    bounds = split_at_newlines(source, chunk_size)
+    if len(bounds) < 2:
+        return scan_columns(source)
+
+    with ProcessPoolExecutor(workers) as pool:
+        results = list(
+            pool.map(
+                scan_columns,
+                (source[start:end] for start, end in bounds),
+                (start for start, _ in bounds),
+            )
+        )
+    return _stitch(source, bounds, results)
+
+
+def split_at_newlines(
+    source: str | bytes, chunk_size: int
+) -> typ.List[typ.Tuple[int, int]]:
+    """(start, end) of chunks of at least chunk_size, each ending just after
+    a newline, except the last
+    """
+    newline: str | bytes = "\n" if isinstance(source, str) else b"\n"
+    bounds = []
+    start = 0
+    while start < len(source):
+        end = source.find(newline, start + max(chunk_size, 1) - 1)  # type: ignore
+        end = len(source) if end == -1 else end + 1
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def _stitch(
+    source: str | bytes,
+    bounds: typ.List[typ.Tuple[int, int]],
+    results: typ.List[ScannedColumns],
+) -> ScannedColumns:
+    columns = ScannedColumns()
+    last_chunk = len(results) - 1
+    chunk = 0
+    # where to carry on from in the current chunk, after a re-scan
+    first_token = 0
+    error_start = 0
+
+    while chunk <= last_chunk:
+        result = results[chunk]
+        chunk_end = bounds[chunk][1]
+        columns.extend(result, first_token, len(result.types), error_start)
+        if chunk == last_chunk or not result.ends_in_open_string(chunk_end):
+            chunk += 1
+            first_token = 0
+            error_start = 0
+            continue
+
+        # The string really continues into the next chunk, which was
+        # scanned as if it wasn't in a string.
+        _, string_start, _ = columns.errors.pop()
+        chunk, first_token, error_start = _rescan(
+            source, bounds, results, string_start, chunk + 1, columns
+        )
+
+    return columns
+
+
+def _rescan(
+    source: str | bytes,
+    bounds: typ.List[typ.Tuple[int, int]],
+    results: typ.List[ScannedColumns],
+    start: int,
+    chunk: int,
+    columns: ScannedColumns,
+) -> typ.Tuple[int, int, int]:
+    """Scan from start until a token lines up with one found in a later
+    chunk, appending the re-scanned tokens to columns. Once a token starts
+    at the same place in both scans, the rest of that chunk is the same.
+
+    Returns where to carry on from: (chunk, token index, offset).
+    """
+    while True:
+        chunk_start, chunk_end = bounds[chunk]
+        rescan = scan_columns(source[start:chunk_end], start)
+        if chunk == len(results) - 1:
+            columns.extend(rescan, 0, len(rescan.types), 0)
+            return len(results), 0, 0
+
+        if not rescan.ends_in_open_string(chunk_end):
+            found = results[chunk].starts
+            first_in_chunk = bisect.bisect_left(rescan.starts, chunk_start)
+            for idx in range(first_in_chunk, len(rescan.starts)):
+                offset = rescan.starts[idx]
+                match = bisect.bisect_left(found, offset)
+                if match < len(found) and found[match] == offset:
+                    columns.extend(rescan, 0, idx, 0)
+                    return chunk, match, offset
+
+        # nothing lined up in this chunk; include the next one too
+        chunk += 1
@@ -36,6 +36,9 @@ class AstPrinter:
     def visit_variable_expression(self, var: expressions.Variable):
         return var.identifier.lexeme
 
+    def visit_assignment_expression(self, expr: expressions.Assignment):
+        return self._parenthesize(f"= {expr.identifier.lexeme}", expr.expression)
+
     def _parenthesize(self, name, *expressions) -> str:
         output = "(" + name
         for expression in expressions:
@@ -1,9 +1,17 @@
+from ..operators import BINARY_OPERATORS, SHORT_CIRCUITS, UNARY_OPERATORS
 from ..token import Token
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from ..environment import Cell
 
 
 class Expression:
-    """abstract expression"""
+    """abstract expression. Nodes have __slots__ rather than a __dict__, to keep
+    large ASTs small.
+    """
+
+    __slots__ = ()
 
     def accept(self, visitor):
         """Uses visitor pattern to extend expression functionality"""
@@ -11,16 +19,32 @@ class Expression:
 
 
 class Binary(Expression):
+    """operand_type is float if both operands are certain to be numbers, or
+    str if both are certain to be strings and the operator takes them, so
+    that the Interpreter needn't check them. It is None if that isn't
+    known. The TypeInferrer fills it in.
+
+    operate is the function that the operator applies to the operands'
+    values, from pylox.operators: one that checks them, until the
+    TypeInferrer finds operand_type.
+    """
+
+    __slots__ = ("left", "operator", "right", "operand_type", "operate")
+
     def __init__(self, left: Expression, operator: Token, right: Expression):
         self.left = left
         self.operator = operator
         self.right = right
+        self.operand_type: Optional[type] = None
+        self.operate = BINARY_OPERATORS[operator.type]
 
     def accept(self, visitor):
         return visitor.visit_binary_expression(self)
 
 
 class Grouping(Expression):
+    __slots__ = ("expression",)
+
     def __init__(self, expression: Expression):
         self.expression = expression
 
@@ -29,6 +53,8 @@ class Grouping(Expression):
 
 
 class Literal(Expression):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         if type(value) is int:  # noqa: E721   # for some reason, isinstance breaks this
             self.value = float(value)
@@ -40,42 +66,84 @@ class Literal(Expression):
 
 
 class Unary(Expression):
+    """operand_type is float if the operator is - and the operand is certain
+    to be a number, as for Binary. operate is as for Binary.
+    """
+
+    __slots__ = ("operator", "right", "operand_type", "operate")
+
     def __init__(self, operator: Token, right: Expression):
         self.operator = operator
         self.right = right
+        self.operand_type: Optional[type] = None
+        self.operate = UNARY_OPERATORS[operator.type]
 
     def accept(self, visitor):
         return visitor.visit_unary_expression(self)
 
 
 class Variable(Expression):
+    """depth and slot locate a local variable. depth is how many functions
+    out from the current one it is declared in. At depth 0, slot is its
+    index in the current frame, otherwise it's the index of its Cell in the
+    current function's upvalues. captured is True if the variable is in a
+    Cell, because a nested function uses it. The Resolver fills all three
+    in. depth and slot are None for globals.
+
+    cell is the global's Cell, cached by the Interpreter the first time it
+    runs the expression.
+    """
+
+    __slots__ = ("identifier", "depth", "slot", "captured", "cell")
+
     def __init__(self, identifier: Token):
         self.identifier = identifier
+        self.depth: Optional[int] = None
+        self.slot: Optional[int] = None
+        self.captured = False
+        self.cell: Optional["Cell"] = None
 
     def accept(self, visitor):
         return visitor.visit_variable_expression(self)
 
 
 class Assignment(Expression):
+    """depth, slot, captured and cell are as for Variable"""
+
+    __slots__ = ("identifier", "expression", "depth", "slot", "captured", "cell")
+
     def __init__(self, identifier: Token, expression: Expression):
         self.identifier = identifier
         self.expression = expression
+        self.depth: Optional[int] = None
+        self.slot: Optional[int] = None
+        self.captured = False
+        self.cell: Optional["Cell"] = None
 
     def accept(self, visitor):
         return visitor.visit_assignment_expression(self)
 
 
 class Logical(Expression):
+    """short_circuits is the function that tells, from the left operand's
+    value, whether that's the result, from pylox.operators.
+    """
+
+    __slots__ = ("left", "operator", "right", "short_circuits")
+
     def __init__(self, left: Expression, operator: Token, right: Expression):
         self.left = left
         self.operator = operator
         self.right = right
+        self.short_circuits = SHORT_CIRCUITS[operator.type]
 
     def accept(self, visitor):
         return visitor.visit_logical_expression(self)
 
 
 class Call(Expression):
+    __slots__ = ("callee", "closing_paren", "args")
+
     def __init__(
         self, callee: Expression, closing_paren: Token, args: List[Expression]
     ):
@@ -1,30 +1,129 @@
-from typing import Any, Iterator, List
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from . import expressions
 from . import statements
 from ..token_types import TokenTypes as t
 from ..token import Token
+from ..token_buffer import TokenBuffer
 
 
 class Parser:
-    def __init__(self, tokens):
-        ignore_tokens = [t.COMMENT, t.WHITESPACE, t.NEWLINE]
-        self.tokens = [tk for tk in tokens if tk.type not in ignore_tokens]
+    """tokens: a list of Tokens, or a TokenBuffer. Parsing a TokenBuffer only
+    creates Token objects for the tokens that end up in the AST, or in
+    error messages.
+
+    tokens can also be an iterator, eg. a running scanner. Tokens are then
+    pulled from it one top level declaration at a time, and dropped once
+    that declaration is parsed.
+
+    recover: after a syntax error, skip to the next statement and carry on
+    parsing, so that every error is found in one pass. The errors are
+    collected in self.errors, and raised together as ParserErrors once
+    parsing is finished. Otherwise, the first error is raised straight
+    away.
+    """
+
+    def __init__(self, tokens: Iterable[Token] | TokenBuffer, recover: bool = True):
+        self._buffer: Optional[TokenBuffer] = None
+        self._stream: Optional[Iterator[Token]] = None
+        self.tokens: Sequence[Token] | TokenBuffer
+        if isinstance(tokens, TokenBuffer):
+            self._buffer = tokens
+            self.tokens = tokens
+            self.types = tokens.type_list()
+        elif isinstance(tokens, Sequence):
+            self.tokens = [tk for tk in tokens if tk.type not in IGNORED_TOKENS]
+            self.types = [tk.type for tk in self.tokens]
+        else:
+            self._stream = (tk for tk in tokens if tk.type not in IGNORED_TOKENS)
+            self.tokens = []
+            self.types = []
         self.current_idx = 0
+        self.recover = recover
+        self.errors: List[ParserException] = []
 
     def parse(self) -> Iterator[statements.Statement]:
-        while not self._is_finished():
-            yield self._declaration()
-
-    def _declaration(self):
-        if self._consume_if(t.FUN):
-            return self._fun_declaration("function")
-        if self._consume_if(t.VAR):
-            return self._var_declaration()
-        return self._statement()
+        while True:
+            if self._stream is not None:
+                self._read_declaration()
+            if self._is_finished():
+                break
+            statement = self._declaration()
+            if statement is not None:
+                yield statement
+
+        if self.errors:
+            raise ParserErrors(self.errors)
+
+    def _read_declaration(self):
+        """Drop the tokens that have been parsed, except the last one, then
+        read the tokens of the next top level declaration from the stream.
+
+        A declaration ends at a ';' or '}' outside of any brackets, unless
+        it has an 'if' and the next token is an 'else'. The next token is
+        only read in that case, so that tokens (and scanner errors) after a
+        declaration aren't read before it has run.
+        """
+        drop = max(self.current_idx - 1, 0)
+        del self.tokens[:drop]  # type: ignore
+        del self.types[:drop]
+        self.current_idx -= drop
+
+        depth = 0
+        has_if = False
+        idx = self.current_idx
+        while self._read_token(idx):
+            type = self.types[idx]
+            idx += 1
+            if type == t.LEFT_PAREN or type == t.LEFT_BRACE:
+                depth += 1
+            elif type == t.RIGHT_PAREN or type == t.RIGHT_BRACE:
+                depth = max(depth - 1, 0)
+            elif type == t.IF and depth == 0:
+                has_if = True
+            if depth == 0 and (type == t.SEMICOLON or type == t.RIGHT_BRACE):
+                if not has_if:
+                    return
+                if not self._read_token(idx) or self.types[idx] != t.ELSE:
+                    return
+
+    def _read_rest(self):
+        while self._read_token(len(self.types)):
+            pass
+        self._stream = None
+
+    def _read_token(self, idx: int) -> bool:
+        """Make sure token idx has been read. False if the stream ran out."""
+        if idx < len(self.types):
+            return True
+        token = next(self._stream, None)  # type: ignore
+        if token is None:
+            return False
+        self.tokens.append(token)  # type: ignore
+        self.types.append(token.type)
+        return True
+
+    def _declaration(self) -> Optional[statements.Statement]:
+        try:
+            if self._consume_if(t.FUN):
+                return self._fun_declaration("function")
+            if self._consume_if(t.VAR):
+                return self._var_declaration()
+            return self._statement()
+        except ParserException as error:
+            if not self.recover:
+                raise
+            self.errors.append(error)
+            if self._stream is not None:
+                # Recovery can skip past the end of a declaration, so just
+                # read the rest. Nothing more will be run anyway.
+                self._read_rest()
+            self._synchronise()
+            return None
 
     def _fun_declaration(self, kind: str):
-        name = self._consume(t.IDENTIFIER, f"expected {kind} name")
+        self._consume(t.IDENTIFIER, f"expected {kind} name")
+        name = self._previous_token()
         self._consume(t.LEFT_PAREN, f"expected '(' after {kind} name")
         params: List[Token] = []
         if not self._current_token_is(t.RIGHT_PAREN):
@@ -33,7 +132,8 @@ class Parser:
                     raise ParserException(
                         self._current_token(), "Can't have more than 255 parameters"
                     )
-                params.append(self._consume(t.IDENTIFIER, "expected parameter name"))
+                self._consume(t.IDENTIFIER, "expected parameter name")
+                params.append(self._previous_token())
                 if not self._consume_if(t.COMMA):
                     break
         self._consume(t.RIGHT_PAREN, "expected ')' after parameters")
@@ -42,7 +142,8 @@ class Parser:
         return statements.FunctionDeclaration(name, params, body)
 
     def _var_declaration(self):
-        identifier = self._consume(t.IDENTIFIER, "expected variable name")
+        self._consume(t.IDENTIFIER, "expected variable name")
+        identifier = self._previous_token()
         expression = None
         if self._consume_if(t.EQUAL):
             expression = self._expression()
@@ -87,29 +188,13 @@ class Parser:
         self._consume(t.RIGHT_PAREN, "Expected ')' after for clauses")
 
         body = self._statement()
-
-        # Here, we 'desugar' the for loop into a while loop:
-        #
-        # initialiser
-        # while (condition) {
-        #   body
-        #   increment
-        # }
-        #
-        # The interpreter already deals with while loops, so
-        # there's no need for 'for' handling code in the interpreter.
-        #
-        # See https://craftinginterpreters.com/control-flow.html#desugaring
-        if increment:
-            body = statements.Block([body, statements.ExpressionStatement(increment)])
+        if isinstance(body, statements.Block) and not _declares_names(body):
+            body = body.statements
+        else:
+            body = [body]
 
         condition = condition or expressions.Literal(True)
-        body = statements.While(condition, body)
-
-        if initialiser:
-            body = statements.Block([initialiser, body])
-
-        return body
+        return statements.For(initialiser, condition, increment, body)
 
     def _if_statement(self):
         self._consume(t.LEFT_PAREN, "Expected '(' after 'if'.")
@@ -135,7 +220,9 @@ class Parser:
         stmts = []
 
         while not self._current_token_is(t.RIGHT_BRACE) and not self._is_finished():
-            stmts.append(self._declaration())
+            statement = self._declaration()
+            if statement is not None:
+                stmts.append(statement)
 
         self._consume(t.RIGHT_BRACE, "Expected '}' after block.")
         return stmts
@@ -159,162 +246,150 @@ class Parser:
         return statements.ExpressionStatement(expr)
 
     def _expression(self):
-        return self._assignment()
-
-    def _assignment(self):
-        expression = self._or()
-
-        if self._consume_if(t.EQUAL):
-            equals = self._previous_token()
-            value = self._assignment()
-            if isinstance(expression, expressions.Variable):
-                identifier = expression.identifier
-                return expressions.Assignment(identifier, value)
-
-            raise ParserException(equals, "Invalid assignment target.")
-
-        return expression
-
-    def _or(self):
-        expression = self._and()
-
-        while self._consume_if(t.OR):
-            operator = self._previous_token()
-            right = self._and()
-            expression = expressions.Logical(expression, operator, right)
-
-        return expression
-
-    def _and(self):
-        expression = self._equality()
-
-        while self._consume_if(t.AND):
-            operator = self._previous_token()
-            right = self._equality()
-            expression = expressions.Logical(expression, operator, right)
-
-        return expression
-
-    def _equality(self):
-        expression = self._comparison()
-
-        while self._consume_if(t.BANG_EQUAL, t.EQUAL_EQUAL):
-            operator = self._previous_token()
-            right = self._comparison()
-            expression = expressions.Binary(expression, operator, right)
-
-        return expression
-
-    def _comparison(self):
-        expression = self._addition()
-
-        while self._consume_if(t.GREATER, t.GREATER_EQUAL, t.LESS, t.LESS_EQUAL):
-            operator = self._previous_token()
-            right = self._addition()
-            expression = expressions.Binary(expression, operator, right)
-
-        return expression
-
-    def _addition(self):
-        expression = self._multiplication()
-
-        while self._consume_if(t.MINUS, t.PLUS):
-            operator = self._previous_token()
-            right = self._multiplication()
-            expression = expressions.Binary(expression, operator, right)
-
-        return expression
-
-    def _multiplication(self):
-        expression = self._unary()
-
-        while self._consume_if(t.SLASH, t.STAR):
-            operator = self._previous_token()
-            right = self._unary()
-            expression = expressions.Binary(expression, operator, right)
-
-        return expression
-
-    def _unary(self):
-        if self._consume_if(t.BANG, t.MINUS):
-            operator = self._previous_token()
-            right = self._unary()
-            return expressions.Unary(operator, right)
-
-        return self._call()
+        """Parses an expression by precedence climbing, driven by
+        BINDING_POWERS. Operators and operands wait on explicit stacks
+        rather than in python frames, so a bare literal doesn't need a call
+        per precedence level, and deep nesting can't hit the recursion
+        limit.
+
+        Groups and calls push a marker with no binding power, so nothing
+        reduces past them until their closing paren.
+        """
+        types = self.types
+        operands: List[expressions.Expression] = []
+        # (binding power, kind, token index). Call markers hold the callee's
+        # position on the operand stack instead of a token index.
+        operators: List[Tuple[int, int, int]] = []
 
-    def _call(self):
-        expr = self._primary()
         while True:
-            if self._consume_if(t.LEFT_PAREN):
-                expr = self._consume_call(expr)
-            else:
-                break
-        return expr
-
-    def _consume_call(self, callee: expressions.Expression):
-        args: Any = []
-
-        if not self._current_token_is(t.RIGHT_PAREN):
+            # before an operand: prefix operators, open parens, then a primary
+            type = types[self.current_idx]
+            if type in UNARY_OPERATORS:
+                operators.append((UNARY_POWER, UNARY, self.current_idx))
+                self.current_idx += 1
+                continue
+            if type == t.LEFT_PAREN:
+                operators.append((0, GROUP, self.current_idx))
+                self.current_idx += 1
+                continue
+            operands.append(self._primary())
+
+            # after an operand: calls, then an infix operator or the end of
+            # the innermost group, call argument or the whole expression
             while True:
-                if len(args) >= 255:
-                    raise ParserException(
-                        self._current_token(), "Can't have more than 255 arguments"
-                    )
-                args.append(self._expression())
-                if not self._consume_if(t.COMMA):
+                type = types[self.current_idx]
+                if type == t.LEFT_PAREN:
+                    self.current_idx += 1
+                    if types[self.current_idx] == t.RIGHT_PAREN:
+                        self.current_idx += 1
+                        operands[-1] = expressions.Call(
+                            operands[-1], self._previous_token(), []
+                        )
+                        continue
+                    operators.append((0, CALL, len(operands) - 1))
                     break
 
-        closing_paren = self._consume(t.RIGHT_PAREN, "expected ')' after arguments")
+                infix = BINDING_POWERS.get(type)
+                if infix is not None:
+                    power, kind = infix
+                    # assignment is right associative, everything else left
+                    if kind == ASSIGN:
+                        power += 1
+                    while operators and operators[-1][0] >= power:
+                        self._reduce(operands, operators.pop())
+                    operators.append((infix[0], kind, self.current_idx))
+                    self.current_idx += 1
+                    break
 
-        return expressions.Call(callee, closing_paren, args)
+                while operators and operators[-1][0] > 0:
+                    self._reduce(operands, operators.pop())
+                if not operators:
+                    return operands.pop()
+
+                _, kind, callee_idx = operators[-1]
+                if kind == GROUP:
+                    self._consume(t.RIGHT_PAREN, "Expected ')' after expression")
+                    operators.pop()
+                    operands[-1] = expressions.Grouping(operands[-1])
+                    continue
+
+                if self._consume_if(t.COMMA):
+                    if len(operands) - callee_idx - 1 >= 255:
+                        raise ParserException(
+                            self._current_token(), "Can't have more than 255 arguments"
+                        )
+                    break
+                self._consume(t.RIGHT_PAREN, "expected ')' after arguments")
+                operators.pop()
+                args = operands[callee_idx + 1 :]
+                del operands[callee_idx + 1 :]
+                operands[-1] = expressions.Call(
+                    operands[-1], self._previous_token(), args
+                )
+
+    def _reduce(
+        self,
+        operands: List[expressions.Expression],
+        operator: Tuple[int, int, int],
+    ):
+        """Replace the operands of operator on the top of the stack with the
+        expression it makes
+        """
+        _, kind, token_idx = operator
+        token = self.tokens[token_idx]
+        right = operands.pop()
+        if kind == UNARY:
+            operands.append(expressions.Unary(token, right))
+            return
+        left = operands[-1]
+        if kind == BINARY:
+            operands[-1] = expressions.Binary(left, token, right)
+        elif kind == LOGICAL:
+            operands[-1] = expressions.Logical(left, token, right)
+        elif isinstance(left, expressions.Variable):
+            operands[-1] = expressions.Assignment(left.identifier, right)
+        else:
+            raise ParserException(token, "Invalid assignment target.")
 
     def _primary(self):
-        if self._consume_if(t.FALSE):
+        type = self.types[self.current_idx]
+        self.current_idx += 1
+        if type == t.IDENTIFIER:
+            return expressions.Variable(self._previous_token())
+        if type == t.NUMBER or type == t.STRING:
+            return expressions.Literal(self._previous_literal())
+        if type == t.FALSE:
             return expressions.Literal(False)
-        if self._consume_if(t.TRUE):
+        if type == t.TRUE:
             return expressions.Literal(True)
-        if self._consume_if(t.NIL):
+        if type == t.NIL:
             return expressions.Literal(None)
 
-        if self._consume_if(t.NUMBER, t.STRING):
-            return expressions.Literal(self._previous_token().literal)
-
-        if self._consume_if(t.IDENTIFIER):
-            return expressions.Variable(self._previous_token())
-
-        if self._consume_if(t.LEFT_PAREN):
-            expression = self._expression()
-            self._consume(t.RIGHT_PAREN, "Expected ')' after expression")
-            return expressions.Grouping(expression)
-
+        self.current_idx -= 1
         raise ParserException(self._current_token(), "Expected expression")
 
-    def _consume(self, token_type, error_message) -> Token:
+    def _consume(self, token_type, error_message):
         if self._current_token_is(token_type):
-            return self._consume_current_token()
+            self.current_idx += 1
+            return
 
         raise ParserException(self._current_token(), error_message)
 
     def _consume_if(self, *token_types) -> bool:
-        for type in token_types:
-            if self._current_token_is(type):
-                self._consume_current_token()
-                return True
+        if self.types[self.current_idx] in token_types:
+            self.current_idx += 1
+            return True
         return False
 
     def _current_token_is(self, token_type):
-        if self._is_finished():
-            return False
-        return self._current_token().type == token_type
+        return self.types[self.current_idx] == token_type
 
-    def _consume_current_token(self) -> Token:
+    def _consume_current_token(self):
         if not self._is_finished():
             self.current_idx += 1
-        return self._previous_token()
 
     def _is_finished(self):
-        return self._current_token().type == t.EOF
+        return self.types[self.current_idx] == t.EOF
 
     def _current_token(self) -> Token:
         return self.tokens[self.current_idx]
@@ -322,28 +397,62 @@ class Parser:
     def _previous_token(self) -> Token:
         return self.tokens[self.current_idx - 1]
 
+    def _previous_literal(self):
+        if self._buffer is not None:
+            return self._buffer.literal(self.current_idx - 1)
+        return self._previous_token().literal
+
     def _synchronise(self):
+        """Skip tokens up to what looks like the start of the next
+        statement: just after a ';', or at a keyword that starts one.
+        """
         self._consume_current_token()
 
         while not self._is_finished():
-            if self._previous_token() == t.SEMICOLON:
+            if self.types[self.current_idx - 1] == t.SEMICOLON:
                 return
 
-            if self._current_token().type in [
-                t.CLASS,
-                t.FUN,
-                t.VAR,
-                t.FOR,
-                t.IF,
-                t.WHILE,
-                t.PRINT,
-                t.RETURN,
-            ]:
+            if self.types[self.current_idx] in STATEMENT_KEYWORDS:
                 return
 
             self._consume_current_token()
 
 
+IGNORED_TOKENS = {t.COMMENT, t.WHITESPACE, t.NEWLINE}
+
+STATEMENT_KEYWORDS = {t.CLASS, t.FUN, t.VAR, t.FOR, t.IF, t.WHILE, t.PRINT, t.RETURN}
+
+# kinds of entries on the operator stack in Parser._expression
+ASSIGN, LOGICAL, BINARY, UNARY, GROUP, CALL = range(6)
+
+# infix operators: (binding power, kind). Higher powers bind tighter.
+BINDING_POWERS = {
+    t.EQUAL: (1, ASSIGN),
+    t.OR: (2, LOGICAL),
+    t.AND: (3, LOGICAL),
+    t.BANG_EQUAL: (4, BINARY),
+    t.EQUAL_EQUAL: (4, BINARY),
+    t.GREATER: (5, BINARY),
+    t.GREATER_EQUAL: (5, BINARY),
+    t.LESS: (5, BINARY),
+    t.LESS_EQUAL: (5, BINARY),
+    t.MINUS: (6, BINARY),
+    t.PLUS: (6, BINARY),
+    t.SLASH: (7, BINARY),
+    t.STAR: (7, BINARY),
+}
+
+UNARY_OPERATORS = {t.BANG, t.MINUS}
+UNARY_POWER = 8
+
+
+DECLARATIONS = (statements.VariableDeclaration, statements.FunctionDeclaration)
+
+
+def _declares_names(block: statements.Block) -> bool:
+    return any(isinstance(stmt, DECLARATIONS) for stmt in block.statements)
+
+
 class ParserException(Exception):
     def __init__(self, token: Token, message: str):
         self.token = token
@@ -351,3 +460,16 @@ class ParserException(Exception):
 
     def __str__(self):
         return f"On line {self.token.line}, '{self.token.lexeme}': {self.message}"
+
+
+class ParserErrors(ParserException):
+    """All the syntax errors found by a parse. The token and message are
+    those of the first error.
+    """
+
+    def __init__(self, errors: List[ParserException]):
+        super().__init__(errors[0].token, errors[0].message)
+        self.errors = errors
+
+    def __str__(self):
+        return "\n".join(str(error) for error in self.errors)
@@ -1,11 +1,18 @@
-from typing import List
+from typing import TYPE_CHECKING, List, Literal, Optional, Tuple
 
 from ..token import Token
 from .expressions import Expression
 
+if TYPE_CHECKING:
+    from ..counted_loop import CountedLoop
+
 
 class Statement:
-    """abstract statement"""
+    """abstract statement. Nodes have __slots__ rather than a __dict__, to keep
+    large ASTs small.
+    """
+
+    __slots__ = ()
 
     def accept(self, visitor):
         """Uses visitor pattern to extend statement functionality"""
@@ -13,6 +20,8 @@ class Statement:
 
 
 class ExpressionStatement(Statement):
+    __slots__ = ("expression",)
+
     def __init__(self, expression: Expression):
         self.expression = expression
 
@@ -21,6 +30,8 @@ class ExpressionStatement(Statement):
 
 
 class Print(Statement):
+    __slots__ = ("expression",)
+
     def __init__(self, expression: Expression):
         self.expression = expression
 
@@ -29,6 +40,8 @@ class Print(Statement):
 
 
 class Return(Statement):
+    __slots__ = ("keyword", "value")
+
     def __init__(self, keyword: Token, value):
         self.keyword = keyword
         self.value = value
@@ -38,33 +51,81 @@ class Return(Statement):
 
 
 class FunctionDeclaration(Statement):
+    """slot is where the function is stored in its frame, or None if it's a
+    global. captured is True if a nested function uses it, in which case the
+    slot holds a Cell of it.
+
+    size is the number of slots in the frame of a call: the params come
+    first, then the locals of the body and of every block and loop in it.
+    captured_params are the slots of the params that nested functions use.
+    upvalues are where a closure of the function gets the cells of the
+    variables it uses from the functions it's in: for each, whether it's
+    a slot of the frame the closure is made in, and the slot, or else the
+    index in that frame's function's upvalues.
+
+    The Resolver fills all of these in.
+    """
+
+    __slots__ = (
+        "name",
+        "params",
+        "body",
+        "slot",
+        "captured",
+        "size",
+        "captured_params",
+        "upvalues",
+    )
+
     def __init__(self, name: Token, params: List[Token], body: List[Statement]):
         self.name = name
         self.params = params
         self.body = body
+        self.slot: Optional[int] = None
+        self.captured = False
+        self.size = 0
+        self.captured_params: List[int] = []
+        self.upvalues: List[Tuple[bool, int]] = []
 
     def accept(self, visitor):
         return visitor.visit_function_declaration(self)
 
 
 class VariableDeclaration(Statement):
-    def __init__(self, identifier: Token, initialiser: Expression):
+    """slot and captured are as for FunctionDeclaration"""
+
+    __slots__ = ("identifier", "initialiser", "slot", "captured")
+
+    def __init__(self, identifier: Token, initialiser: Optional[Expression]):
         self.identifier = identifier
         self.initialiser = initialiser
+        self.slot: Optional[int] = None
+        self.captured = False
 
     def accept(self, visitor):
         return visitor.visit_variable_declaration(self)
 
 
 class Block(Statement):
+    """A block's locals are in the frame of the function it's in. A block
+    that isn't in a function or another block has a frame of its own, which
+    the blocks and loops in it share: size is the number of slots in it,
+    filled in by the Resolver. size is 0 for any other block.
+    """
+
+    __slots__ = ("statements", "size")
+
     def __init__(self, statements: List[Statement]):
         self.statements = statements
+        self.size = 0
 
     def accept(self, visitor):
         return visitor.visit_block(self)
 
 
 class If(Statement):
+    __slots__ = ("condition", "thenBranch", "elseBranch")
+
     def __init__(
         self, condition: Expression, thenBranch: Statement, elseBranch: Statement
     ):
@@ -77,9 +138,48 @@ class If(Statement):
 
 
 class While(Statement):
+    __slots__ = ("condition", "body")
+
     def __init__(self, condition: Expression, body: Statement):
         self.condition = condition
         self.body = body
 
     def accept(self, visitor):
         return visitor.visit_while(self)
+
+
+class For(Statement):
+    """A for loop. The loop has one scope, which holds the initialiser's
+    variable, and is shared by every iteration. The parser unwraps a block
+    body that declares nothing into body, so that it runs in the loop's
+    scope too. Any other body is the only statement in body.
+
+    size is as for Block. counted_loop is filled in by the Interpreter, the first time
+    the loop runs: a CountedLoop if the loop can run as one, otherwise False.
+    """
+
+    __slots__ = (
+        "initialiser",
+        "condition",
+        "increment",
+        "body",
+        "size",
+        "counted_loop",
+    )
+
+    def __init__(
+        self,
+        initialiser: Optional[Statement],
+        condition: Expression,
+        increment: Optional[Expression],
+        body: List[Statement],
+    ):
+        self.initialiser = initialiser
+        self.condition = condition
+        self.increment = increment
+        self.body = body
+        self.size = 0
+        self.counted_loop: "CountedLoop | Literal[False] | None" = None
+
+    def accept(self, visitor):
+        return visitor.visit_for(self)
@@ -0,0 +1,265 @@
+import re
+import typing as typ
+from array import array
+
+from .scanner import KEYWORDS, UNAMBIGUOUS_SINGLE_CHARS, ScannerError
+from .token import Token
+from .token_buffer import TokenBuffer
+from .token_types import TokenTypes
+
+
+class RegexScanner:
+    """Produces the same tokens as Scanner, but matches a whole lexeme at a
+    time using one compiled 'master' pattern, instead of stepping through the
+    source one character at a time. The regex engine does the character
+    loop in C, so python code only runs once per token.
+
+    Keywords are found by looking up identifier lexemes in KEYWORDS, and line
+    numbers are kept by counting the newlines in each lexeme that can
+    contain them.
+
+    The source can also be utf-8 encoded bytes, or anything else that
+    supports the buffer protocol, eg. a memory mapped file. The bytes are
+    scanned as-is, and only decoded for the lexemes that need text.
+    Identifiers are limited to ascii when scanning bytes.
+    """
+
+    def __init__(self, bytes: str | bytes, line: int = 1):
+        self.bytes = bytes
+        self.line_num = line
+
+    def scan_tokens(self, skip_trivia: bool = False):
+        """skip_trivia: don't create whitespace, newline and comment tokens.
+        Runs of trivia are then matched in one go, and only their newlines
+        are counted.
+        """
+        if isinstance(self.bytes, str):
+            pattern = TRIVIA_FREE_PATTERN if skip_trivia else MASTER_PATTERN
+            return self._tokens(pattern.finditer(self.bytes), str, "\n")
+        bytes_pattern = (
+            BYTES_TRIVIA_FREE_PATTERN if skip_trivia else BYTES_MASTER_PATTERN
+        )
+        return self._tokens(bytes_pattern.finditer(self.bytes), bytes.decode, b"\n")
+
+    def _tokens(
+        self,
+        matches: typ.Iterator[re.Match[typ.AnyStr]],
+        decode: typ.Callable[[typ.AnyStr], str],
+        newline: typ.AnyStr,
+    ) -> typ.Iterator[Token | ScannerError]:
+        for match in matches:
+            kind = match.lastgroup
+            raw = match.group()
+
+            if kind == "TRIVIA":
+                self.line_num += raw.count(newline)
+            elif kind == "WHITESPACE":
+                yield Token(TokenTypes.WHITESPACE, decode(raw), None, self.line_num)
+            elif kind == "IDENTIFIER":
+                lexeme = decode(raw)
+                type = KEYWORDS.get(lexeme, TokenTypes.IDENTIFIER)
+                yield Token(type, lexeme, None, self.line_num)
+            elif kind == "OPERATOR":
+                type, lexeme = OPERATOR_TOKENS[raw]
+                yield Token(type, lexeme, None, self.line_num)
+            elif kind == "NEWLINE":
+                yield Token(TokenTypes.NEWLINE, "\n", None, self.line_num)
+                self.line_num += 1
+            elif kind == "NUMBER":
+                lexeme = decode(raw)
+                yield Token(TokenTypes.NUMBER, lexeme, float(lexeme), self.line_num)
+            elif kind == "STRING":
+                self.line_num += raw.count(newline)
+                lexeme = decode(raw)
+                yield Token(TokenTypes.STRING, lexeme, lexeme[1:-1], self.line_num)
+            elif kind == "COMMENT":
+                lexeme = decode(raw)
+                yield Token(TokenTypes.COMMENT, lexeme, lexeme[2:], self.line_num)
+            elif kind == "UNTERMINATED_STRING":
+                self.line_num += raw.count(newline)
+                message = "unterminated string at line {}".format(self.line_num)
+                yield ScannerError(self.line_num, message)
+            else:
+                message = 'unexpected character "{}" at line {}'.format(
+                    _show(raw), self.line_num
+                )
+                yield ScannerError(self.line_num, message)
+
+        yield Token(TokenTypes.EOF, "", None, self.line_num)
+
+    def scan_buffer(self, workers: int = 1) -> TokenBuffer:
+        """Scan everything into a TokenBuffer, skipping trivia. No Token
+        objects are created, and nothing is decoded.
+
+        workers: scan chunks of the source in this many processes. Only
+        worth it for very large sources. See parallel_scanner.
+        """
+        if workers > 1:
+            from .parallel_scanner import scan_columns_parallel
+
+            columns = scan_columns_parallel(self.bytes, workers)
+        else:
+            columns = scan_columns(self.bytes)
+        return columns.to_buffer(self.bytes, self.line_num)
+
+
+class ScannedColumns:
+    """The columns of a TokenBuffer, and any errors found while scanning, as
+    (kind, start, end) tuples. Plain arrays and tuples are cheap to send
+    between processes.
+    """
+
+    def __init__(self):
+        self.types = array("H")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.errors: typ.List[typ.Tuple[str, int, int]] = []
+
+    def ends_in_open_string(self, end: int) -> bool:
+        """Was a string still open when the scan reached end?"""
+        if not self.errors:
+            return False
+        kind, _, error_end = self.errors[-1]
+        return kind == "UNTERMINATED_STRING" and error_end == end
+
+    def extend(self, other: "ScannedColumns", first: int, last: int, error_start: int):
+        """Append other's tokens [first:last], and its errors from
+        error_start, up to the start of token last.
+        """
+        self.types.extend(other.types[first:last])
+        self.starts.extend(other.starts[first:last])
+        self.ends.extend(other.ends[first:last])
+        error_end = other.starts[last] if last < len(other.starts) else None
+        self.errors.extend(
+            e
+            for e in other.errors
+            if e[1] >= error_start and (error_end is None or e[1] < error_end)
+        )
+
+    def to_buffer(self, source: str | bytes, line: int = 1) -> TokenBuffer:
+        buffer = TokenBuffer(source, line)
+        buffer.types, buffer.starts, buffer.ends = self.types, self.starts, self.ends
+        buffer.append(TokenTypes.EOF, len(source), len(source))
+        buffer.errors = [_buffer_error(buffer, *error) for error in self.errors]
+        return buffer
+
+
+def scan_columns(source: str | bytes, offset: int = 0) -> ScannedColumns:
+    """Scan source, skipping trivia. offset is added to all positions, for
+    when source is a part of something bigger.
+    """
+    matches: typ.Iterator[re.Match[str]] | typ.Iterator[re.Match[bytes]]
+    if isinstance(source, str):
+        matches = TRIVIA_FREE_PATTERN.finditer(source)
+    else:
+        matches = BYTES_TRIVIA_FREE_PATTERN.finditer(source)
+    columns = ScannedColumns()
+    types, starts, ends = columns.types, columns.starts, columns.ends
+
+    for match in matches:
+        kind = match.lastgroup
+        if kind == "TRIVIA":
+            continue
+        if kind == "IDENTIFIER":
+            code = KEYWORD_CODES.get(match.group(), IDENTIFIER_CODE)
+        elif kind == "OPERATOR":
+            code = OPERATOR_CODES[match.group()]
+        elif kind == "NUMBER":
+            code = NUMBER_CODE
+        elif kind == "STRING":
+            code = STRING_CODE
+        else:
+            start, end = match.span()
+            columns.errors.append((typ.cast(str, kind), start + offset, end + offset))
+            continue
+        start, end = match.span()
+        types.append(code)
+        starts.append(start + offset)
+        ends.append(end + offset)
+
+    return columns
+
+
+def _buffer_error(buffer: TokenBuffer, kind: str, start: int, end: int) -> ScannerError:
+    if kind == "UNTERMINATED_STRING":
+        line = buffer.line_at(end)
+        return ScannerError(line, "unterminated string at line {}".format(line))
+    line = buffer.line_at(start)
+    char = _show(buffer.source[start:end])
+    message = 'unexpected character "{}" at line {}'.format(char, line)
+    return ScannerError(line, message)
+
+
+def _show(raw: str | bytes) -> str:
+    """raw as text for an error message, even if it isn't valid utf-8"""
+    return raw if isinstance(raw, str) else raw.decode(errors="replace")
+
+
+OPERATORS = {
+    **UNAMBIGUOUS_SINGLE_CHARS,
+    "!": TokenTypes.BANG,
+    "!=": TokenTypes.BANG_EQUAL,
+    "=": TokenTypes.EQUAL,
+    "==": TokenTypes.EQUAL_EQUAL,
+    "<": TokenTypes.LESS,
+    "<=": TokenTypes.LESS_EQUAL,
+    ">": TokenTypes.GREATER,
+    ">=": TokenTypes.GREATER_EQUAL,
+    "/": TokenTypes.SLASH,
+}
+
+# matched operator text or bytes: (type, lexeme)
+OPERATOR_TOKENS: typ.Dict[str | bytes, typ.Tuple[TokenTypes, str]] = {
+    **{op: (type, op) for op, type in OPERATORS.items()},
+    **{op.encode(): (type, op) for op, type in OPERATORS.items()},
+}
+
+# type codes for TokenBuffer, by matched text or bytes
+KEYWORD_CODES: typ.Dict[str | bytes, int] = {
+    **{k: type.value for k, type in KEYWORDS.items()},
+    **{k.encode(): type.value for k, type in KEYWORDS.items()},
+}
+OPERATOR_CODES = {op: type.value for op, (type, _) in OPERATOR_TOKENS.items()}
+IDENTIFIER_CODE = TokenTypes.IDENTIFIER.value
+NUMBER_CODE = TokenTypes.NUMBER.value
+STRING_CODE = TokenTypes.STRING.value
+
+# Alternatives are tried in order, so comments must come before the '/'
+# operator, and the catch-all ERROR must come last. Every character of the
+# source is matched by exactly one alternative, so finditer never skips
+# anything.
+TRIVIA = r"""
+      (?P<WHITESPACE>[ \r\t]+)
+    | (?P<NEWLINE>\n)
+    | (?P<COMMENT>//[^\n]*)
+"""
+
+TRIVIA_RUN = r"""
+      (?P<TRIVIA>(?:[ \r\t\n]+|//[^\n]*)+)
+"""
+
+LEXEMES = r"""
+    | (?P<OPERATOR>[!=<>]=?|[(){},.\-+;*/])
+    | (?P<STRING>"[^"]*")
+    | (?P<UNTERMINATED_STRING>"[^"]*)
+    | (?P<NUMBER>\d+(?:\.\d+)?)
+    | (?P<IDENTIFIER>[^\W\d_]\w*)
+"""
+
+ERROR = r"""
+    | (?P<ERROR>.)
+"""
+
+# match whole utf-8 encoded characters, so they can be shown in the message
+BYTES_ERROR = r"""
+    | (?P<ERROR>[\xc0-\xff][\x80-\xbf]*|.)
+"""
+
+FLAGS = re.VERBOSE | re.DOTALL
+
+MASTER_PATTERN = re.compile(TRIVIA + LEXEMES + ERROR, FLAGS)
+TRIVIA_FREE_PATTERN = re.compile(TRIVIA_RUN + LEXEMES + ERROR, FLAGS)
+BYTES_MASTER_PATTERN = re.compile((TRIVIA + LEXEMES + BYTES_ERROR).encode(), FLAGS)
+BYTES_TRIVIA_FREE_PATTERN = re.compile(
+    (TRIVIA_RUN + LEXEMES + BYTES_ERROR).encode(), FLAGS
+)
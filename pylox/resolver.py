@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 from pylox.interpreter import Interpreter
 from pylox.parser import expressions, statements
 from pylox.token import Token
@@ -31,19 +31,34 @@ class Resolver:
         This resolver is an alternative to creating immutable/persistent
         environments on each variable declaration/definition.
 
+        Locals are stored in frames, by the slot the resolver gives them.
+        Each function call has a frame, which holds the locals of the
+        function and of every block and loop in it. A block or loop that
+        isn't in a function or another block has a frame of its own.
+
+        A local that a nested function uses is captured: its slot holds a
+        Cell, made each time it is declared. Each function has a list of the
+        cells it uses from the functions it's in, its upvalues, which a
+        closure copies from the frame it's made in. So a closure keeps only
+        the variables it uses, and not the frames they're in. A variable's
+        depth is how many functions out it's declared in: its slot is in the
+        current frame at depth 0, and otherwise an index into the upvalues.
+
         See https://craftinginterpreters.com/resolving-and-binding.html
     """
     def __init__(self, interpreter: Interpreter):
         self._interpreter = interpreter
-        self._scopes: List[Dict[str, bool]] = []  # lexeme: is_ready
+        self._scopes: List[Dict[str, Binding]] = []  # lexeme: binding
+        self._scope_nodes: List[Scoped] = []  # the node of each scope
+        self._frames: List[FrameOwner] = []  # the nodes that have frames
 
     def visit_block(self, stmt: statements.Block):
-        self._begin_scope()
+        self._begin_scope(stmt)
         self._resolve_all(stmt.statements)
         self._end_scope()
 
     def visit_variable_declaration(self, stmt: statements.VariableDeclaration):
-        self._declare(stmt.identifier)
+        stmt.slot = self._declare(stmt.identifier, stmt)
         if stmt.initialiser:
             self._resolve(stmt.initialiser)
         self._define(stmt.identifier)
@@ -51,7 +66,7 @@ class Resolver:
     def visit_variable_expression(self, expr: expressions.Variable):
         if (self._scopes
             and expr.identifier.lexeme in self._scopes[-1]
-            and not self._scopes[-1].get(expr.identifier.lexeme)):
+            and not self._scopes[-1][expr.identifier.lexeme].ready):
             raise ResolverException(expr.identifier, "Can't read local variable in its own initialiser")
         self._resolve_local(expr, expr.identifier.lexeme)
 
@@ -60,7 +75,7 @@ class Resolver:
         self._resolve_local(expr, expr.identifier.lexeme)
 
     def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
-        self._declare(stmt.name)
+        stmt.slot = self._declare(stmt.name, stmt)
         self._define(stmt.name)
         self._resolve_function(stmt)
 
@@ -77,6 +92,10 @@ class Resolver:
         self._resolve(stmt.expression)
 
     def visit_return_statement(self, stmt: statements.Return):
+        # inside a function, the innermost frame is the function's own
+        frame = self._frames[-1].node if self._frames else None
+        if not isinstance(frame, statements.FunctionDeclaration):
+            raise ResolverException(stmt.keyword, "Can't return from top-level code")
         if stmt.value:
             self._resolve(stmt.value)
 
@@ -84,6 +103,16 @@ class Resolver:
         self._resolve(stmt.condition)
         self._resolve(stmt.body)
 
+    def visit_for(self, stmt: statements.For):
+        self._begin_scope(stmt)
+        if stmt.initialiser:
+            self._resolve(stmt.initialiser)
+        self._resolve(stmt.condition)
+        if stmt.increment:
+            self._resolve(stmt.increment)
+        self._resolve_all(stmt.body)
+        self._end_scope()
+
     def visit_binary_expression(self, expr: expressions.Binary):
         self._resolve(expr.left)
         self._resolve(expr.right)
@@ -106,13 +135,40 @@ class Resolver:
     def visit_unary_expression(self, expr: expressions.Unary):
         self._resolve(expr.right)
 
-    def _resolve_local(self, expr: expressions.Expression, name: str):
-        irev = reversed(range(len(self._scopes)))
-        for i in irev:
-            if name in self._scopes[i]:
-                self._interpreter.resolve(expr, len(self._scopes) - 1 - i)
+    def _resolve_local(self, expr: "Use", name: str):
+        for scope in reversed(self._scopes):
+            binding = scope.get(name)
+            if binding is not None:
+                binding.uses.append(expr)
+                depth = len(self._frames) - 1 - binding.frame
+                if depth == 0:
+                    self._interpreter.resolve(expr, 0, binding.slot)
+                    return
+                binding.captured = True
+                upvalue = self._upvalue(len(self._frames) - 1, binding)
+                self._interpreter.resolve(expr, depth, upvalue)
                 return
 
+    def _upvalue(self, frame: int, binding: "Binding") -> int:
+        """The index of binding in the upvalues of self._frames[frame], which
+        is added if it isn't there yet, along with those of the functions
+        between binding's and it.
+        """
+        upvalues = self._frames[frame].upvalues
+        if binding in upvalues:
+            return upvalues[binding]
+        if binding.frame == frame - 1:
+            upvalue = (True, binding.slot)
+        else:
+            upvalue = (False, self._upvalue(frame - 1, binding))
+        upvalues[binding] = len(upvalues)
+        # only the outermost frame can be a block or loop's, and that has no
+        # frame outside it to take upvalues from
+        node = self._frames[frame].node
+        assert isinstance(node, statements.FunctionDeclaration)
+        node.upvalues.append(upvalue)
+        return upvalues[binding]
+
     def _resolve_all(self, stmts: List[statements.Statement]):
         for s in stmts:
             self._resolve(s)
@@ -124,32 +180,95 @@ class Resolver:
         expr.accept(self)
 
     def _resolve_function(self, func: statements.FunctionDeclaration):
-        self._begin_scope()
+        self._begin_scope(func)
         for param in func.params:
             self._declare(param)
             self._define(param)
         self._resolve_all(func.body)
+        params = [self._scopes[-1][param.lexeme] for param in func.params]
+        func.captured_params = [param.slot for param in params if param.captured]
         self._end_scope()
 
-    def _begin_scope(self):
+    def _begin_scope(self, node: "Scoped"):
+        # functions have frames, as do blocks and loops that aren't in a
+        # function or another block
+        if isinstance(node, statements.FunctionDeclaration) or not self._frames:
+            node.size = 0
+            if isinstance(node, statements.FunctionDeclaration):
+                node.upvalues = []
+            self._frames.append(FrameOwner(node))
         self._scopes.append({})
+        self._scope_nodes.append(node)
 
     def _end_scope(self):
-        self._scopes.pop()
-
-    def _declare(self, name: Token):
+        scope = self._scopes.pop()
+        # whether a local is captured is only known once all of its scope has
+        # been resolved, so its declaration and uses are told now
+        for binding in scope.values():
+            for node in binding.uses:
+                node.captured = binding.captured
+        if self._scope_nodes.pop() is self._frames[-1].node:
+            self._frames.pop()
+
+    def _declare(
+        self, name: Token, declaration: Optional["Declaration"] = None
+    ) -> Optional[int]:
+        """Returns the slot for name, or None if it's a global. declaration
+        is None for params.
+        """
         if len(self._scopes) == 0:
-            return
+            return None
         scope = self._scopes[-1]
         if name.lexeme in scope:
             raise ResolverException(name, f"'{name.lexeme}' is already defined in this scope")
-        scope[name.lexeme] = False
+        frame = self._frames[-1].node
+        binding = Binding(frame.size, len(self._frames) - 1)
+        frame.size += 1
+        if declaration is not None:
+            binding.uses.append(declaration)
+        scope[name.lexeme] = binding
+        return binding.slot
 
     def _define(self, name: Token):
         if len(self._scopes) == 0:
             return
         scope = self._scopes[-1]
-        scope[name.lexeme] = True
+        scope[name.lexeme].ready = True
+
+
+Scoped = statements.Block | statements.For | statements.FunctionDeclaration
+Declaration = statements.VariableDeclaration | statements.FunctionDeclaration
+Use = expressions.Variable | expressions.Assignment
+
+
+class FrameOwner:
+    """A function, or a block or loop outside of functions, while the
+    Resolver is in it. upvalues are the indexes of the bindings that a
+    function uses from the functions it's in, in its upvalues.
+    """
+
+    __slots__ = ("node", "upvalues")
+
+    def __init__(self, node: Scoped):
+        self.node = node
+        self.upvalues: Dict[Binding, int] = {}
+
+
+class Binding:
+    """A local variable, while the Resolver is in its scope. frame is the
+    index in Resolver._frames of the frame it's in. It's captured if a
+    function nested in that frame's uses it. uses are its declaration, if
+    it isn't a param, and the expressions that use it.
+    """
+
+    __slots__ = ("ready", "slot", "frame", "captured", "uses")
+
+    def __init__(self, slot: int, frame: int):
+        self.ready = False
+        self.slot = slot
+        self.frame = frame
+        self.captured = False
+        self.uses: List[Declaration | Use] = []
 
 
 class ResolverException(Exception):
@@ -3,16 +3,28 @@ from .token_types import TokenTypes
 
 
 class Scanner:
-    def __init__(self, bytes: str | bytes):
+    def __init__(self, bytes: str | bytes, line: int = 1):
+        if not isinstance(bytes, str):
+            # this scanner works on characters. See RegexScanner for
+            # scanning bytes without decoding them up front.
+            bytes = str(bytes, "utf-8")
         self.bytes = bytes
         self.start_idx = 0
         self.current_idx = 0
-        self.line_num = 1
-
-    def scan_tokens(self):
+        self.line_num = line
+        self.skip_trivia = False
+
+    def scan_tokens(self, skip_trivia: bool = False):
+        """skip_trivia: don't create whitespace, newline and comment tokens.
+        The parser ignores them anyway, so there's no need to create them
+        unless something wants to print or inspect the full token stream.
+        """
+        self.skip_trivia = skip_trivia
         while not self._is_finished():
             self.start_idx = self.current_idx
-            yield self._consume_token()
+            token = self._consume_token()
+            if token is not None:
+                yield token
         yield Token(TokenTypes.EOF, "", None, self.line_num)
 
     def _is_finished(self):
@@ -27,7 +39,7 @@ class Scanner:
         elif first_char in WHITESPACE:
             return self._consume_whitespace_token()
         elif first_char == NEWLINE:
-            token = self._create_token(TokenTypes.NEWLINE)
+            token = self._create_trivia_token(TokenTypes.NEWLINE)
             self.line_num += 1
             return token
         elif first_char == '"':
@@ -68,7 +80,7 @@ class Scanner:
                 while self._peek() != "\n" and not self._is_finished():
                     self._consume_next_char()
                 comment_literal = self.bytes[self.start_idx + 2 : self.current_idx]
-                return self._create_token(TokenTypes.COMMENT, comment_literal)
+                return self._create_trivia_token(TokenTypes.COMMENT, comment_literal)
             else:
                 return self._create_token(TokenTypes.SLASH)
 
@@ -77,7 +89,7 @@ class Scanner:
     def _consume_whitespace_token(self):
         while self._peek() in WHITESPACE and not self._is_finished():
             self._consume_next_char()
-        return self._create_token(TokenTypes.WHITESPACE)
+        return self._create_trivia_token(TokenTypes.WHITESPACE)
 
     def _consume_string_token(self):
         while self._peek() != '"' and not self._is_finished():
@@ -152,6 +164,11 @@ class Scanner:
         text = str(self.bytes[self.start_idx : self.current_idx])
         return Token(type, text, literal, self.line_num)
 
+    def _create_trivia_token(self, type, literal=None):
+        if self.skip_trivia:
+            return None
+        return self._create_token(type, literal)
+
 
 class ScannerError:
     def __init__(self, line, message):
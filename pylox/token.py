@@ -12,6 +12,8 @@ class Token:
              lexeme, eg number values
     """
 
+    __slots__ = ("type", "lexeme", "literal", "line")
+
     def __init__(
         self, type: TokenTypes, lexeme: str, literal: str | float | None, line: int
     ):
@@ -0,0 +1,118 @@
+import bisect
+import sys
+import typing as typ
+from array import array
+
+from .scanner import KEYWORDS, ScannerError
+from .token import Token
+from .token_types import TokenTypes
+
+TYPES_BY_VALUE = {type.value: type for type in TokenTypes}
+
+# tokens whose lexeme is always the same, so needn't be sliced from the source
+FIXED_LEXEMES = {
+    **{type: keyword for keyword, type in KEYWORDS.items()},
+    TokenTypes.LEFT_PAREN: "(",
+    TokenTypes.RIGHT_PAREN: ")",
+    TokenTypes.LEFT_BRACE: "{",
+    TokenTypes.RIGHT_BRACE: "}",
+    TokenTypes.COMMA: ",",
+    TokenTypes.DOT: ".",
+    TokenTypes.MINUS: "-",
+    TokenTypes.PLUS: "+",
+    TokenTypes.SEMICOLON: ";",
+    TokenTypes.SLASH: "/",
+    TokenTypes.STAR: "*",
+    TokenTypes.BANG: "!",
+    TokenTypes.BANG_EQUAL: "!=",
+    TokenTypes.EQUAL: "=",
+    TokenTypes.EQUAL_EQUAL: "==",
+    TokenTypes.GREATER: ">",
+    TokenTypes.GREATER_EQUAL: ">=",
+    TokenTypes.LESS: "<",
+    TokenTypes.LESS_EQUAL: "<=",
+    TokenTypes.EOF: "",
+}
+
+
+class TokenBuffer:
+    """A compact alternative to a list of Token objects. Each token is a
+    type code and start/end offsets into the source, stored in arrays.
+    Lexemes and literals are sliced from the source when asked for, and line
+    numbers are found by a binary search of the offsets where each line
+    starts.
+
+    Indexing the buffer creates a Token, for the few tokens that need one,
+    eg. identifiers kept in the AST, or tokens in error messages.
+    Trivia (whitespace, newlines, comments) isn't stored.
+
+    See RegexScanner.scan_buffer.
+    """
+
+    def __init__(self, source: str | bytes, line: int = 1):
+        self.source = source
+        self.first_line = line
+        self.types = array("H")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.errors: typ.List[ScannerError] = []
+        self._line_starts: typ.Optional[array] = None
+        self._lines: typ.Dict[int, int] = {}
+
+    def append(self, type: TokenTypes, start: int, end: int):
+        self.types.append(type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, idx: int) -> Token:
+        return Token(
+            self.type(idx), self.lexeme(idx), self.literal(idx), self.line(idx)
+        )
+
+    def type(self, idx: int) -> TokenTypes:
+        return TYPES_BY_VALUE[self.types[idx]]
+
+    def type_list(self) -> typ.List[TokenTypes]:
+        return list(map(TYPES_BY_VALUE.__getitem__, self.types))
+
+    def lexeme(self, idx: int) -> str:
+        fixed = FIXED_LEXEMES.get(self.type(idx))
+        if fixed is not None:
+            return fixed
+        # interned, so that the many tokens for the same name share a string
+        lexeme = self.source[self.starts[idx] : self.ends[idx]]
+        if isinstance(lexeme, str):
+            return sys.intern(lexeme)
+        return sys.intern(lexeme.decode())
+
+    def literal(self, idx: int) -> str | float | None:
+        type = self.type(idx)
+        if type == TokenTypes.NUMBER:
+            return float(self.lexeme(idx))
+        if type == TokenTypes.STRING:
+            return self.lexeme(idx)[1:-1]
+        return None
+
+    def line(self, idx: int) -> int:
+        # The line of the token's last character, as multi-line strings get
+        # the line they end on. EOF is an empty token after everything else.
+        return self.line_at(max(self.starts[idx], self.ends[idx] - 1))
+
+    def line_at(self, offset: int) -> int:
+        if self._line_starts is None:
+            self._line_starts = self._find_line_starts()
+        line = bisect.bisect_right(self._line_starts, offset) + self.first_line - 1
+        # share one int per line between tokens, rather than one per token
+        return self._lines.setdefault(line, line)
+
+    def _find_line_starts(self) -> array:
+        newline = "\n" if isinstance(self.source, str) else b"\n"
+        line_starts = array("I", [0])
+        idx = self.source.find(newline)  # type: ignore
+        while idx != -1:
+            line_starts.append(idx + 1)
+            idx = self.source.find(newline, idx + 1)  # type: ignore
+        return line_starts
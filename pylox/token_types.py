@@ -2,6 +2,10 @@ from enum import Enum
 
 
 class TokenTypes(Enum):
+    # Members are singletons, so hash them by identity. Enum's own __hash__
+    # is python code, which makes looking them up in dicts and sets slow.
+    __hash__ = object.__hash__
+
     # Single-character tokens
     LEFT_PAREN = 1
     RIGHT_PAREN = 2
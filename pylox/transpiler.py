@@ -0,0 +1,676 @@
+import getpass
+import hashlib
+import importlib.util
+import marshal
+import math
+import os
+import stat
+import sys
+import tempfile
+import types
+import typing as typ
+
+from . import __version__
+from .callable import Callable
+from .environment import UNDEFINED, Cell, Environment
+from .interpreter import Interpreter, InterpreterException
+from .io import OutputStream
+from .optimiser.type_inference import is_boolean
+from .parser import expressions, statements
+from .token import Token
+from .token_types import TokenTypes as t
+
+# Lox's binary operators, as Python writes them
+OPERATORS = {
+    t.MINUS: "-",
+    t.SLASH: "/",
+    t.STAR: "*",
+    t.PLUS: "+",
+    t.GREATER: ">",
+    t.GREATER_EQUAL: ">=",
+    t.LESS: "<",
+    t.LESS_EQUAL: "<=",
+    t.EQUAL_EQUAL: "==",
+    t.BANG_EQUAL: "!=",
+}
+
+# The types of literals, as the Python written for them refers to them
+TYPE_NAMES = {float: "float", str: "str", bool: "bool", type(None): "_lox_NoneType"}
+
+# Bump this whenever the Python that the Transpiler writes changes in a way
+# that its source doesn't show, so that cached modules are compiled again.
+CACHE_FORMAT = 1
+
+CACHE_DIR_NAME = "pylox_modules"
+
+# Modules shorter than this are compiled rather than looked up in the
+# ModuleCache, as compiling them is quicker than reading them back.
+MIN_CACHED_SOURCE = 500
+
+
+class PythonModule:
+    """Python source written by the Transpiler. It defines _lox_run, which
+    runs the statements it was written from. nodes are the expressions that
+    its errors are raised for, by index, and globals are the names of the
+    globals it uses: it refers to the cell of globals[i] as _lox_g{i}.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        nodes: typ.List[expressions.Expression],
+        globals: typ.List[str],
+    ):
+        self.source = source
+        self.nodes = nodes
+        self.globals = globals
+
+
+class Transpiler:
+    """Writes resolved statements as Python source, for the
+    PythonInterpreter.
+
+    Each Lox function becomes a nested def, and its locals Python locals, so
+    Python's own compiler and frames do the work that the other engines do
+    by slot. A local is named after its lexeme, the frame it's in and its
+    slot, so that locals that share a lexeme don't clash. Functions use
+    captured locals through Python's closures, with nonlocal for the ones
+    they assign to.
+
+    Python makes one variable per call for each local, but Lox makes one
+    each time a declaration runs. The two only differ for a local that's
+    declared in a loop, where each closure that captures it must keep the
+    one from its own iteration, so such a local is a Cell, which the
+    closures that use it get as keyword only params.
+
+    The operators check their operands as the Interpreter does, inline,
+    unless the TypeInferrer has found their types.
+    """
+
+    def __init__(self):
+        self.lines: typ.List[str] = []
+        self.indent = 0
+        self.nodes: typ.List[expressions.Expression] = []
+        self.globals: typ.Dict[str, str] = {}  # lexeme: name of its cell
+        self.temporaries = 0
+        self.frames = 0
+        # the locals that are Cells
+        self.cells: typ.Set[str] = set()
+        # the Lox frame that the code being written is in: its number, and
+        # the names of its locals by slot. None outside any frame.
+        self.frame: typ.Optional[int] = None
+        self.names: typ.Dict[int, str] = {}
+        # of the def being written: the names of its upvalues by index, how
+        # many loops deep the code is, and the upvalues it assigns to
+        self.upvalues: typ.List[str] = []
+        self.loops = 0
+        self.nonlocals: typ.Set[str] = set()
+
+    def transpile(self, stmts: typ.Iterable[statements.Statement]) -> PythonModule:
+        """Writes stmts as a module. Each Transpiler writes one."""
+        self.write("def _lox_run():")
+        self.suite(stmts)
+        source = "\n".join(self.lines) + "\n"
+        return PythonModule(source, self.nodes, list(self.globals))
+
+    def execute(self, stmt: statements.Statement):
+        stmt.accept(self)
+
+    def suite(self, stmts: typ.Iterable[statements.Statement]):
+        """Writes stmts, indented, as the body of the line before"""
+        self.indent += 1
+        start = len(self.lines)
+        for stmt in stmts:
+            stmt.accept(self)
+        if len(self.lines) == start:
+            self.write("pass")
+        self.indent -= 1
+
+    def evaluate(self, expr: expressions.Expression) -> str:
+        return expr.accept(self)
+
+    def condition(self, expr: expressions.Expression) -> str:
+        """A Python expression for whether expr's value is truthy"""
+        value = self.evaluate(expr)
+        if is_boolean(expr):
+            return value
+        temporary = self.temporary()
+        return f"({temporary} := {value}) is not None and {temporary} is not False"
+
+    def discard(self, expr: expressions.Expression):
+        """Writes expr as a statement, for its effects only"""
+        if isinstance(expr, expressions.Assignment) and expr.depth is not None:
+            value = self.evaluate(expr.expression)
+            name = self.local(expr)
+            if name in self.cells:
+                self.write(f"{name}.value = {value}")
+                return
+            if expr.depth:
+                self.nonlocals.add(name)
+            self.write(f"{name} = {value}")
+            return
+        self.write(self.evaluate(expr))
+
+    # statements
+
+    def visit_expression_statement(self, stmt: statements.ExpressionStatement):
+        self.discard(stmt.expression)
+
+    def visit_print_statement(self, stmt: statements.Print):
+        value = self.evaluate(stmt.expression)
+        if is_boolean(stmt.expression):
+            self.write(f"_lox_send({value})")
+            return
+        temporary = self.temporary()
+        value = f'"nil" if ({temporary} := {value}) is None else {temporary}'
+        self.write(f"_lox_send({value})")
+
+    def visit_return_statement(self, stmt: statements.Return):
+        if stmt.value is None:
+            self.write("return None")
+        else:
+            self.write(f"return {self.evaluate(stmt.value)}")
+
+    def visit_variable_declaration(self, stmt: statements.VariableDeclaration):
+        value = "None"
+        if stmt.initialiser:
+            value = self.evaluate(stmt.initialiser)
+        self.define(stmt.identifier, stmt.slot, stmt.captured, value)
+
+    def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
+        lexeme = stmt.name.lexeme
+        if stmt.slot is None:
+            name = None
+            python_name = f"_lox_def_{_identifier(lexeme)}"
+        else:
+            name = python_name = self.declare(stmt.name, stmt.slot, stmt.captured)
+            if name in self.cells:
+                # made first, so that the function can use itself
+                python_name = f"_lox_def_{_identifier(lexeme)}"
+                self.write(f"{name} = _lox_Cell(None)")
+        upvalues = [
+            self.names[index] if in_frame else self.upvalues[index]
+            for in_frame, index in stmt.upvalues
+        ]
+
+        enclosing = self.frame, self.names, self.upvalues, self.loops, self.nonlocals
+        self.enter_frame()
+        self.upvalues, self.loops, self.nonlocals = upvalues, 0, set()
+        params = [
+            self.declare(param, slot, slot in stmt.captured_params)
+            for slot, param in enumerate(stmt.params)
+        ]
+        cells = [f"{cell}={cell}" for cell in upvalues if cell in self.cells]
+        if cells:
+            params += ["*", *cells]
+        self.write(f"def {python_name}({', '.join(params)}):")
+        start = len(self.lines)
+        self.suite(stmt.body)
+        if self.nonlocals:
+            # only known once the body is written
+            indent = "    " * (self.indent + 1)
+            nonlocals = ", ".join(sorted(self.nonlocals))
+            self.lines.insert(start, f"{indent}nonlocal {nonlocals}")
+        self.frame, self.names, self.upvalues, self.loops, self.nonlocals = enclosing
+
+        function = f"_lox_Function({python_name}, {lexeme!r}, {len(stmt.params)})"
+        if name is None:
+            self.write(f"{self.global_cell(lexeme)}.value = {function}")
+        elif name in self.cells:
+            self.write(f"{name}.value = {function}")
+        else:
+            self.write(f"{name} = {function}")
+
+    def visit_block(self, stmt: statements.Block):
+        outermost = self.frame is None
+        if outermost:
+            self.enter_frame()
+        for statement in stmt.statements:
+            self.execute(statement)
+        if outermost:
+            self.frame = None
+
+    def visit_if(self, stmt: statements.If):
+        self.write(f"if {self.condition(stmt.condition)}:")
+        self.suite([stmt.thenBranch])
+        branch = stmt.elseBranch
+        # else if chains are written as elifs, rather than nested ever deeper
+        while isinstance(branch, statements.If):
+            self.write(f"elif {self.condition(branch.condition)}:")
+            self.suite([branch.thenBranch])
+            branch = branch.elseBranch
+        if branch is not None:
+            self.write("else:")
+            self.suite([branch])
+
+    def visit_while(self, stmt: statements.While):
+        self.write(f"while {self.condition(stmt.condition)}:")
+        self.loops += 1
+        self.suite([stmt.body])
+        self.loops -= 1
+
+    def visit_for(self, stmt: statements.For):
+        outermost = self.frame is None
+        if outermost:
+            self.enter_frame()
+        if stmt.initialiser is not None:
+            self.execute(stmt.initialiser)
+        self.write(f"while {self.condition(stmt.condition)}:")
+        self.loops += 1
+        self.indent += 1
+        start = len(self.lines)
+        for statement in stmt.body:
+            self.execute(statement)
+        if stmt.increment is not None:
+            self.discard(stmt.increment)
+        if len(self.lines) == start:
+            self.write("pass")
+        self.indent -= 1
+        self.loops -= 1
+        if outermost:
+            self.frame = None
+
+    # variables
+
+    def enter_frame(self):
+        self.frames += 1
+        self.frame = self.frames
+        self.names = {}
+
+    def declare(self, name: Token, slot: int, captured: bool) -> str:
+        """Names the local in slot of the current frame"""
+        python_name = f"{_identifier(name.lexeme)}_{self.frame}_{slot}"
+        self.names[slot] = python_name
+        if captured and self.loops:
+            self.cells.add(python_name)
+        return python_name
+
+    def define(self, name: Token, slot: typ.Optional[int], captured: bool, value: str):
+        if slot is None:
+            self.write(f"{self.global_cell(name.lexeme)}.value = {value}")
+            return
+        python_name = self.declare(name, slot, captured)
+        if python_name in self.cells:
+            self.write(f"{python_name} = _lox_Cell({value})")
+        else:
+            self.write(f"{python_name} = {value}")
+
+    def local(self, expr: expressions.Variable | expressions.Assignment) -> str:
+        # only globals have no slot
+        slot = typ.cast(int, expr.slot)
+        if expr.depth:
+            return self.upvalues[slot]
+        return self.names[slot]
+
+    def global_cell(self, lexeme: str) -> str:
+        name = self.globals.get(lexeme)
+        if name is None:
+            name = self.globals[lexeme] = f"_lox_g{len(self.globals)}"
+        return name
+
+    # expressions
+
+    def visit_literal_expression(self, expr: expressions.Literal) -> str:
+        return _literal(expr.value)
+
+    def visit_grouping_expression(self, expr: expressions.Grouping) -> str:
+        return self.evaluate(expr.expression)
+
+    def visit_variable_expression(self, expr: expressions.Variable) -> str:
+        if expr.depth is None:
+            cell = self.global_cell(expr.identifier.lexeme)
+            value = self.temporary()
+            return (
+                f"({value} if ({value} := {cell}.value) is not _lox_UNDEFINED"
+                f" else _lox_undefined({self.node(expr)}))"
+            )
+        name = self.local(expr)
+        return f"{name}.value" if name in self.cells else name
+
+    def visit_assignment_expression(self, expr: expressions.Assignment) -> str:
+        value = self.evaluate(expr.expression)
+        if expr.depth is None:
+            cell = self.global_cell(expr.identifier.lexeme)
+            return f"_lox_assign({cell}, {value}, {self.node(expr)})"
+        name = self.local(expr)
+        if name in self.cells:
+            return f"_lox_store({name}, {value})"
+        if expr.depth:
+            self.nonlocals.add(name)
+        return f"({name} := {value})"
+
+    def visit_call(self, expr: expressions.Call) -> str:
+        callee = self.temporary()
+        node = self.node(expr)
+        if not expr.args:
+            function = self.evaluate(expr.callee)
+            return (
+                f"({callee}.function() if type({callee} := {function})"
+                f" is _lox_Function and {callee}.param_count == 0"
+                f" else _lox_call({callee}, (), {node}))"
+            )
+        # the callee and args are evaluated into temporaries first, so that
+        # they're evaluated in order, and only once, whichever way the call
+        # goes
+        args = [self.temporary() for _ in expr.args]
+        evaluated = ", ".join(
+            f"({name} := {self.evaluate(arg)})"
+            for name, arg in zip([callee, *args], [expr.callee, *expr.args])
+        )
+        return (
+            f"({callee}.function({', '.join(args)}) if ({evaluated})"
+            f" and type({callee}) is _lox_Function"
+            f" and {callee}.param_count == {len(args)}"
+            f" else _lox_call({callee}, ({', '.join(args)},), {node}))"
+        )
+
+    def visit_logical_expression(self, expr: expressions.Logical) -> str:
+        left = self.evaluate(expr.left)
+        right = self.evaluate(expr.right)
+        keyword = "or" if expr.operator.type == t.OR else "and"
+        if is_boolean(expr.left):
+            return f"({left} {keyword} {right})"
+        value = self.temporary()
+        decides = "is not None and" if keyword == "or" else "is None or"
+        sense = "is not" if keyword == "or" else "is"
+        return (
+            f"({value} if ({value} := {left}) {decides} {value} {sense} False"
+            f" else {right})"
+        )
+
+    def visit_unary_expression(self, expr: expressions.Unary) -> str:
+        right = self.evaluate(expr.right)
+        if expr.operator.type == t.BANG:
+            if is_boolean(expr.right):
+                return f"(not {right})"
+            value = self.temporary()
+            return f"(({value} := {right}) is None or {value} is False)"
+        if expr.operand_type is not None:
+            return f"(-{right})"
+        value = self.temporary()
+        return (
+            f"(-{value} if type({value} := {right}) is float"
+            f' else _lox_fail({self.node(expr)}, "operand must be a number"))'
+        )
+
+    def visit_binary_expression(self, expr: expressions.Binary) -> str:
+        operator = OPERATORS[expr.operator.type]
+        left = self.evaluate(expr.left)
+        right = self.evaluate(expr.right)
+        if expr.operand_type is not None:
+            return f"({left} {operator} {right})"
+
+        # Operands are put in temporaries to check their types, except for
+        # literals, whose types are known
+        a, a_type = self.operand(expr.left, left)
+        b, b_type = self.operand(expr.right, right)
+        type_ = expr.operator.type
+        if type_ == t.EQUAL_EQUAL:
+            return f"({a_type} is {b_type} and {a} == {b})"
+        if type_ == t.BANG_EQUAL:
+            return f"({a_type} is not {b_type} or {a} != {b})"
+
+        if type_ == t.PLUS:
+            condition = f"{a_type} is {b_type}"
+            if not (
+                _is_literal(expr.left, (float, str))
+                or _is_literal(expr.right, (float, str))
+            ):
+                condition += f" and (type({a}) is float or type({a}) is str)"
+            message = "invalid operands for binary expression"
+        else:
+            checks = [
+                f"({operand_type} is float)"
+                for operand, operand_type in ((expr.left, a_type), (expr.right, b_type))
+                if not _is_literal(operand, (float,))
+            ]
+            # & rather than and, so that the right operand is evaluated even
+            # if the left is the wrong type, as it is by the Interpreter
+            condition = " & ".join(checks) or "True"
+            message = "operands must be numbers"
+        return (
+            f"({a} {operator} {b} if {condition}"
+            f' else _lox_fail({self.node(expr)}, "{message}"))'
+        )
+
+    def operand(self, expr: expressions.Expression, value: str) -> typ.Tuple[str, str]:
+        """The value of a binary operand, and a Python expression for its
+        type. The type is written first: it evaluates the operand, if it isn't
+        a literal.
+        """
+        if isinstance(expr, expressions.Grouping):
+            return self.operand(expr.expression, value)
+        if isinstance(expr, expressions.Literal):
+            return value, TYPE_NAMES[type(expr.value)]
+        temporary = self.temporary()
+        return temporary, f"type({temporary} := {value})"
+
+    # code
+
+    def write(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def temporary(self) -> str:
+        self.temporaries += 1
+        return f"_t{self.temporaries}"
+
+    def node(self, expr: expressions.Expression) -> str:
+        """A Python expression for expr, for the errors raised for it"""
+        self.nodes.append(expr)
+        return f"_lox_nodes[{len(self.nodes) - 1}]"
+
+
+def _identifier(lexeme: str) -> str:
+    # the optimiser's temporaries have names that Python's can't
+    return lexeme if lexeme.isidentifier() else "tmp"
+
+
+def _user() -> str:
+    """Who's running pylox, to name their cache directory by"""
+    if hasattr(os, "getuid"):
+        return str(os.getuid())
+    return getpass.getuser()
+
+
+def _literal(value: typ.Any) -> str:
+    if isinstance(value, float) and not math.isfinite(value):
+        return f'float("{value}")'
+    return repr(value)
+
+
+def _is_literal(expr: expressions.Expression, types: typ.Tuple[type, ...]) -> bool:
+    while isinstance(expr, expressions.Grouping):
+        expr = expr.expression
+    return isinstance(expr, expressions.Literal) and type(expr.value) in types
+
+
+class ModuleCache:
+    """Stores the code objects that Python compiles modules into on disk,
+    like its own .pyc files, so that a program that's run again needn't be
+    compiled again. Each file is named by a hash of the module's source, the
+    pylox and Python versions, and CACHE_FORMAT, so a file is only ever read
+    for the source it was compiled from.
+
+    The code is run as it's read, so the cache is only used while its
+    directory is the user's own, and no one else can write to it. By default
+    it's a directory for the user in the system's temp directory.
+    """
+
+    def __init__(self, directory: typ.Optional[str] = None):
+        self.directory = directory or os.path.join(
+            tempfile.gettempdir(), f"{CACHE_DIR_NAME}-{_user()}"
+        )
+
+    def compile(self, source: str) -> types.CodeType:
+        if len(source) < MIN_CACHED_SOURCE:
+            return compile(source, "<lox>", "exec")
+        code = self.load(source)
+        if code is None:
+            code = compile(source, "<lox>", "exec")
+            self.store(source, code)
+        return code
+
+    def load(self, source: str) -> typ.Optional[types.CodeType]:
+        if not self.trusted():
+            return None
+        try:
+            with open(self.path(source), "rb") as infile:
+                code = marshal.load(infile)
+        except Exception:
+            # missing, unreadable and corrupt files are all just misses
+            return None
+        return code if isinstance(code, types.CodeType) else None
+
+    def store(self, source: str, code: types.CodeType):
+        cached = self.path(source)
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            if not self.trusted():
+                return
+            # write then rename, so that a half written file is never read
+            temp = f"{cached}.{os.getpid()}.tmp"
+            with open(temp, "wb") as outfile:
+                marshal.dump(code, outfile)
+            os.replace(temp, cached)
+        except OSError:
+            # the cache only saves time, so a program runs without it
+            pass
+
+    def trusted(self) -> bool:
+        """Whether the directory is one that only the user can write to"""
+        try:
+            info = os.lstat(self.directory)
+        except OSError:
+            return False
+        if not stat.S_ISDIR(info.st_mode):
+            return False
+        if not hasattr(os, "getuid"):
+            # Windows: the temp directory is already the user's own
+            return True
+        return info.st_uid == os.getuid() and not info.st_mode & 0o022
+
+    def path(self, source: str) -> str:
+        hash = hashlib.sha256(
+            f"pylox {__version__} {CACHE_FORMAT}\n".encode()
+            + importlib.util.MAGIC_NUMBER
+        )
+        hash.update(source.encode())
+        return os.path.join(self.directory, f"{hash.hexdigest()}.pyc")
+
+
+class PythonInterpreter(Interpreter):
+    """Runs statements by transpiling them into a Python module, and running
+    that. Behaves as the Interpreter does, and raises the same errors, but
+    as each Lox call is one Python call, deep recursion runs out of Python's
+    stack sooner than the VirtualMachine's.
+
+    cache is where the modules' code is kept between runs.
+    """
+
+    def __init__(
+        self,
+        output: typ.Optional[OutputStream] = None,
+        environment: typ.Optional[Environment] = None,
+        cache: typ.Optional[ModuleCache] = None,
+    ):
+        super().__init__(output, environment)
+        self.cache = cache or ModuleCache()
+        # what the modules refer to, besides their nodes, globals and output
+        self.builtins = {
+            "_lox_call": self.call,
+            "_lox_fail": _fail,
+            "_lox_undefined": _undefined,
+            "_lox_assign": _assign,
+            "_lox_store": _store,
+            "_lox_Cell": Cell,
+            "_lox_Function": PythonFunction,
+            "_lox_NoneType": type(None),
+            "_lox_UNDEFINED": UNDEFINED,
+        }
+
+    def interpret(self, statements: typ.Iterable[statements.Statement]):
+        statements = list(statements)
+        try:
+            module = Transpiler().transpile(statements)
+            code = self.cache.compile(module.source)
+        except (SyntaxError, RecursionError):
+            # Python can't compile expressions nested as deeply as Lox can
+            # run them, so the Interpreter runs these statements instead
+            super().interpret(statements)
+            return
+        namespace = dict(self.builtins)
+        namespace["_lox_nodes"] = module.nodes
+        namespace["_lox_send"] = self.out.send
+        for index, name in enumerate(module.globals):
+            namespace[f"_lox_g{index}"] = self.globals.cell(name)
+        exec(code, namespace)
+        namespace["_lox_run"]()
+
+    def call(self, callee: typ.Any, args: typ.Tuple, expr: expressions.Call):
+        """Calls what isn't a PythonFunction of the right arity"""
+        if not isinstance(callee, Callable):
+            raise InterpreterException(
+                expr, expr.closing_paren, "Can only call functions and classes"
+            )
+        if len(args) != callee.arity():
+            raise InterpreterException(
+                expr,
+                expr.closing_paren,
+                f"Expected {callee.arity()} args, got {len(args)}",
+            )
+        return callee.call(self, list(args))
+
+
+class PythonFunction(Callable):
+    """A function of the PythonInterpreter: the def it was transpiled to"""
+
+    __slots__ = ("function", "name", "param_count")
+
+    def __init__(self, function: typ.Callable, name: str, param_count: int):
+        self.function = function
+        self.name = name
+        self.param_count = param_count
+
+    def call(self, interpreter, args):
+        return self.function(*args)
+
+    def arity(self):
+        return self.param_count
+
+    def __repr__(self):
+        return f"<fn {self.name}>"
+
+
+def _fail(expr: expressions.Expression, message: str):
+    if isinstance(expr, (expressions.Binary, expressions.Unary)):
+        token = expr.operator
+    else:
+        token = typ.cast(expressions.Call, expr).closing_paren
+    raise InterpreterException(expr, token, message)
+
+
+def _undefined(expr: expressions.Variable | expressions.Assignment):
+    raise InterpreterException(
+        expr, expr.identifier, f"Undefined variable {expr.identifier.lexeme}"
+    )
+
+
+def _assign(cell: Cell, value: typ.Any, expr: expressions.Assignment):
+    if cell.value is UNDEFINED:
+        _undefined(expr)
+    cell.value = value
+    return value
+
+
+def _store(cell: Cell, value: typ.Any):
+    cell.value = value
+    return value
+
+
+if __name__ == "__main__":
+    # python -m pylox.transpiler <file>: print the Python a script becomes
+    from .lox import Lox
+
+    with open(sys.argv[1]) as infile:
+        program = Lox().compile(infile.read())
+    print(Transpiler().transpile(program.statements).source, end="")
@@ -0,0 +1,15 @@
+from .chunk import Chunk, CompileError
+from .compiler import Compiler
+from .disassembler import disassemble
+from .objects import Closure, Function
+from .vm import VirtualMachine
+
+__all__ = [
+    "Chunk",
+    "Closure",
+    "CompileError",
+    "Compiler",
+    "disassemble",
+    "Function",
+    "VirtualMachine",
+]
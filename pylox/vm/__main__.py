@@ -0,0 +1,15 @@
+import sys
+
+from ..environment import Environment
+from ..lox import Lox
+from .compiler import Compiler
+from .disassembler import disassemble
+
+if __name__ == "__main__":
+    # python -m pylox.vm <lox file>: print the bytecode it compiles to
+    with open(sys.argv[1], "rb") as infile:
+        program = Lox().compile(infile.read())
+    compiler = Compiler(Environment())
+    for statement in program.statements:
+        print(disassemble(compiler.compile(statement)))
+        print()
@@ -0,0 +1,59 @@
+import typing as typ
+from array import array
+
+from ..parser import expressions
+
+# The most a jump can cover, and the most constants a chunk can have
+MAX_OPERAND = 0xFFFF
+
+
+class Chunk:
+    """The bytecode of a function: its instructions, in 16 bit units, and the
+    constants they refer to.
+
+    lines has the source line of each unit of code, for the disassembler.
+    nodes has the expression that each instruction that can fail was
+    compiled from, by its offset, for the VirtualMachine to report errors
+    at, as the Interpreter does.
+    """
+
+    __slots__ = ("code", "constants", "lines", "nodes", "_constant_indexes")
+
+    def __init__(self):
+        self.code = array("H")
+        self.constants: typ.List[typ.Any] = []
+        self.lines = array("I")
+        self.nodes: typ.Dict[int, expressions.Expression] = {}
+        # each constant is only added once
+        self._constant_indexes: typ.Dict[typ.Tuple[type, typ.Any], int] = {}
+
+    def write(self, unit: int, line: int):
+        self.code.append(unit)
+        self.lines.append(line)
+
+    def add_constant(self, value: typ.Any) -> int:
+        """The index of value in the constants, adding it if need be"""
+        # numbers and strings by value, anything else by identity. 0.0 ==
+        # -0.0, but they aren't the same value to Lox, so floats go by hex.
+        key: typ.Tuple[type, typ.Any]
+        if isinstance(value, float):
+            key = (float, value.hex())
+        elif isinstance(value, str):
+            key = (str, value)
+        else:
+            key = (type(value), id(value))
+        index = self._constant_indexes.get(key)
+        if index is not None:
+            return index
+        index = len(self.constants)
+        if index > MAX_OPERAND:
+            raise CompileError("Too many constants in one function")
+        self.constants.append(value)
+        self._constant_indexes[key] = index
+        return index
+
+
+class CompileError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
@@ -0,0 +1,309 @@
+import typing as typ
+
+from ..environment import Environment
+from ..parser import expressions, statements
+from ..token_types import TokenTypes as t
+from . import opcodes as op
+from .chunk import MAX_OPERAND, CompileError
+from .objects import Function
+
+BINARY_OPCODES = {
+    t.MINUS: op.SUBTRACT,
+    t.SLASH: op.DIVIDE,
+    t.STAR: op.MULTIPLY,
+    t.PLUS: op.ADD,
+    t.GREATER: op.GREATER,
+    t.GREATER_EQUAL: op.GREATER_EQUAL,
+    t.LESS: op.LESS,
+    t.LESS_EQUAL: op.LESS_EQUAL,
+    t.EQUAL_EQUAL: op.EQUAL,
+    t.BANG_EQUAL: op.NOT_EQUAL,
+}
+
+
+class Compiler:
+    """Compiles resolved statements into bytecode for the VirtualMachine.
+
+    Each top level statement becomes a Function of its own, with no params,
+    whose frame holds the locals of the blocks and loops in it. Functions
+    keep their locals in the slots the Resolver gave them, as the
+    Interpreter does, so variables are read and written by slot, cell or
+    upvalue index.
+
+    Globals are compiled to their cells in environment, so the bytecode only
+    runs with those globals.
+
+    The line of each instruction is that of the last token compiled before
+    it.
+    """
+
+    def __init__(self, environment: Environment):
+        self.environment = environment
+        self.function = Function("script")
+        self.line = 0
+
+    def compile(self, stmt: statements.Statement) -> Function:
+        """Compiles a top level statement into a Function of no params"""
+        self.function = Function("script")
+        self.execute(stmt)
+        self.emit(op.NIL)
+        self.emit(op.RETURN)
+        self.function.finish()
+        return self.function
+
+    def execute(self, stmt: statements.Statement):
+        stmt.accept(self)
+
+    def execute_all(self, stmts: typ.List[statements.Statement]):
+        for stmt in stmts:
+            stmt.accept(self)
+
+    def evaluate(self, expr: expressions.Expression):
+        expr.accept(self)
+
+    def discard(self, expr: expressions.Expression):
+        """Compiles expr, for its effects only"""
+        if (
+            isinstance(expr, expressions.Assignment)
+            and expr.depth == 0
+            and not expr.captured
+        ):
+            # store it, rather than set it and pop it
+            self.evaluate(expr.expression)
+            self.line = expr.identifier.line
+            self.emit(op.STORE_LOCAL, expr.slot)
+            return
+        self.evaluate(expr)
+        self.emit(op.POP)
+
+    # statements
+
+    def visit_expression_statement(self, stmt: statements.ExpressionStatement):
+        self.discard(stmt.expression)
+
+    def visit_print_statement(self, stmt: statements.Print):
+        self.evaluate(stmt.expression)
+        self.emit(op.PRINT)
+
+    def visit_return_statement(self, stmt: statements.Return):
+        self.line = stmt.keyword.line
+        if stmt.value is None:
+            self.emit(op.NIL)
+        else:
+            self.evaluate(stmt.value)
+        self.emit(op.RETURN)
+
+    def visit_variable_declaration(self, stmt: statements.VariableDeclaration):
+        self.line = stmt.identifier.line
+        if stmt.initialiser:
+            self.evaluate(stmt.initialiser)
+        else:
+            self.emit(op.NIL)
+        self.define(stmt.identifier.lexeme, stmt.slot, stmt.captured)
+
+    def visit_function_declaration(self, stmt: statements.FunctionDeclaration):
+        self.line = stmt.name.line
+        enclosing = self.function
+        self.function = Function(
+            stmt.name.lexeme,
+            len(stmt.params),
+            stmt.size,
+            tuple(stmt.captured_params),
+            tuple(stmt.upvalues),
+        )
+        try:
+            self.execute_all(stmt.body)
+            self.emit(op.NIL)
+            self.emit(op.RETURN)
+            self.function.finish()
+            function = self.function
+        finally:
+            self.function = enclosing
+        self.line = stmt.name.line
+        if stmt.slot is not None and stmt.captured:
+            # The function's cell is made before the closure, which needs it
+            # if the function calls itself.
+            self.emit(op.NIL)
+            self.emit(op.STORE_CELL, stmt.slot)
+            self.emit(op.CLOSURE, self.constant(function))
+            self.emit(op.SET_CELL, stmt.slot)
+            self.emit(op.POP)
+            return
+        self.emit(op.CLOSURE, self.constant(function))
+        self.define(stmt.name.lexeme, stmt.slot, stmt.captured)
+
+    def visit_block(self, stmt: statements.Block):
+        self.frame(stmt.size)
+        self.execute_all(stmt.statements)
+
+    def visit_if(self, stmt: statements.If):
+        self.evaluate(stmt.condition)
+        to_else = self.emit_jump(op.JUMP_IF_FALSE)
+        self.execute(stmt.thenBranch)
+        if stmt.elseBranch is None:
+            self.patch_jump(to_else)
+            return
+        to_end = self.emit_jump(op.JUMP)
+        self.patch_jump(to_else)
+        self.execute(stmt.elseBranch)
+        self.patch_jump(to_end)
+
+    def visit_while(self, stmt: statements.While):
+        start = len(self.function.chunk.code)
+        self.evaluate(stmt.condition)
+        to_end = self.emit_jump(op.JUMP_IF_FALSE)
+        self.execute(stmt.body)
+        self.emit_loop(start)
+        self.patch_jump(to_end)
+
+    def visit_for(self, stmt: statements.For):
+        self.frame(stmt.size)
+        if stmt.initialiser is not None:
+            self.execute(stmt.initialiser)
+        start = len(self.function.chunk.code)
+        self.evaluate(stmt.condition)
+        to_end = self.emit_jump(op.JUMP_IF_FALSE)
+        self.execute_all(stmt.body)
+        if stmt.increment is not None:
+            self.discard(stmt.increment)
+        self.emit_loop(start)
+        self.patch_jump(to_end)
+
+    def frame(self, size: int):
+        """A block or loop outside any function has a frame of its own. Its
+        locals go in the script's frame, which is made big enough for them.
+        """
+        self.function.size = max(self.function.size, size)
+
+    def define(self, name: str, slot: typ.Optional[int], captured: bool):
+        """Stores the value on top of the stack in a new variable"""
+        if slot is None:
+            self.emit(op.DEFINE_GLOBAL, self.global_cell(name))
+        elif captured:
+            # a new cell each time, so that closures made by different runs of
+            # the declaration, as in a loop, each get their own
+            self.emit(op.STORE_CELL, slot)
+        else:
+            self.emit(op.STORE_LOCAL, slot)
+
+    # expressions
+
+    def visit_literal_expression(self, expr: expressions.Literal):
+        if expr.value is None:
+            self.emit(op.NIL)
+        elif expr.value is True:
+            self.emit(op.TRUE)
+        elif expr.value is False:
+            self.emit(op.FALSE)
+        else:
+            self.emit(op.CONSTANT, self.constant(expr.value))
+
+    def visit_grouping_expression(self, expr: expressions.Grouping):
+        self.evaluate(expr.expression)
+
+    def visit_variable_expression(self, expr: expressions.Variable):
+        self.line = expr.identifier.line
+        if expr.depth is None:
+            cell = self.global_cell(expr.identifier.lexeme)
+            self.emit(op.GET_GLOBAL, cell, node=expr)
+        elif expr.depth:
+            self.emit(op.GET_UPVALUE, expr.slot)
+        elif expr.captured:
+            self.emit(op.GET_CELL, expr.slot)
+        else:
+            self.emit(op.GET_LOCAL, expr.slot)
+
+    def visit_assignment_expression(self, expr: expressions.Assignment):
+        self.evaluate(expr.expression)
+        self.line = expr.identifier.line
+        if expr.depth is None:
+            cell = self.global_cell(expr.identifier.lexeme)
+            self.emit(op.SET_GLOBAL, cell, node=expr)
+        elif expr.depth:
+            self.emit(op.SET_UPVALUE, expr.slot)
+        elif expr.captured:
+            self.emit(op.SET_CELL, expr.slot)
+        else:
+            self.emit(op.SET_LOCAL, expr.slot)
+
+    def visit_call(self, expr: expressions.Call):
+        self.evaluate(expr.callee)
+        for arg in expr.args:
+            self.evaluate(arg)
+        self.line = expr.closing_paren.line
+        self.emit(op.CALL, len(expr.args), node=expr)
+
+    def visit_logical_expression(self, expr: expressions.Logical):
+        self.evaluate(expr.left)
+        self.line = expr.operator.line
+        if expr.operator.type == t.OR:
+            to_end = self.emit_jump(op.JUMP_IF_TRUE_OR_POP)
+        else:
+            to_end = self.emit_jump(op.JUMP_IF_FALSE_OR_POP)
+        self.evaluate(expr.right)
+        self.patch_jump(to_end)
+
+    def visit_unary_expression(self, expr: expressions.Unary):
+        self.evaluate(expr.right)
+        self.line = expr.operator.line
+        if expr.operator.type == t.BANG:
+            self.emit(op.NOT)
+        else:
+            self.emit(op.NEGATE, node=expr)
+
+    def visit_binary_expression(self, expr: expressions.Binary):
+        self.evaluate(expr.left)
+        opcode = BINARY_OPCODES[expr.operator.type]
+        right = expr.right
+        if isinstance(right, expressions.Literal) and isinstance(
+            right.value, (float, str)
+        ):
+            # one instruction, rather than a CONSTANT and the operator
+            self.line = expr.operator.line
+            constant = self.constant(right.value)
+            self.emit(opcode + op.CONSTANT_OPERAND, constant, node=expr)
+            return
+        self.evaluate(right)
+        self.line = expr.operator.line
+        self.emit(opcode, node=expr)
+
+    # code
+
+    def emit(
+        self,
+        opcode: int,
+        operand: typ.Optional[int] = None,
+        node: typ.Optional[expressions.Expression] = None,
+    ):
+        chunk = self.function.chunk
+        if node is not None:
+            chunk.nodes[len(chunk.code)] = node
+        chunk.write(opcode, self.line)
+        if operand is not None:
+            chunk.write(operand, self.line)
+
+    def constant(self, value: typ.Any) -> int:
+        return self.function.chunk.add_constant(value)
+
+    def global_cell(self, name: str) -> int:
+        return self.constant(self.environment.cell(name))
+
+    def emit_jump(self, opcode: int) -> int:
+        """Emits a jump to be patched, and returns the offset of its operand"""
+        self.emit(opcode, 0)
+        return len(self.function.chunk.code) - 1
+
+    def patch_jump(self, operand: int):
+        """Points the jump whose operand is at operand to the next instruction"""
+        code = self.function.chunk.code
+        distance = len(code) - operand - 1
+        if distance > MAX_OPERAND:
+            raise CompileError("Too much code to jump over")
+        code[operand] = distance
+
+    def emit_loop(self, start: int):
+        # back from the end of the loop instruction
+        distance = len(self.function.chunk.code) + 2 - start
+        if distance > MAX_OPERAND:
+            raise CompileError("Loop body too large")
+        self.emit(op.LOOP, distance)
@@ -0,0 +1,65 @@
+import typing as typ
+
+from ..environment import Cell
+from . import opcodes as op
+from .chunk import Chunk
+from .objects import Function
+
+# the instructions whose operand is the index of a constant
+CONSTANT_OPERANDS = {
+    op.CONSTANT,
+    op.CLOSURE,
+    op.GET_GLOBAL,
+    op.SET_GLOBAL,
+    op.DEFINE_GLOBAL,
+    *range(op.ADD_CONSTANT, op.NOT_EQUAL_CONSTANT + 1),
+}
+
+
+def disassemble(function: Function) -> str:
+    """A listing of function's bytecode, and that of the functions in it,
+    one instruction per line: its offset, its source line ("|" if it's the
+    same as the last instruction's), its name and its operand.
+    """
+    lines = [f"== {function.name} =="]
+    chunk = function.chunk
+    offset = 0
+    while offset < len(chunk.code):
+        text, offset = disassemble_instruction(chunk, offset)
+        lines.append(text)
+    for constant in chunk.constants:
+        if isinstance(constant, Function):
+            lines.append("")
+            lines.append(disassemble(constant))
+    return "\n".join(lines)
+
+
+def disassemble_instruction(chunk: Chunk, offset: int) -> typ.Tuple[str, int]:
+    """The line for the instruction at offset, and the offset of the next"""
+    opcode = chunk.code[offset]
+    if offset > 0 and chunk.lines[offset] == chunk.lines[offset - 1]:
+        line = "   |"
+    else:
+        line = f"{chunk.lines[offset]:4}"
+    text = f"{offset:04} {line} {op.NAMES[opcode]}"
+    if opcode not in op.HAS_OPERAND:
+        return text, offset + 1
+
+    operand = chunk.code[offset + 1]
+    text = f"{text:<30} {operand}"
+    if opcode in op.JUMPS:
+        text += f" -> {offset + 2 + operand}"
+    elif opcode == op.LOOP:
+        text += f" -> {offset + 2 - operand}"
+    elif opcode in CONSTANT_OPERANDS:
+        text += f" {_describe(chunk.constants[operand])}"
+    return text, offset + 2
+
+
+def _describe(constant: typ.Any) -> str:
+    if isinstance(constant, Cell) and constant.table is not None:
+        # a global's cell: show its name
+        for name, cell in constant.table.cells.items():
+            if cell is constant:
+                return repr(name)
+    return repr(constant)
@@ -0,0 +1,75 @@
+import typing as typ
+
+from ..callable import Callable
+from ..environment import Cell
+from .chunk import Chunk
+
+if typ.TYPE_CHECKING:
+    from .vm import VirtualMachine
+
+
+class Function:
+    """A compiled function, or top level statement ("script").
+
+    size, captured_params and upvalues are as the Resolver gave them to its
+    FunctionDeclaration. locals are the values that a call's frame starts
+    with, after its args. code is the chunk's code as a list, which the
+    VirtualMachine indexes quicker than an array.
+    """
+
+    __slots__ = (
+        "name",
+        "arity",
+        "size",
+        "captured_params",
+        "upvalues",
+        "chunk",
+        "locals",
+        "code",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        arity: int = 0,
+        size: int = 0,
+        captured_params: typ.Sequence[int] = (),
+        upvalues: typ.Sequence[typ.Tuple[bool, int]] = (),
+    ):
+        self.name = name
+        self.arity = arity
+        self.size = size
+        self.captured_params = captured_params
+        self.upvalues = upvalues
+        self.chunk = Chunk()
+        self.locals: typ.List[typ.Any] = []
+        self.code: typ.List[int] = []
+
+    def finish(self):
+        """Call once the chunk is written, and size is known"""
+        self.locals = [None] * (self.size - self.arity)
+        self.code = self.chunk.code.tolist()
+
+    def __repr__(self):
+        return f"<fn {self.name}>"
+
+
+class Closure(Callable):
+    """A Function, with the cells of the variables it uses from the functions
+    it's in. What Lox programs call.
+    """
+
+    __slots__ = ("function", "upvalues")
+
+    def __init__(self, function: Function, upvalues: typ.List[Cell]):
+        self.function = function
+        self.upvalues = upvalues
+
+    def call(self, interpreter: "VirtualMachine", args):
+        return interpreter.run(self, args)
+
+    def arity(self):
+        return self.function.arity
+
+    def __repr__(self):
+        return repr(self.function)
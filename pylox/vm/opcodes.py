@@ -0,0 +1,108 @@
+"""The instructions of the VirtualMachine. Each is a 16 bit unit of a
+chunk's code, followed by one unit for its operand if it has one. They're
+plain ints, rather than an Enum, so that the VirtualMachine compares them
+as quickly as it can.
+
+They're numbered in groups, which the VirtualMachine tells apart by range
+before finding the instruction in its group: those that programs run most,
+the binary operators, the rest of the variable instructions, and the rest.
+"""
+
+# push the value of the local in the operand's slot of the current frame
+GET_LOCAL = 0
+# push constants[operand]
+CONSTANT = 1
+# pop the value into the local's slot
+STORE_LOCAL = 2
+# pop the condition, and jump forward by the operand if it's falsey. Jumps
+# are by units, from the end of the jump instruction.
+JUMP_IF_FALSE = 3
+# jump back by the operand
+LOOP = 4
+# push the value of the global whose Cell is constants[operand]
+GET_GLOBAL = 5
+# call the value below the operand's number of args
+CALL = 6
+RETURN = 7
+
+ADD = 8
+SUBTRACT = 9
+LESS = 10
+MULTIPLY = 11
+DIVIDE = 12
+LESS_EQUAL = 13
+GREATER = 14
+GREATER_EQUAL = 15
+EQUAL = 16
+NOT_EQUAL = 17
+# The same operators, with constants[operand] as their right operand, as in
+# i + 1. The VirtualMachine relies on each being CONSTANT_OPERAND more than
+# the operator.
+CONSTANT_OPERAND = 10
+ADD_CONSTANT = 18
+SUBTRACT_CONSTANT = 19
+LESS_CONSTANT = 20
+MULTIPLY_CONSTANT = 21
+DIVIDE_CONSTANT = 22
+LESS_EQUAL_CONSTANT = 23
+GREATER_CONSTANT = 24
+GREATER_EQUAL_CONSTANT = 25
+EQUAL_CONSTANT = 26
+NOT_EQUAL_CONSTANT = 27
+
+SET_LOCAL = 28
+# the same as the local instructions, for slots that hold the Cell of a
+# captured local. STORE_CELL stores the value in a new Cell.
+GET_CELL = 29
+SET_CELL = 30
+STORE_CELL = 31
+# by index in the upvalues of the current closure
+GET_UPVALUE = 32
+SET_UPVALUE = 33
+SET_GLOBAL = 34
+DEFINE_GLOBAL = 35
+
+NIL = 36
+TRUE = 37
+FALSE = 38
+POP = 39
+NOT = 40
+NEGATE = 41
+PRINT = 42
+JUMP = 43
+# for and/or: jump if the value decides the result, otherwise pop it
+JUMP_IF_FALSE_OR_POP = 44
+JUMP_IF_TRUE_OR_POP = 45
+# push a Closure of the Function in constants[operand]
+CLOSURE = 46
+
+NAMES = {
+    value: name
+    for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int) and name != "CONSTANT_OPERAND"
+}
+
+HAS_OPERAND = {
+    GET_LOCAL,
+    CONSTANT,
+    STORE_LOCAL,
+    JUMP_IF_FALSE,
+    LOOP,
+    GET_GLOBAL,
+    CALL,
+    *range(ADD_CONSTANT, NOT_EQUAL_CONSTANT + 1),
+    SET_LOCAL,
+    GET_CELL,
+    SET_CELL,
+    STORE_CELL,
+    GET_UPVALUE,
+    SET_UPVALUE,
+    SET_GLOBAL,
+    DEFINE_GLOBAL,
+    JUMP,
+    JUMP_IF_FALSE_OR_POP,
+    JUMP_IF_TRUE_OR_POP,
+    CLOSURE,
+}
+
+JUMPS = {JUMP, JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP}
@@ -0,0 +1,313 @@
+import typing as typ
+
+from ..callable import Callable
+from ..environment import UNDEFINED, Cell, Environment
+from ..interpreter import Interpreter, InterpreterException
+from ..io import OutputStream
+from ..parser import expressions, statements
+from .chunk import Chunk
+from .compiler import Compiler
+from .objects import Closure, Function
+from .opcodes import (
+    ADD,
+    CALL,
+    CLOSURE,
+    CONSTANT,
+    CONSTANT_OPERAND,
+    DEFINE_GLOBAL,
+    DIVIDE,
+    EQUAL,
+    FALSE,
+    GET_CELL,
+    GET_GLOBAL,
+    GET_LOCAL,
+    GET_UPVALUE,
+    GREATER,
+    JUMP,
+    JUMP_IF_FALSE,
+    JUMP_IF_FALSE_OR_POP,
+    JUMP_IF_TRUE_OR_POP,
+    LESS,
+    LESS_EQUAL,
+    LOOP,
+    MULTIPLY,
+    NEGATE,
+    NIL,
+    NOT,
+    NOT_EQUAL,
+    NOT_EQUAL_CONSTANT,
+    POP,
+    PRINT,
+    RETURN,
+    SET_CELL,
+    SET_GLOBAL,
+    SET_LOCAL,
+    SET_UPVALUE,
+    STORE_CELL,
+    STORE_LOCAL,
+    SUBTRACT,
+    TRUE,
+)
+
+# the deepest that Lox calls can nest, before a program is taken to be
+# recursing forever
+MAX_FRAMES = 100_000
+
+
+class VirtualMachine(Interpreter):
+    """Runs statements by compiling them to bytecode, and running that on a
+    stack machine, after clox:
+    https://craftinginterpreters.com/a-virtual-machine.html
+
+    Behaves as the Interpreter does, and raises the same errors. Calls
+    between Lox functions don't use Python's stack, so recursion can go far
+    deeper than in the other engines, up to MAX_FRAMES calls. Past that, it
+    raises the RecursionError that they do.
+    """
+
+    def __init__(
+        self,
+        output: typ.Optional[OutputStream] = None,
+        environment: typ.Optional[Environment] = None,
+    ):
+        super().__init__(output, environment)
+        self.compiler = Compiler(self.globals)
+
+    def interpret(self, statements: typ.Iterable[statements.Statement]):
+        for statement in statements:
+            script = self.compiler.compile(statement)
+            self.run(Closure(script, []), [])
+
+    def run(self, closure: Closure, args: typ.List[typ.Any]):
+        """Calls closure with args, and returns what it returns.
+
+        The stack holds the frames of the calls in progress. A call's frame
+        starts with its args, followed by the rest of its locals, and then
+        the values its instructions work on. Below it is the closure that was
+        called.
+        """
+        function = closure.function
+        upvalues = closure.upvalues
+        stack = list(args) + function.locals
+        for slot in function.captured_params:
+            stack[slot] = Cell(stack[slot])
+        # the calls that this one was made by: their function, upvalues,
+        # where they continue, and where their frame starts
+        calls: typ.List[typ.Tuple[Function, typ.List[Cell], int, int]] = []
+        base = 0
+        code = function.code
+        constants = function.chunk.constants
+        ip = 0
+
+        push = stack.append
+        pop = stack.pop
+        send = self.out.send
+
+        while True:
+            opcode = code[ip]
+            # the instructions programs run most, in rough order of how often
+            if opcode == GET_LOCAL:
+                push(stack[base + code[ip + 1]])
+                ip += 2
+            elif opcode == CONSTANT:
+                push(constants[code[ip + 1]])
+                ip += 2
+            elif opcode == STORE_LOCAL:
+                stack[base + code[ip + 1]] = pop()
+                ip += 2
+            elif opcode == JUMP_IF_FALSE:
+                value = pop()
+                if value is None or value is False:
+                    ip += code[ip + 1] + 2
+                else:
+                    ip += 2
+            elif opcode == LOOP:
+                ip += 2 - code[ip + 1]
+            elif opcode == GET_GLOBAL:
+                value = constants[code[ip + 1]].value
+                if value is UNDEFINED:
+                    raise _undefined(function.chunk, ip)
+                push(value)
+                ip += 2
+            elif opcode == CALL:
+                count = code[ip + 1]
+                callee = stack[-1 - count]
+                if type(callee) is Closure and callee.function.arity == count:
+                    if len(calls) >= MAX_FRAMES:
+                        raise RecursionError("maximum recursion depth exceeded")
+                    calls.append((function, upvalues, ip + 2, base))
+                    function = callee.function
+                    upvalues = callee.upvalues
+                    code = function.code
+                    constants = function.chunk.constants
+                    base = len(stack) - count
+                    stack.extend(function.locals)
+                    for slot in function.captured_params:
+                        stack[base + slot] = Cell(stack[base + slot])
+                    ip = 0
+                    continue
+                if not isinstance(callee, Callable):
+                    raise _error(
+                        function.chunk, ip, "Can only call functions and classes"
+                    )
+                if count != callee.arity():
+                    raise _error(
+                        function.chunk,
+                        ip,
+                        f"Expected {callee.arity()} args, got {count}",
+                    )
+                start = len(stack) - count
+                args = stack[start:]
+                del stack[start - 1 :]
+                push(callee.call(self, args))
+                ip += 2
+            elif opcode == RETURN:
+                result = pop()
+                if not calls:
+                    return result
+                # drop the frame, and the closure below it
+                del stack[base - 1 :]
+                push(result)
+                function, upvalues, ip, base = calls.pop()
+                code = function.code
+                constants = function.chunk.constants
+
+            elif opcode <= NOT_EQUAL_CONSTANT:
+                # binary operators
+                offset = ip
+                if opcode <= NOT_EQUAL:
+                    right = pop()
+                    ip += 1
+                else:
+                    right = constants[code[ip + 1]]
+                    ip += 2
+                    opcode -= CONSTANT_OPERAND
+                left = stack[-1]
+                if opcode == ADD:
+                    if type(left) is type(right) and (
+                        type(left) is float or type(left) is str
+                    ):
+                        stack[-1] = left + right
+                        continue
+                    raise _error(
+                        function.chunk, offset, "invalid operands for binary expression"
+                    )
+                if opcode == EQUAL:
+                    # nil is only equal to nil, and values of different types
+                    # differ
+                    stack[-1] = type(left) is type(right) and left == right
+                    continue
+                if opcode == NOT_EQUAL:
+                    stack[-1] = type(left) is not type(right) or left != right
+                    continue
+                if not (type(left) is float and type(right) is float):
+                    raise _error(function.chunk, offset, "operands must be numbers")
+                if opcode == SUBTRACT:
+                    stack[-1] = left - right
+                elif opcode == LESS:
+                    stack[-1] = left < right
+                elif opcode == MULTIPLY:
+                    stack[-1] = left * right
+                elif opcode == DIVIDE:
+                    stack[-1] = left / right
+                elif opcode == LESS_EQUAL:
+                    stack[-1] = left <= right
+                elif opcode == GREATER:
+                    stack[-1] = left > right
+                else:
+                    stack[-1] = left >= right
+
+            elif opcode <= DEFINE_GLOBAL:
+                # the rest of the variable instructions
+                operand = code[ip + 1]
+                ip += 2
+                if opcode == SET_LOCAL:
+                    stack[base + operand] = stack[-1]
+                elif opcode == GET_CELL:
+                    push(stack[base + operand].value)
+                elif opcode == SET_CELL:
+                    stack[base + operand].value = stack[-1]
+                elif opcode == STORE_CELL:
+                    stack[base + operand] = Cell(pop())
+                elif opcode == GET_UPVALUE:
+                    push(upvalues[operand].value)
+                elif opcode == SET_UPVALUE:
+                    upvalues[operand].value = stack[-1]
+                elif opcode == SET_GLOBAL:
+                    cell = constants[operand]
+                    if cell.value is UNDEFINED:
+                        raise _undefined(function.chunk, ip - 2)
+                    cell.value = stack[-1]
+                else:
+                    constants[operand].value = pop()
+
+            elif opcode == NIL:
+                push(None)
+                ip += 1
+            elif opcode == TRUE:
+                push(True)
+                ip += 1
+            elif opcode == FALSE:
+                push(False)
+                ip += 1
+            elif opcode == POP:
+                pop()
+                ip += 1
+            elif opcode == NOT:
+                value = stack[-1]
+                stack[-1] = value is None or value is False
+                ip += 1
+            elif opcode == NEGATE:
+                value = stack[-1]
+                if type(value) is not float:
+                    raise _error(function.chunk, ip, "operand must be a number")
+                stack[-1] = -value
+                ip += 1
+            elif opcode == PRINT:
+                value = pop()
+                send("nil" if value is None else value)
+                ip += 1
+            elif opcode == JUMP:
+                ip += code[ip + 1] + 2
+            elif opcode == JUMP_IF_FALSE_OR_POP:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip += code[ip + 1] + 2
+                else:
+                    pop()
+                    ip += 2
+            elif opcode == JUMP_IF_TRUE_OR_POP:
+                value = stack[-1]
+                if value is None or value is False:
+                    pop()
+                    ip += 2
+                else:
+                    ip += code[ip + 1] + 2
+            elif opcode == CLOSURE:
+                new_function = constants[code[ip + 1]]
+                # the closure keeps only the cells it uses, not the frame
+                cells = [
+                    stack[base + index] if in_frame else upvalues[index]
+                    for in_frame, index in new_function.upvalues
+                ]
+                push(Closure(new_function, cells))
+                ip += 2
+            else:
+                raise Exception(f"unknown opcode {opcode}")
+
+
+def _error(chunk: Chunk, offset: int, message: str) -> InterpreterException:
+    """The error for the instruction at offset, as the Interpreter raises it"""
+    node = chunk.nodes[offset]
+    if isinstance(node, (expressions.Binary, expressions.Unary)):
+        token = node.operator
+    elif isinstance(node, expressions.Call):
+        token = node.closing_paren
+    else:
+        token = typ.cast(expressions.Variable, node).identifier
+    return InterpreterException(node, token, message)
+
+
+def _undefined(chunk: Chunk, offset: int) -> InterpreterException:
+    node = typ.cast(expressions.Variable, chunk.nodes[offset])
+    return _error(chunk, offset, f"Undefined variable {node.identifier.lexeme}")
@@ -0,0 +1,7 @@
+def fields(thing) -> dict:
+    """The attributes of a token, scanner error or AST node, for comparing
+    them. Works for objects with __slots__, unlike vars().
+    """
+    if hasattr(thing, "__slots__"):
+        return {name: getattr(thing, name) for name in thing.__slots__}
+    return vars(thing)
@@ -1,11 +1,14 @@
-class TestOutputStream:
+from pylox.io import OutputStream
+
+
+class TestOutputStream(OutputStream):
     def __init__(self):
         self.last_sent = None
-        self._num_sent = 0
+        self.sent: list = []
 
     def send(self, data):
         self.last_sent = data
-        self._num_sent += 1
+        self.sent.append(data)
 
     def num_sent(self) -> int:
-        return self._num_sent
+        return len(self.sent)
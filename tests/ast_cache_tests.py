@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+from pylox.ast_cache import AstCache, cache_path, precompile_directory
+from pylox.lox import Lox, LoxFileRunner
+from test_utils.test_io import TestOutputStream
+
+# needs the resolver's depths: showA must print the outer a both times
+SOURCE = """var a = "outer";
+{
+    fun showA() {
+        print a;
+    }
+    showA();
+    var a = "inner";
+    showA();
+    print a;
+}
+"""
+
+
+class CountingLox(Lox):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compiles = 0
+
+    def compile(self, input):
+        self.compiles += 1
+        return super().compile(input)
+
+
+class AstCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.write("script.lox", SOURCE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, source: str) -> str:
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as outfile:
+            outfile.write(source)
+        return path
+
+    def run_file(self, path: str, optimise: bool = True):
+        output = TestOutputStream()
+        lox = CountingLox(output=output, optimise=optimise)
+        LoxFileRunner(lox, cache=AstCache()).run(path)
+        return output.sent, lox.compiles
+
+    def test_second_run_loads_from_cache(self):
+        first, compiles = self.run_file(self.path)
+        self.assertEqual(compiles, 1)
+        self.assertTrue(os.path.exists(cache_path(self.path)))
+
+        second, compiles = self.run_file(self.path)
+        self.assertEqual(compiles, 0)
+        self.assertEqual(first, ["outer", "outer", "inner"])
+        self.assertEqual(second, first)
+
+    def test_changed_source_is_recompiled(self):
+        self.run_file(self.path)
+        self.write("script.lox", 'print "changed";')
+        sent, compiles = self.run_file(self.path)
+        self.assertEqual(compiles, 1)
+        self.assertEqual(sent, ["changed"])
+
+    def test_corrupt_cache_file_is_a_miss(self):
+        self.run_file(self.path)
+        with open(cache_path(self.path), "r+b") as cached:
+            cached.seek(70)
+            cached.write(b"garbage")
+        sent, compiles = self.run_file(self.path)
+        self.assertEqual(compiles, 1)
+        self.assertEqual(sent, ["outer", "outer", "inner"])
+
+    def test_optimised_and_unoptimised_programs_are_cached_apart(self):
+        self.run_file(self.path)
+        _, compiles = self.run_file(self.path, optimise=False)
+        self.assertEqual(compiles, 1)
+        _, compiles = self.run_file(self.path, optimise=False)
+        self.assertEqual(compiles, 0)
+        _, compiles = self.run_file(self.path)
+        self.assertEqual(compiles, 1)
+
+    def test_unwritable_cache_is_a_miss(self):
+        # a file where the cache directory would go
+        self.write("__loxcache__", "")
+        for _ in range(2):
+            sent, compiles = self.run_file(self.path)
+            self.assertEqual(compiles, 1)
+            self.assertEqual(sent, ["outer", "outer", "inner"])
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)), ["__loxcache__", "script.lox"]
+        )
+
+    def test_errors_are_reported_and_not_cached(self):
+        path = self.write("broken.lox", "print (;")
+        output = TestOutputStream()
+        lox = Lox(output=output, throw=False)
+        LoxFileRunner(lox, cache=AstCache()).run(path)
+        self.assertIn("Expected expression", output.last_sent)
+        self.assertFalse(os.path.exists(cache_path(path)))
+
+    def test_precompile_directory(self):
+        good = self.write("sub/good.lox", "print 1;")
+        broken = self.write("sub/broken.lox", "print (;")
+        compiled, failed = precompile_directory(self.tmp.name)
+        self.assertEqual(sorted(compiled), sorted([self.path, good]))
+        self.assertEqual(failed, [broken])
+
+        sent, compiles = self.run_file(good)
+        self.assertEqual(compiles, 0)
+        self.assertEqual(sent, [1])
@@ -0,0 +1,124 @@
+import functools
+import unittest
+from unittest import mock
+
+from pylox.closure_compiler import ClosureInterpreter
+from pylox.lox import Lox
+from tests import lox_tests
+
+from test_utils.test_io import TestOutputStream
+
+
+class ClosureEngine(unittest.TestCase):
+    """Runs a test case from lox_tests with the closure engine"""
+
+    def setUp(self):
+        closure_lox = functools.partial(Lox, engine="closure")
+        patch = mock.patch.object(lox_tests, "Lox", closure_lox)
+        patch.start()
+        self.addCleanup(patch.stop)
+        super().setUp()
+
+
+class ExpressionTests(ClosureEngine, lox_tests.LoxTests_Execute_Expressions):
+    pass
+
+
+class StatementTests(ClosureEngine, lox_tests.LoxTests_Execute_Statements):
+    pass
+
+
+class VariableTests(ClosureEngine, lox_tests.LoxTests_Variables):
+    pass
+
+
+class GlobalTests(ClosureEngine, lox_tests.LoxTests_Globals):
+    pass
+
+
+class ScopingTests(ClosureEngine, lox_tests.LoxTests_Scoping):
+    pass
+
+
+class IfElseTests(ClosureEngine, lox_tests.LoxTests_IfElse):
+    pass
+
+
+class StreamingTests(ClosureEngine, lox_tests.LoxTests_Streaming):
+    pass
+
+
+class ClosureTests(ClosureEngine, lox_tests.LoxTests_Closures):
+    pass
+
+
+class FileRunnerTests(ClosureEngine, lox_tests.LoxFileRunnerTests):
+    pass
+
+
+class LogicalOperatorTests(ClosureEngine, lox_tests.LoxTests_LogicalOperators):
+    pass
+
+
+class WhileLoopTests(ClosureEngine, lox_tests.LoxTests_WhileLoops):
+    pass
+
+
+class ForLoopTests(ClosureEngine, lox_tests.LoxTests_ForLoops):
+    pass
+
+
+class FunctionTests(ClosureEngine, lox_tests.LoxTests_Functions):
+    pass
+
+
+class ClosureInterpreterTests(unittest.TestCase):
+    def setUp(self):
+        self.output = TestOutputStream()
+        self.lox = Lox(output=self.output, engine="closure")
+
+    def test_uses_closure_interpreter(self):
+        self.assertIsInstance(self.lox.interpreter, ClosureInterpreter)
+
+    def test_errors_match_tree_engine(self):
+        programs = [
+            'print 1 - "a";',
+            'print -"a";',
+            'print 1 + "a";',
+            "print nope;",
+            "nope = 1;",
+            "var a = 1; a();",
+            "fun f(a) {} f();",
+            "fun f() { return 1 < nil; } { var x = 1; print x + f(); }",
+            'for (var i = 0; i < "a"; i = i + 1) print i;',
+        ]
+        for program in programs:
+            with self.subTest(program):
+                tree_output = TestOutputStream()
+                Lox(output=tree_output, throw=False).execute(program)
+                Lox(output=self.output, throw=False, engine="closure").execute(program)
+                self.assertEqual(self.output.last_sent, tree_output.last_sent)
+
+    def test_function_returns_from_loop_in_block(self):
+        self.lox.execute(
+            """
+            fun find(n) {
+                for (var i = 0; i < 10; i = i + 1) {
+                    { if (i * i >= n) return i; }
+                }
+                return nil;
+            }
+            print find(20);
+            print find(200);
+            """
+        )
+        self.assertEqual(self.output.num_sent(), 2)
+        self.assertEqual(self.output.last_sent, "nil")
+
+    def test_functions_print_their_name(self):
+        self.lox.execute("fun f() {} print f;")
+        self.assertEqual(str(self.output.last_sent), "<fn f>")
+
+    def test_native_function(self):
+        self.lox.execute("print clock() > 0;")
+        self.assertEqual(self.output.last_sent, True)
@@ -1,5 +1,11 @@
 import unittest
-from pylox.environment import Environment, EnvironmentException
+from pylox.environment import (
+    UNDEFINED,
+    Cell,
+    Environment,
+    EnvironmentException,
+    Frame,
+)
 from pylox.token import Token
 from pylox.token_types import TokenTypes as t
 
@@ -22,40 +28,31 @@ class EnvironmentTests(unittest.TestCase):
         val = env.get(var_token("a"))
         self.assertEqual(val, 2)
 
-    def test_inner_scope_same_name(self):
+    def test_assign_undefined_throws(self):
         env = Environment()
-        env_inner = Environment(env)
-        env.define("a", 1)
-        env_inner.define("a", 2)
-
-        self.assertEqual(env.get(var_token("a")), 1)
-        self.assertEqual(env_inner.get(var_token("a")), 2)
-
-    def test_inner_scope_get_searches_parent_scope(self):
-        env = Environment()
-        env_inner = Environment(env)
-        env.define("a", 1)
-
-        self.assertEqual(env.get(var_token("a")), 1)
-        self.assertEqual(env_inner.get(var_token("a")), 1)
+        with self.assertRaises(EnvironmentException):
+            env.assign(var_token("a"), 1)
 
-    def test_inner_scope_assign_searches_parent_scope(self):
+    def test_cell_is_shared_and_sees_later_definitions(self):
         env = Environment()
-        env_inner = Environment(env)
+        cell = env.cell("a")
+        self.assertIs(cell.value, UNDEFINED)
         env.define("a", 1)
-        env_inner.assign(var_token("a"), 2)
-
-        self.assertEqual(env.get(var_token("a")), 2)
-        self.assertEqual(env_inner.get(var_token("a")), 2)
-
-    def test_inner_scope_not_accessible_from_outer(self):
-        env = Environment()
-        env_inner = Environment(env)
-        env_inner.define("a", 1)
-        with self.assertRaises(EnvironmentException):
-            env.get(var_token("a"))
+        env.define("a", 2)
+        self.assertIs(env.cell("a"), cell)
+        self.assertEqual(cell.value, 2)
 
     def test_get_undefined_throws(self):
         env = Environment()
         with self.assertRaises(EnvironmentException):
             env.get(var_token("asdf"))
+
+
+class FrameTests(unittest.TestCase):
+    def test_slots_start_as_nil(self):
+        frame = Frame((), 2)
+        self.assertEqual(frame.values, [None, None])
+
+    def test_local_cell(self):
+        cell = Cell(1)
+        self.assertEqual((cell.value, cell.table), (1, None))
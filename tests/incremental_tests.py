@@ -0,0 +1,138 @@
+import random
+import unittest
+
+from pylox.incremental import IncrementalFrontEnd
+from pylox.parser.parser import Parser, ParserException
+from pylox.scanner import Scanner, ScannerError
+from pylox.token import Token
+from test_utils.fields import fields
+
+SOURCE = """
+var a = 1; // one
+fun add(x, y) {
+    return x + y;
+}
+
+{ var b = "two
+lines"; print b; }
+for (var i = 0; i < 3; i = i + 1) print add(i, a);
+if (a > 0) print "yes"; else print "no";
+"""
+
+
+def dump(thing):
+    """nested tuples of a statement/expression tree, for comparisons"""
+    if isinstance(thing, Token):
+        return (thing.type, thing.lexeme, thing.literal, thing.line)
+    if isinstance(thing, list):
+        return [dump(x) for x in thing]
+    if hasattr(thing, "__slots__"):
+        return (type(thing).__name__, {k: dump(v) for k, v in fields(thing).items()})
+    return thing
+
+
+def parse(source):
+    tokens = list(Scanner(source).scan_tokens(skip_trivia=True))
+    if any(isinstance(token, ScannerError) for token in tokens):
+        raise ParserException(tokens[-1], "scanner error")
+    return list(Parser(tokens).parse())
+
+
+class IncrementalFrontEndTests(unittest.TestCase):
+    def assert_same_as_full_parse(self, front_end):
+        self.assertEqual(dump(front_end.statements), dump(parse(front_end.source)))
+
+    def test_initial_parse(self):
+        front_end = IncrementalFrontEnd(SOURCE)
+        self.assert_same_as_full_parse(front_end)
+        self.assertEqual(front_end.errors, [])
+
+    def test_edit_reuses_untouched_statements(self):
+        front_end = IncrementalFrontEnd(SOURCE)
+        before = front_end.statements
+        start = SOURCE.index("x + y")
+
+        front_end.edit(start, start + 5, "x * y")
+
+        after = front_end.statements
+        self.assert_same_as_full_parse(front_end)
+        self.assertEqual(len(before), len(after))
+        self.assertIsNot(before[1], after[1])
+        for i in [0, 2, 3, 4]:
+            self.assertIs(before[i], after[i])
+        self.assertLess(front_end.rescanned_chars, 50)
+
+    def test_edit_adding_lines_shifts_later_lines(self):
+        front_end = IncrementalFrontEnd(SOURCE)
+
+        front_end.edit(0, 0, "\n\n\n")
+
+        self.assert_same_as_full_parse(front_end)
+
+    def test_opening_a_block_pulls_in_following_statements(self):
+        front_end = IncrementalFrontEnd(SOURCE)
+        start = SOURCE.index("for")
+
+        front_end.edit(start, start, "fun f() {\n")
+        self.assertEqual(len(front_end.errors), 1)
+
+        front_end.edit(len(front_end.source), len(front_end.source), "}")
+        self.assertEqual(front_end.errors, [])
+        self.assert_same_as_full_parse(front_end)
+
+    def test_comment_out_rest_of_line(self):
+        front_end = IncrementalFrontEnd("var a = 1; var b = 2;\nprint a;")
+        front_end.edit(10, 10, " //")
+        self.assert_same_as_full_parse(front_end)
+        self.assertEqual(len(front_end.statements), 2)
+
+    def test_syntax_error_is_kept_until_fixed(self):
+        front_end = IncrementalFrontEnd(SOURCE)
+        start = SOURCE.index("print b")
+
+        front_end.edit(start, start + 5, "prin")
+        self.assertEqual(len(front_end.errors), 1)
+        self.assertIsInstance(front_end.errors[0], ParserException)
+
+        front_end.edit(start, start + 4, "print")
+        self.assertEqual(front_end.errors, [])
+        self.assert_same_as_full_parse(front_end)
+
+    def test_random_edits_match_full_parse(self):
+        rand = random.Random(1234)
+        snippets = ["", " ", "\n", "1", "a", ";", "}", "{", '"', "// c\n", "var z = 2;"]
+        for _ in range(300):
+            front_end = IncrementalFrontEnd(SOURCE)
+            for _ in range(3):
+                source = front_end.source
+                start = rand.randint(0, len(source))
+                end = min(len(source), start + rand.randint(0, 5))
+                front_end.edit(start, end, rand.choice(snippets))
+                try:
+                    expected = parse(front_end.source)
+                except ParserException:
+                    self.assertNotEqual(front_end.errors, [])
+                    continue
+                with self.subTest(source=front_end.source):
+                    self.assertEqual(front_end.errors, [])
+                    self.assertEqual(dump(front_end.statements), dump(expected))
+
+    def test_many_edits_between_reads_match_full_parse(self):
+        # later segments are only moved when they're next needed
+        rand = random.Random(4321)
+        snippets = ["", " ", "\n", "\n\n", "1", "// c\n", "var z = 2;\n"]
+        for _ in range(100):
+            front_end = IncrementalFrontEnd(SOURCE * 3)
+            for _ in range(10):
+                source = front_end.source
+                start = rand.randint(0, len(source))
+                end = min(len(source), start + rand.randint(0, 3))
+                front_end.edit(start, end, rand.choice(snippets))
+            try:
+                expected = parse(front_end.source)
+            except ParserException:
+                self.assertNotEqual(front_end.errors, [])
+                continue
+            with self.subTest(source=front_end.source):
+                self.assertEqual(front_end.errors, [])
+                self.assertEqual(dump(front_end.statements), dump(expected))
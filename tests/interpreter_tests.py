@@ -1,7 +1,8 @@
 import unittest
 
+from pylox import operators
 from pylox.interpreter import Interpreter, InterpreterException
-from pylox.parser.expressions import Grouping, Literal, Unary, Binary
+from pylox.parser.expressions import Grouping, Literal, Logical, Unary, Binary
 from pylox.token import Token
 from pylox.token_types import TokenTypes as t
 
@@ -130,3 +131,37 @@ class InterpreterTests_BinaryExpressions(unittest.TestCase):
         result = self.interpreter.visit_binary_expression(comparison)
 
         self.assertEqual(result, True)
+
+
+class InterpreterTests_OperatorDispatch(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = Interpreter()
+
+    def test_nodes_choose_their_operator_when_made(self):
+        self.assertIs(
+            Binary(Literal(1), new_token(t.LESS), Literal(2)).operate, operators.less
+        )
+        self.assertIs(Unary(new_token(t.MINUS), Literal(2)).operate, operators.negate)
+        self.assertIs(
+            Logical(Literal(1), new_token(t.OR), Literal(2)).short_circuits,
+            operators.is_truthy,
+        )
+
+    def test_invalid_operands_raise_for_the_node(self):
+        binary = Binary(Literal(1), new_token(t.MINUS), Literal("a"))
+
+        with self.assertRaises(InterpreterException) as context:
+            self.interpreter.visit_binary_expression(binary)
+
+        self.assertIs(context.exception.expression, binary)
+        self.assertEqual(context.exception.message, "operands must be numbers")
+
+    def test_logical_results_are_operands(self):
+        params = [(t.OR, None, 2), (t.OR, 0, 0), (t.AND, False, False), (t.AND, 1, 2)]
+        for operator, left, expected in params:
+            with self.subTest(operator=operator, left=left):
+                logical = Logical(Literal(left), new_token(operator), Literal(2))
+
+                result = self.interpreter.visit_logical_expression(logical)
+
+                self.assertEqual(result, expected)
@@ -1,4 +1,7 @@
+import gc
 import os
+import tempfile
+import tracemalloc
 import unittest
 
 from pylox.interpreter import InterpreterException
@@ -98,6 +101,52 @@ class LoxTests_Variables(unittest.TestCase):
         self.assertIn("Invalid assignment target", self.output.last_sent)
 
 
+class LoxTests_Globals(unittest.TestCase):
+    def setUp(self):
+        self.output = TestOutputStream()
+        self.lox = Lox(output=self.output, throw=False)
+
+    def test_read_undefined(self):
+        self.lox.execute("print a;")
+        self.assertEqual(
+            self.output.last_sent, 'at expression "a": Undefined variable a'
+        )
+
+    def test_assign_undefined(self):
+        self.lox.execute("a = 1;")
+        self.assertEqual(
+            self.output.last_sent, 'at expression "(= a 1.0)": Undefined variable a'
+        )
+
+    def test_defined_after_function_that_uses_it(self):
+        self.lox.execute("fun f() { return a; }")
+        self.lox.execute("f();")
+        self.assertEqual(
+            self.output.last_sent, 'at expression "a": Undefined variable a'
+        )
+        self.lox.execute("var a = 1; print f();")
+        self.assertEqual(self.output.last_sent, 1)
+
+    def test_redefine_and_assign_in_loop(self):
+        self.lox.execute(
+            """
+            var a = 1;
+            fun f() { return a; }
+            for (var i = 0; i < 3; i = i + 1) { a = a + 1; }
+            var a = a * 10;
+            print f();
+            """
+        )
+        self.assertEqual(self.output.last_sent, 40)
+
+    def test_compiled_program_runs_in_more_than_one_interpreter(self):
+        program = self.lox.compile("var a = 1; a = a + 1; print a;")
+        for _ in range(2):
+            output = TestOutputStream()
+            Lox(output=output).execute_compiled(program)
+            self.assertEqual(output.last_sent, 2)
+
+
 class LoxTests_Scoping(unittest.TestCase):
     def setUp(self):
         self.output = TestOutputStream()
@@ -138,6 +187,63 @@ class LoxTests_Scoping(unittest.TestCase):
         self.assertEqual(self.output.num_sent(), 2)
         self.assertEqual(self.output.last_sent, 1)
 
+    def test_locals_in_nested_scopes(self):
+        self.lox.execute(
+            """
+            fun f(a, b) {
+                var c = a + b;
+                {
+                    var d = c * 2;
+                    { a = d + b; }
+                    c = a;
+                }
+                return c;
+            }
+            print f(1, 2);
+            """
+        )
+        self.assertEqual(self.output.last_sent, 8)
+
+    def test_assign_local_in_same_scope(self):
+        self.lox.execute("{ var a = 1; a = 2; print a; }")
+        self.assertEqual(self.output.last_sent, 2)
+
+    def test_block_local_is_reset_each_time_its_declared(self):
+        self.lox.execute(
+            """
+            fun f() {
+                for (var i = 0; i < 2; i = i + 1) {
+                    var x;
+                    print x;
+                    x = i;
+                }
+            }
+            f();
+            """
+        )
+        self.assertEqual(self.output.num_sent(), 2)
+        self.assertEqual(self.output.last_sent, "nil")
+
+    def test_closures_in_function_loop_capture_each_iteration(self):
+        self.lox.execute(
+            """
+            fun f(n) {
+                var shows = nil;
+                var total = 0;
+                for (var i = 0; i < 3; i = i + 1) {
+                    var j = i * n;
+                    fun show() { print j; total = total + j; }
+                    if (i == 1) shows = show;
+                }
+                shows();
+                return total;
+            }
+            print f(10);
+            """
+        )
+        self.assertEqual(self.output.num_sent(), 2)
+        self.assertEqual(self.output.last_sent, 10)
+
 
 class LoxTests_IfElse(unittest.TestCase):
     def setUp(self):
@@ -163,6 +269,158 @@ class LoxTests_IfElse(unittest.TestCase):
         self.assertEqual(self.output.last_sent, "this should get printed")
 
 
+class LoxTests_Streaming(unittest.TestCase):
+    def setUp(self):
+        self.output = TestOutputStream()
+        self.lox = Lox(output=self.output, throw=False)
+
+    def test_statements_run_before_later_ones_are_parsed(self):
+        self.lox.execute('print "first"; print (;')
+        self.assertEqual(self.output.num_sent(), 2)
+        self.assertIn("Expected expression", self.output.last_sent)
+
+    def test_reports_every_syntax_error_and_runs_nothing_after_the_first(self):
+        self.lox.execute('print "first"; print (; print "second"; var = 1;')
+        self.assertEqual(self.output.num_sent(), 2)
+        self.assertEqual(
+            self.output.last_sent,
+            'on line 1, token ";": Expected expression\n'
+            'on line 1, token "=": expected variable name',
+        )
+
+    def test_statements_run_before_later_ones_are_scanned(self):
+        sent = []
+        self.output.send = sent.append
+        with self.assertRaisesRegex(Exception, "Scanner error"):
+            self.lox.execute('print "first";\n@')
+        self.assertEqual(sent, ["first"])
+
+    def test_functions_declared_in_earlier_statements(self):
+        self.lox.execute("""
+            fun add(a, b) { return a + b; }
+            var x = add(1, 2);
+            if (x > 2) print x; else print "no";
+        """)
+        self.assertEqual(self.output.last_sent, 3)
+
+
+class LoxTests_Closures(unittest.TestCase):
+    def setUp(self):
+        self.output = TestOutputStream()
+        self.lox = Lox(output=self.output)
+
+    def test_closures_share_captured_variable(self):
+        self.lox.execute(
+            """
+            var increment;
+            var get;
+            fun make() {
+                var count = 0;
+                fun inc() { count = count + 1; }
+                fun current() { return count; }
+                increment = inc;
+                get = current;
+            }
+            make();
+            increment();
+            increment();
+            print get();
+            """
+        )
+        self.assertEqual(self.output.last_sent, 2)
+
+    def test_closure_sees_assignment_after_it_was_made(self):
+        self.lox.execute(
+            """
+            fun f() {
+                var a = 1;
+                fun show() { return a; }
+                a = 2;
+                return show;
+            }
+            print f()();
+            """
+        )
+        self.assertEqual(self.output.last_sent, 2)
+
+    def test_recursive_local_functions(self):
+        programs = [
+            "{ fun f(n) { if (n > 0) return f(n - 1); return 7; } print f(2); }",
+            """
+            var fs;
+            for (var i = 0; i < 2; i = i + 1) {
+                var j = i;
+                fun f(n) { if (n > 0) return f(n - 1); return j; }
+                fs = f;
+            }
+            print fs(1);
+            """,
+            """
+            fun g() {
+                var fs;
+                for (var i = 0; i < 2; i = i + 1) {
+                    var j = i;
+                    fun f(n) { if (n > 0) return f(n - 1); return j; }
+                    fs = f;
+                }
+                return fs(1);
+            }
+            print g();
+            """,
+        ]
+        for program, expected in zip(programs, [7, 1, 1]):
+            with self.subTest(program):
+                self.lox.execute(program)
+                self.assertEqual(self.output.last_sent, expected)
+
+    def test_captured_param_through_function_in_between(self):
+        self.lox.execute(
+            """
+            fun outer(a) {
+                fun middle() {
+                    fun inner() { a = a + 1; return a; }
+                    return inner;
+                }
+                return middle();
+            }
+            var inner = outer(10);
+            inner();
+            print inner();
+            """
+        )
+        self.assertEqual(self.output.last_sent, 12)
+
+    def test_closures_made_in_a_loop_keep_only_what_they_use(self):
+        # each closure keeps the one before it, but not the large string that
+        # was a local of the same iteration
+        source = """
+            var kept;
+            fun make(n) {
+                var big = "x";
+                for (var i = 0; i < 17; i = i + 1) big = big + big;
+                var last = nil;
+                for (var i = 0; i < n; i = i + 1) {
+                    var copy = big + "y";
+                    var previous = last;
+                    fun closure() { return previous; }
+                    last = closure;
+                }
+                return last;
+            }
+            kept = make(50);
+        """
+        gc.collect()
+        tracemalloc.start()
+        try:
+            self.lox.execute(source)
+            gc.collect()
+            retained, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # 50 copies of the string would be over 6MB
+        self.assertLess(retained, 1_000_000)
+
+
 class LoxFileRunnerTests(unittest.TestCase):
     def setUp(self):
         self.output = TestOutputStream()
@@ -174,6 +432,29 @@ class LoxFileRunnerTests(unittest.TestCase):
         test_file = os.path.join(this_dir, "lox_test_file.lox")
         self.runner.run(test_file)
 
+    def test_run_file_with_regex_scanner(self):
+        lox = Lox(output=self.output, scanner="regex")
+        this_dir = os.path.dirname(__file__)
+        test_file = os.path.join(this_dir, "lox_test_file.lox")
+        LoxFileRunner(lox).run(test_file)
+        self.assertEqual(self.output.last_sent, "all done")
+
+    def test_run_memory_mapped_file(self):
+        this_dir = os.path.dirname(__file__)
+        test_file = os.path.join(this_dir, "lox_test_file.lox")
+        for scanner in ["char", "regex"]:
+            with self.subTest(scanner=scanner):
+                lox = Lox(output=self.output, scanner=scanner)
+                LoxFileRunner(lox, memory_map=True).run(test_file)
+                self.assertEqual(self.output.last_sent, "all done")
+
+    def test_run_empty_memory_mapped_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "empty.lox")
+            open(path, "w").close()
+            LoxFileRunner(self.lox, memory_map=True).run(path)
+        self.assertEqual(self.output.num_sent(), 0)
+
 
 class LoxTests_LogicalOperators(unittest.TestCase):
     def setUp(self):
@@ -236,6 +517,63 @@ class LoxTests_ForLoops(unittest.TestCase):
         self.assertEqual(self.output.num_sent(), 5)
         self.assertEqual(self.output.last_sent, 4)
 
+    def outputs(self, source: str, optimise: bool = True):
+        output = TestOutputStream()
+        Lox(output=output, throw=False, optimise=optimise).execute(source)
+        return output.sent
+
+    def test_counted_loops(self):
+        params = [
+            ("for (var i = 0; i < 3; i = i + 1) print i;", [0, 1, 2]),
+            ("for (var i = 0; i <= 3; i = i + 1.5) print i;", [0, 1.5, 3]),
+            ("for (var i = 3; i > 0; i = i - 1) { print i; }", [3, 2, 1]),
+            ("for (var i = 3; i >= 3; i = i + 1) { print i; i = -10; }", [3]),
+            ("var n = 2; for (var i = 0; i < n; i = i + 1) print i;", [0, 1]),
+            (
+                "var n = 3; for (var i = 0; i < n; i = i + 1) { n = 1; print i; }",
+                [0],
+            ),
+            (
+                """var n = 3; fun f() { n = 1; }
+                for (var i = 0; i < n; i = i + 1) { f(); print i; }""",
+                [0],
+            ),
+            (
+                'for (var i = "a"; i < 3; i = i + 1) print i;',
+                ['at expression "(< i 3.0)": operands must be numbers'],
+            ),
+        ]
+        for source, expected in params:
+            with self.subTest(source):
+                self.assertEqual(self.outputs(source), expected)
+
+    def test_loop_variable_is_scoped_to_loop(self):
+        sent = self.outputs("var i = 10; for (var i = 0; i < 2; i = i + 1) {} print i;")
+        self.assertEqual(sent, [10])
+
+    def test_each_iteration_has_its_own_body_scope(self):
+        sent = self.outputs("""
+            var first;
+            for (var i = 0; i < 2; i = i + 1) {
+                var j = i;
+                fun show() { print j; }
+                if (i == 0) first = show;
+            }
+            first();
+        """)
+        self.assertEqual(sent, [0])
+
+    def test_runs_the_same_unoptimised(self):
+        source = """
+            var total = 0;
+            for (var i = 0; i < 4; i = i + 1) {
+                for (var j = i; j > 0; j = j - 1) total = total + j;
+            }
+            print total;
+        """
+        self.assertEqual(self.outputs(source), self.outputs(source, False))
+        self.assertEqual(self.outputs(source), [10])
+
 
 class LoxTests_Functions(unittest.TestCase):
     def setUp(self):
@@ -264,6 +602,27 @@ class LoxTests_Functions(unittest.TestCase):
         self.assertEqual(self.output.num_sent(), 1)
         self.assertEqual(self.output.last_sent, 3)
 
+    def test_recursive_calls_have_their_own_locals(self):
+        self.lox.execute(
+            """
+            fun f(n) {
+                var a = n * 10;
+                if (n > 0) f(n - 1);
+                print a + n;
+            }
+            f(2);
+            """
+        )
+        self.assertEqual(self.output.num_sent(), 3)
+        self.assertEqual(self.output.last_sent, 22)
+
+    def test_call_after_error_in_call(self):
+        self.lox.execute("fun f(a) { var b = a; return -b; }")
+        with self.assertRaises(InterpreterException):
+            self.lox.execute('f("a");')
+        self.lox.execute("print f(1);")
+        self.assertEqual(self.output.last_sent, -1)
+
     def test_native_call(self):
         self.lox.execute("print(clock());")
         self.assertEqual(self.output.num_sent(), 1)
@@ -279,6 +638,40 @@ class LoxTests_Functions(unittest.TestCase):
         self.assertEqual(self.output.num_sent(), 1)
         self.assertEqual(self.output.last_sent, 3)
 
+    def test_return_from_nested_blocks_and_loops(self):
+        self.lox.execute(
+            """
+            fun find(n) {
+                for (var i = 1; i < 10; i = i + 1) {
+                    var j = 1;
+                    while (j <= i) {
+                        { if (i * j == n) return i * 10 + j; }
+                        j = j + 1;
+                    }
+                }
+                return -1;
+            }
+            fun first(limit) {
+                for (var i = 0; i < limit; i = i + 1) if (i > 2) return i;
+                print "none";
+            }
+            fun none() { { return; } print "unreachable"; }
+            """
+        )
+        programs = [
+            ("print find(12);", 43),
+            ("print find(97);", -1),
+            ("print first(9);", 3),
+            ("print first(2);", "nil"),
+            ("print none();", "nil"),
+        ]
+        for program, expected in programs:
+            with self.subTest(program):
+                self.lox.execute(program)
+                self.assertEqual(self.output.last_sent, expected)
+        # only first(2) got to the print after its loop
+        self.assertEqual(self.output.num_sent(), 6)
+
     def test_fib(self):
         """tests a whole bunch of stuff: function, conditional, arithmetic,
         parameters, more
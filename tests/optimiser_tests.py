@@ -0,0 +1,415 @@
+import operator
+import random
+import typing as typ
+import unittest
+
+from pylox import operators
+from pylox.interpreter import Interpreter
+from pylox.lox import Lox
+from pylox.optimiser import Optimiser
+from pylox.parser import expressions, statements
+from pylox.parser.parser import Parser
+from pylox.resolver import Resolver
+from pylox.scanner import Scanner
+from test_utils.test_io import TestOutputStream
+
+
+def optimise(source: str):
+    stmts = list(Parser(Scanner(source).scan_tokens()).parse())
+    interpreter = Interpreter()
+    Resolver(interpreter)._resolve_all(stmts)
+    optimiser = Optimiser()
+    return optimiser.optimise(stmts), optimiser
+
+
+def optimise_expression(source: str) -> expressions.Expression:
+    (stmt,), _ = optimise(f"print {source};")
+    return stmt.expression
+
+
+def run(source: str, optimise: bool):
+    output = TestOutputStream()
+    try:
+        Lox(output=output, throw=False, optimise=optimise).execute(source)
+    except Exception as e:
+        # eg. ZeroDivisionError, which the interpreter doesn't catch
+        output.sent.append(repr(e))
+    return output.sent
+
+
+class ConstantFoldingTests(unittest.TestCase):
+    def assert_folds_to(self, source: str, value):
+        expr = optimise_expression(source)
+        self.assertIsInstance(expr, expressions.Literal, source)
+        self.assertEqual(typ.cast(expressions.Literal, expr).value, value, source)
+
+    def test_folds_literal_expressions(self):
+        self.assert_folds_to("(1 + 4/2) * 3*2 - 10", 8)
+        self.assert_folds_to('"a" + "b"', "ab")
+        self.assert_folds_to("-(2)", -2)
+        self.assert_folds_to("!nil", True)
+        self.assert_folds_to('1 == "1"', False)
+        self.assert_folds_to("nil != nil", False)
+        self.assert_folds_to("2 >= 1 == true", True)
+
+    def test_does_not_fold_runtime_errors(self):
+        for source in ['"a" - 1', '-"a"', "1 / 0", '1 + "a"', "true < 2"]:
+            with self.subTest(source):
+                self.assertNotIsInstance(
+                    optimise_expression(source), expressions.Literal
+                )
+
+    def test_folds_around_runtime_errors(self):
+        expr = optimise_expression('"a" - (1 + 2)')
+        self.assertIsInstance(expr, expressions.Binary)
+        self.assertIsInstance(expr.right, expressions.Literal)
+        self.assertEqual(expr.right.value, 3)
+
+    def test_error_message_shows_expression_as_written(self):
+        source = 'print "a" - (1 + 2);'
+        self.assertEqual(run(source, optimise=True), run(source, optimise=False))
+
+    def test_logical_with_literal_left(self):
+        self.assertIsInstance(optimise_expression("true and x"), expressions.Variable)
+        self.assertIsInstance(optimise_expression("false or x"), expressions.Variable)
+        self.assert_folds_to("false and x", False)
+        self.assert_folds_to('nil or "b"', "b")
+        self.assert_folds_to("1 and 2", 2)
+
+    def test_double_negation_of_boolean(self):
+        expr = optimise_expression("!!(a < b)")
+        self.assertIsInstance(expr, expressions.Binary)
+        expr = optimise_expression("!!(a < b and b < c)")
+        self.assertIsInstance(expr, expressions.Logical)
+        expr = optimise_expression("!!a")
+        self.assertIsInstance(expr, expressions.Unary)
+        self.assertIsInstance(expr.right, expressions.Unary)
+
+    def test_strips_groupings(self):
+        expr = optimise_expression("((a)) * (b)")
+        self.assertIsInstance(expr.left, expressions.Variable)
+        self.assertIsInstance(expr.right, expressions.Variable)
+
+    def test_rebuilt_assignment_keeps_resolved_depth(self):
+        (block,), _ = optimise("{ var a = 1; fun f() { a = (1 + 2); } }")
+        assignment = block.statements[1].body[0].expression
+        self.assertIsInstance(assignment.expression, expressions.Literal)
+        self.assertEqual((assignment.depth, assignment.slot), (1, 0))
+
+    def test_original(self):
+        (stmt,), optimiser = optimise("print 1 + 2;")
+        original = optimiser.original(stmt.expression)
+        self.assertIsInstance(original, expressions.Binary)
+        self.assertIs(optimiser.original(original), original)
+
+    def test_optimises_inside_statements(self):
+        (function,), _ = optimise(
+            "fun f(x) { while (1 < 2) { if (x > -1) return x + (1 * 2); } }"
+        )
+        loop = function.body[0]
+        self.assertIsInstance(loop, statements.While)
+        self.assertIsInstance(loop.condition, expressions.Literal)
+        branch = loop.body.statements[0]
+        self.assertIsInstance(branch.condition.right, expressions.Literal)
+        self.assertIsInstance(branch.thenBranch.value.right, expressions.Literal)
+
+
+class DeadCodeEliminationTests(unittest.TestCase):
+    def test_if_with_literal_condition_becomes_taken_branch(self):
+        (stmt,), _ = optimise("if (1 < 2) print 1; else print 2;")
+        self.assertIsInstance(stmt, statements.Print)
+        self.assertEqual(stmt.expression.value, 1)
+        (stmt,), _ = optimise("if (nil) print 1; else { print 2; }")
+        self.assertIsInstance(stmt, statements.Block)
+        stmts, _ = optimise("if (false) print 1;")
+        self.assertEqual(stmts, [])
+
+    def test_if_with_empty_branches(self):
+        (stmt,), _ = optimise("if (x) {} else {}")
+        self.assertIsInstance(stmt, statements.ExpressionStatement)
+        self.assertIsInstance(stmt.expression, expressions.Variable)
+        (stmt,), _ = optimise("if (x) {} else print 1;")
+        self.assertIsInstance(stmt, statements.If)
+        self.assertEqual(stmt.thenBranch.statements, [])
+
+    def test_removes_while_false(self):
+        stmts, _ = optimise("while (1 > 2) print 1; print 2;")
+        self.assertEqual(len(stmts), 1)
+        self.assertIsInstance(stmts[0], statements.Print)
+
+    def test_removes_statements_after_return(self):
+        (function,), _ = optimise(
+            "fun f() { print 1; return 2; print 3; { return 4; } }"
+        )
+        self.assertEqual(len(function.body), 2)
+        self.assertIsInstance(function.body[1], statements.Return)
+        (function,), _ = optimise("fun f() { { return 1; print 2; } print 3; }")
+        self.assertEqual(len(function.body[0].statements), 1)
+        self.assertEqual(len(function.body), 2)
+
+    def test_tree_shaking(self):
+        source = """
+            fun unused() { return used(); }
+            fun used() { return recursive(3); }
+            fun recursive(n) { if (n > 0) return recursive(n - 1); return 0; }
+            fun only_self() { return only_self(); }
+            fun shadowed() {}
+            fun g() { var shadowed = 1; return shadowed; }
+            print used();
+            print g;
+        """
+        compiled = Lox().compile(source, tree_shake=True)
+        names = [
+            stmt.name.lexeme
+            for stmt in compiled.statements
+            if isinstance(stmt, statements.FunctionDeclaration)
+        ]
+        self.assertEqual(names, ["used", "recursive", "g"])
+        compiled = Lox().compile(source)
+        self.assertEqual(len(compiled.statements), 8)
+
+    def test_tree_shaken_program_runs(self):
+        output = TestOutputStream()
+        lox = Lox(output=output)
+        lox.execute_compiled(
+            lox.compile(
+                "fun a() { return 1; } fun b() { return a(); } print b();",
+                tree_shake=True,
+            )
+        )
+        self.assertEqual(output.last_sent, 1)
+
+    def test_same_output_as_unoptimised(self):
+        for source in [
+            "if (true) print 1; else print 2;",
+            "if (1 > 2) { var a = 1; print a; } else { var a = 2; print a; }",
+            "var a = 1; { if (true) { var a = 2; } print a; }",
+            "if (nil) {} else print 3;",
+            "fun f() { while (false) return 1; return 2; } print f();",
+            "fun f() { return 1; print 2; } print f();",
+            "if (x) {}",
+            "while (false) print 1; print 0;",
+        ]:
+            with self.subTest(source):
+                self.assertEqual(
+                    run(source, optimise=True), run(source, optimise=False)
+                )
+
+
+class CommonSubexpressionTests(unittest.TestCase):
+    def function_body(self, source: str):
+        (function,), _ = optimise(f"fun f(a, b, c) {{ {source} }}")
+        return function.body
+
+    def test_reuses_repeated_expression(self):
+        body = self.function_body("var x = a * b + c; var y = a * b + c;")
+        temporary, x, y = body
+        self.assertIsInstance(temporary, statements.VariableDeclaration)
+        self.assertIsInstance(x.initialiser, expressions.Assignment)
+        self.assertEqual(x.initialiser.identifier, temporary.identifier)
+        self.assertIsInstance(x.initialiser.expression, expressions.Binary)
+        self.assertIsInstance(y.initialiser, expressions.Variable)
+        self.assertEqual(y.initialiser.identifier, temporary.identifier)
+
+    def test_reuses_within_one_expression(self):
+        _, stmt = self.function_body("print -a * -a;")
+        self.assertIsInstance(stmt.expression.left, expressions.Assignment)
+        self.assertIsInstance(stmt.expression.right, expressions.Variable)
+
+    def test_reuses_outermost_repeat_only(self):
+        body = self.function_body("print a * b + c; print a * b + c;")
+        self.assertEqual(len(body), 3)
+
+    def test_does_not_reuse_after_assignment_or_call(self):
+        for source in [
+            "print a * b; a = 1; print a * b;",
+            "print a * b; var d = f(); print a * b;",
+            "print a * b; { print 1; } print a * b;",
+            "print a * b; if (c) a = 1; print a * b;",
+            "print c or a * b; print a * b;",
+        ]:
+            with self.subTest(source):
+                body = self.function_body(source)
+                self.assertNotIsInstance(body[0], statements.VariableDeclaration)
+
+    def test_keeps_unrelated_expressions_after_assignment(self):
+        body = self.function_body("print a * b; c = 1; print a * b;")
+        self.assertIsInstance(body[0], statements.VariableDeclaration)
+
+    def test_keeps_signed_zeros_apart(self):
+        body = self.function_body("print a + 0; print a + -0;")
+        self.assertEqual(len(body), 2)
+        source = "fun f(x) { print x + 0; print x + -0; } f(-0);"
+        sent = run(source, optimise=True)
+        # compared by repr, as 0.0 == -0.0
+        self.assertEqual([repr(value) for value in sent], ["0.0", "-0.0"])
+
+    def test_leaves_top_level_statements(self):
+        stmts, _ = optimise("var a = 1; print a * a + a * a;")
+        self.assertEqual(len(stmts), 2)
+        self.assertIsInstance(stmts[1].expression.left, expressions.Binary)
+
+    def test_error_is_raised_by_first_occurrence(self):
+        source = 'fun f(a) { print 1; print a - 1; print a - 1; } f("a");'
+        self.assertEqual(run(source, optimise=True), run(source, optimise=False))
+
+    def test_same_output_as_unoptimised(self):
+        rng = random.Random(14)
+        variables = ["a", "b", "c"]
+        operators = "+ - * < ==".split()
+
+        def expression(depth: int) -> str:
+            roll = rng.random()
+            if depth > 2 or roll < 0.3:
+                return rng.choice(variables + ["1", "2"])
+            if roll < 0.4:
+                return "-" + expression(depth + 1)
+            if roll < 0.5:
+                return f"(g() {rng.choice(['and', 'or'])} {expression(depth + 1)})"
+            operator = rng.choice(operators)
+            return f"({expression(depth + 1)} {operator} {expression(depth + 1)})"
+
+        def statement() -> str:
+            roll = rng.random()
+            if roll < 0.2:
+                return f"{rng.choice(variables)} = {expression(0)};"
+            if roll < 0.3:
+                return f"if ({expression(0)}) {{ print {expression(0)}; }}"
+            if roll < 0.35:
+                return "g();"
+            return f"print {expression(0)};"
+
+        for _ in range(300):
+            body = " ".join(statement() for _ in range(6))
+            source = f"""
+                var calls = 0;
+                fun g() {{ calls = calls + 1; return calls > 2; }}
+                fun f(a, b, c) {{ {body} }}
+                f(1, 2, 3);
+            """
+            with self.subTest(source):
+                self.assertEqual(
+                    run(source, optimise=True), run(source, optimise=False)
+                )
+
+
+class TypeInferenceTests(unittest.TestCase):
+    def function_body(self, source: str):
+        (function,), _ = optimise(f"fun f(a) {{ {source} }}")
+        return function.body
+
+    def operand_type(self, source: str):
+        """The operand_type of the expression printed at the end of source"""
+        return self.function_body(source)[-1].expression.operand_type
+
+    def test_marks_operators_on_known_types(self):
+        self.assertIs(self.operand_type("var x = 1; print x * 2;"), float)
+        self.assertIs(self.operand_type("var x = 1; print -x;"), float)
+        self.assertIs(self.operand_type('var s = "a"; print s + "b";'), str)
+        self.assertIs(self.operand_type('var s = "a"; print s == "b";'), str)
+        self.assertIs(self.operand_type("var x = a - 1; print x < 2;"), float)
+        self.assertIs(self.operand_type("var x = 1 + a; print x / 2;"), float)
+
+    def test_known_types_use_unchecked_operators(self):
+        known = self.function_body("var x = 1; print x * 2;")[-1].expression
+        unknown = self.function_body("print a * 2;")[-1].expression
+        negated = self.function_body("var x = 1; print -x;")[-1].expression
+        self.assertIs(known.operate, operator.mul)
+        self.assertIs(unknown.operate, operators.multiply)
+        self.assertIs(negated.operate, operator.neg)
+
+    def test_leaves_unknown_and_invalid_operands(self):
+        for source in [
+            "print a * 2;",
+            'var s = "a"; print s < "b";',
+            'var x = 1; print x + "b";',
+            "var x; print x * 2;",
+            "var x = f(); print x * 2;",
+            "var x = 1 < 2; print -x;",
+            "var x = true or 1; print x * 2;",
+        ]:
+            with self.subTest(source):
+                self.assertIsNone(self.operand_type(source))
+
+    def test_follows_branches(self):
+        self.assertIs(
+            self.operand_type("var x = 1; if (a) x = 2; else x = 3; print x * 2;"),
+            float,
+        )
+        self.assertIsNone(self.operand_type('var x = 1; if (a) x = "s"; print x * 2;'))
+        self.assertIsNone(self.operand_type('var x = 1; a and (x = "s"); print x * 2;'))
+
+    def test_follows_loops(self):
+        self.assertIs(
+            self.operand_type(
+                "var x = 0; for (var i = 0; i < a; i = i + 1) x = x + i; print x * 2;"
+            ),
+            float,
+        )
+        (_, loop) = self.function_body('var x = 0; while (a) { print x * 2; x = "s"; }')
+        self.assertIsNone(loop.body.statements[0].expression.operand_type)
+
+    def test_leaves_captured_locals_and_globals(self):
+        self.assertIsNone(
+            self.operand_type("var x = 1; fun g() { x = nil; } g(); print x * 2;")
+        )
+        stmts, _ = optimise("var x = 1; print x * 2;")
+        self.assertIsNone(stmts[1].expression.operand_type)
+
+    def test_same_output_as_unoptimised(self):
+        rng = random.Random(20)
+        values = ["1", "2", '"s"', "nil", "true", "a"]
+        operators = "+ - * / < == !=".split()
+
+        def expression(depth: int) -> str:
+            roll = rng.random()
+            if depth > 2 or roll < 0.3:
+                return rng.choice(["x", "y"] + values)
+            if roll < 0.4:
+                return "-" + expression(depth + 1)
+            operator = rng.choice(operators)
+            return f"({expression(depth + 1)} {operator} {expression(depth + 1)})"
+
+        def statement(depth: int) -> str:
+            roll = rng.random()
+            if roll < 0.3:
+                return f"{rng.choice(['x', 'y'])} = {expression(0)};"
+            if depth < 2 and roll < 0.4:
+                return f"if ({expression(0)}) {statement(depth + 1)}"
+            if depth < 2 and roll < 0.5:
+                body = " ".join(statement(depth + 1) for _ in range(2))
+                return f"for (var i = 0; i < 2; i = i + 1) {{ {body} }}"
+            return f"print {expression(0)};"
+
+        for _ in range(300):
+            body = " ".join(statement(0) for _ in range(5))
+            source = f"fun f(a) {{ var x = 1; var y = 2; {body} }} f(3);"
+            with self.subTest(source):
+                self.assertEqual(
+                    run(source, optimise=True), run(source, optimise=False)
+                )
+
+
+class OptimisedProgramsTests(unittest.TestCase):
+    def test_same_output_as_unoptimised(self):
+        rng = random.Random(12)
+        operators = "== != < <= > >= + - * / and or".split()
+        leaves = ["1", "0", "2.5", '"s"', '""', "true", "false", "nil", "x", "y"]
+
+        def expression(depth: int) -> str:
+            roll = rng.random()
+            if depth > 4 or roll < 0.3:
+                return rng.choice(leaves)
+            if roll < 0.45:
+                return rng.choice(["-", "!"]) + expression(depth + 1)
+            if roll < 0.55:
+                return f"({expression(depth + 1)})"
+            operator = rng.choice(operators)
+            return f"{expression(depth + 1)} {operator} {expression(depth + 1)}"
+
+        for _ in range(1000):
+            source = f'var x = 3; var y = "t"; print {expression(0)};'
+            with self.subTest(source):
+                self.assertEqual(
+                    run(source, optimise=True), run(source, optimise=False)
+                )
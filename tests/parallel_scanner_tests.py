@@ -0,0 +1,115 @@
+import random
+import unittest
+
+from pylox.lox import Lox
+from pylox.parallel_scanner import _stitch, scan_columns_parallel, split_at_newlines
+from pylox.regex_scanner import RegexScanner, scan_columns
+from test_utils.fields import fields
+from test_utils.test_io import TestOutputStream
+
+SOURCE = """var a = "one
+two
+three";
+// a comment with "a quote
+print a; @
+var b = "four";
+var c = "five
+six";
+print b + c;
+"""
+
+
+def dump(columns):
+    return (
+        list(columns.types),
+        list(columns.starts),
+        list(columns.ends),
+        columns.errors,
+    )
+
+
+def stitch_in_process(source, chunk_size):
+    """Same as scan_columns_parallel, without the process pool"""
+    bounds = split_at_newlines(source, chunk_size)
+    results = [scan_columns(source[start:end], start) for start, end in bounds]
+    return _stitch(source, bounds, results)
+
+
+class SplitAtNewlinesTests(unittest.TestCase):
+    def test_chunks_end_after_newlines(self):
+        bounds = split_at_newlines("ab\ncd\nef\ngh", 4)
+        self.assertEqual(bounds, [(0, 6), (6, 11)])
+
+    def test_chunks_cover_source(self):
+        for chunk_size in range(1, len(SOURCE) + 2):
+            bounds = split_at_newlines(SOURCE, chunk_size)
+            self.assertEqual(bounds[0][0], 0)
+            self.assertEqual(bounds[-1][1], len(SOURCE))
+            for (_, end), (start, _) in zip(bounds, bounds[1:]):
+                self.assertEqual(end, start)
+                self.assertEqual(SOURCE[end - 1], "\n")
+
+    def test_bytes(self):
+        self.assertEqual(split_at_newlines(b"a\nb", 1), [(0, 2), (2, 3)])
+
+
+class StitchTests(unittest.TestCase):
+    def test_same_as_serial_for_every_chunk_size(self):
+        for source in [SOURCE, SOURCE.encode()]:
+            expected = dump(scan_columns(source))
+            for chunk_size in range(1, len(source) + 2):
+                with self.subTest(chunk_size=chunk_size, bytes=type(source)):
+                    self.assertEqual(
+                        dump(stitch_in_process(source, chunk_size)), expected
+                    )
+
+    def test_unterminated_string_across_chunks(self):
+        source = 'print 1;\nvar a = "no\nend\nin\nsight;\n'
+        expected = dump(scan_columns(source))
+        self.assertEqual(expected[3][-1][0], "UNTERMINATED_STRING")
+        for chunk_size in range(1, len(source) + 1):
+            self.assertEqual(dump(stitch_in_process(source, chunk_size)), expected)
+
+    def test_same_as_serial_random_sources(self):
+        rng = random.Random(1234)
+        pieces = ['"', "\n", "a", "1", "//", " ", ";", "print", "+", "\n", "#"]
+        for _ in range(200):
+            source = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 60)))
+            chunk_size = rng.randint(1, 20)
+            with self.subTest(source=source, chunk_size=chunk_size):
+                self.assertEqual(
+                    dump(stitch_in_process(source, chunk_size)),
+                    dump(scan_columns(source)),
+                )
+
+
+class ScanColumnsParallelTests(unittest.TestCase):
+    def test_same_as_serial(self):
+        source = SOURCE * 20
+        self.assertEqual(
+            dump(scan_columns_parallel(source, workers=2, chunk_size=64)),
+            dump(scan_columns(source)),
+        )
+
+    def test_small_source_is_scanned_serially(self):
+        self.assertEqual(
+            dump(scan_columns_parallel(SOURCE, workers=2)), dump(scan_columns(SOURCE))
+        )
+
+    def test_buffer_tokens_and_errors(self):
+        source = SOURCE * 5
+        serial = RegexScanner(source).scan_buffer()
+        parallel = scan_columns_parallel(source, 2, 50).to_buffer(source)
+        self.assertEqual(
+            [fields(token) for token in parallel], [fields(token) for token in serial]
+        )
+        self.assertEqual(
+            [fields(error) for error in parallel.errors],
+            [fields(error) for error in serial.errors],
+        )
+
+    def test_lox_with_scan_workers(self):
+        output = TestOutputStream()
+        lox = Lox(output, scanner="regex", scan_workers=2)
+        lox.execute("var a = 1;\n" * 100 + "print a;\n")
+        self.assertEqual(output.last_sent, 1)
@@ -1,6 +1,8 @@
 import unittest
 
-from pylox.parser.parser import Parser
+from pylox.parser.parser import Parser, ParserErrors, ParserException
+from pylox.regex_scanner import RegexScanner
+from pylox.scanner import Scanner
 from pylox.parser import expressions
 from pylox.parser import statements
 from pylox.token import Token
@@ -260,3 +262,214 @@ class ParserTests(unittest.TestCase):
         while_stmt = stmts[0]
 
         self.assertIsInstance(while_stmt, statements.While)
+
+    def test_for_statement(self):
+        source = "for (var i = 0; i < 3; i = i + 1) { print i; print 2; }"
+        (for_stmt,) = Parser(list(Scanner(source).scan_tokens())).parse()
+
+        self.assertIsInstance(for_stmt, statements.For)
+        self.assertIsInstance(for_stmt.initialiser, statements.VariableDeclaration)
+        self.assertIsInstance(for_stmt.condition, expressions.Binary)
+        self.assertIsInstance(for_stmt.increment, expressions.Assignment)
+        # a block that declares nothing is run in the loop's scope
+        self.assertEqual(len(for_stmt.body), 2)
+
+    def test_for_statement_keeps_block_that_declares(self):
+        source = "for (;;) { var a = 1; }"
+        (for_stmt,) = Parser(list(Scanner(source).scan_tokens())).parse()
+
+        self.assertIsNone(for_stmt.initialiser)
+        self.assertIsInstance(for_stmt.condition, expressions.Literal)
+        self.assertIsNone(for_stmt.increment)
+        (body,) = for_stmt.body
+        self.assertIsInstance(body, statements.Block)
+
+
+def parse_expression(source: str) -> expressions.Expression:
+    buffer = RegexScanner(source + ";").scan_buffer()
+    (statement,) = Parser(buffer).parse()
+    assert isinstance(statement, statements.ExpressionStatement)
+    return statement.expression
+
+
+def sexp(expr) -> str:
+    """expressions as s-expressions, showing how they were grouped"""
+    if isinstance(expr, (expressions.Binary, expressions.Logical)):
+        return f"({expr.operator.lexeme} {sexp(expr.left)} {sexp(expr.right)})"
+    if isinstance(expr, expressions.Unary):
+        return f"({expr.operator.lexeme} {sexp(expr.right)})"
+    if isinstance(expr, expressions.Grouping):
+        return f"(group {sexp(expr.expression)})"
+    if isinstance(expr, expressions.Assignment):
+        return f"(= {expr.identifier.lexeme} {sexp(expr.expression)})"
+    if isinstance(expr, expressions.Call):
+        args = "".join(" " + sexp(arg) for arg in expr.args)
+        return f"(call {sexp(expr.callee)}{args})"
+    if isinstance(expr, expressions.Variable):
+        return expr.identifier.lexeme
+    return str(expr.value)
+
+
+class ExpressionPrecedenceTests(unittest.TestCase):
+    def test_precedence_and_associativity(self):
+        cases = {
+            "1 + 2 * 3": "(+ 1.0 (* 2.0 3.0))",
+            "1 - 2 - 3": "(- (- 1.0 2.0) 3.0)",
+            "1 / 2 / 3": "(/ (/ 1.0 2.0) 3.0)",
+            "a = b = 1": "(= a (= b 1.0))",
+            "a or b and c": "(or a (and b c))",
+            "a and b or c": "(or (and a b) c)",
+            "1 < 2 == 3 >= 4": "(== (< 1.0 2.0) (>= 3.0 4.0))",
+            "-a * !b": "(* (- a) (! b))",
+            "--a": "(- (- a))",
+            "-f(1)(2, 3)": "(- (call (call f 1.0) 2.0 3.0))",
+            "f()": "(call f)",
+            "(1 + 2) * 3": "(* (group (+ 1.0 2.0)) 3.0)",
+            "a = 1 + 2 or c": "(= a (or (+ 1.0 2.0) c))",
+            "f(a = 1, (b))": "(call f (= a 1.0) (group b))",
+        }
+        for source, expected in cases.items():
+            with self.subTest(source=source):
+                self.assertEqual(sexp(parse_expression(source)), expected)
+
+    def test_errors(self):
+        cases = {
+            "1 = 2": ("=", "Invalid assignment target."),
+            "a + b = c": ("=", "Invalid assignment target."),
+            "a = 1 = 2": ("=", "Invalid assignment target."),
+            "1 = )": (")", "Expected expression"),
+            "(1": (";", "Expected ')' after expression"),
+            "f(1": (";", "expected ')' after arguments"),
+            "1 +": (";", "Expected expression"),
+        }
+        for source, (lexeme, message) in cases.items():
+            with self.subTest(source=source):
+                with self.assertRaises(ParserException) as context:
+                    parse_expression(source)
+                self.assertEqual(context.exception.token.lexeme, lexeme)
+                self.assertEqual(context.exception.message, message)
+
+    def test_too_many_arguments(self):
+        parse_expression("f(" + ", ".join(["1"] * 255) + ")")
+        with self.assertRaises(ParserException) as context:
+            parse_expression("f(" + ", ".join(["1"] * 255) + ", x)")
+        self.assertEqual(context.exception.token.lexeme, "x")
+        self.assertEqual(
+            context.exception.message, "Can't have more than 255 arguments"
+        )
+
+    def test_deep_nesting_does_not_recurse(self):
+        depth = 10_000
+        expr = parse_expression("(" * depth + "-1" + ")" * depth)
+        for _ in range(depth):
+            self.assertIsInstance(expr, expressions.Grouping)
+            expr = expr.expression
+        self.assertIsInstance(expr, expressions.Unary)
+
+
+class StreamingParserTests(unittest.TestCase):
+    def test_tokens_are_read_one_declaration_at_a_time(self):
+        source = "var a = 1; if (a) { print a; } else print 2; print 3;"
+        read = []
+
+        def tokens():
+            for token in Scanner(source).scan_tokens(skip_trivia=True):
+                read.append(token.lexeme)
+                yield token
+
+        parser = Parser(tokens())
+        stmts = parser.parse()
+
+        self.assertIsInstance(next(stmts), statements.VariableDeclaration)
+        self.assertEqual(read[-2:], ["1", ";"])
+        # reads past the if statement to check for an else
+        self.assertIsInstance(next(stmts), statements.If)
+        self.assertEqual(read[-2:], [";", "print"])
+        self.assertIsInstance(next(stmts), statements.Print)
+        self.assertEqual(list(stmts), [])
+
+    def test_parsed_tokens_are_dropped(self):
+        source = "print 1;" * 100
+        parser = Parser(Scanner(source).scan_tokens())
+        for _ in parser.parse():
+            self.assertLess(len(parser.tokens), 6)
+
+    def test_same_statements_as_token_list(self):
+        source = """
+            fun f(a, b) { return a + b; }
+            for (var i = 0; i < 3; i = i + 1) { print f(i, 1); }
+            if (a) if (b) print 1; else print 2; else { print 3; }
+            while (false) {}
+        """
+        streamed = list(Parser(Scanner(source).scan_tokens()).parse())
+        listed = list(Parser(list(Scanner(source).scan_tokens())).parse())
+        self.assertEqual([type(s) for s in streamed], [type(s) for s in listed])
+        self.assertEqual(len(streamed), 4)
+
+
+class ErrorRecoveryTests(unittest.TestCase):
+    SOURCE = """
+        print (;
+        var = 1;
+        fun f() {
+            print ;
+            print "ok";
+        }
+        print 1 +;
+        print "fine";
+    """
+
+    def parse_errors(self, tokens):
+        parser = Parser(tokens)
+        parsed = []
+        with self.assertRaises(ParserErrors) as context:
+            for statement in parser.parse():
+                parsed.append(statement)
+        return parsed, context.exception
+
+    def test_collects_every_error(self):
+        _, errors = self.parse_errors(Scanner(self.SOURCE).scan_tokens())
+        self.assertEqual(
+            [(e.token.line, e.token.lexeme, e.message) for e in errors.errors],
+            [
+                (2, ";", "Expected expression"),
+                (3, "=", "expected variable name"),
+                (5, ";", "Expected expression"),
+                (8, ";", "Expected expression"),
+            ],
+        )
+        self.assertIs(errors.token, errors.errors[0].token)
+        self.assertEqual(errors.message, errors.errors[0].message)
+
+    def test_parses_statements_around_errors(self):
+        parsed, _ = self.parse_errors(list(Scanner(self.SOURCE).scan_tokens()))
+        function, last_print = parsed
+        self.assertIsInstance(function, statements.FunctionDeclaration)
+        self.assertEqual(len(function.body), 1)
+        self.assertIsInstance(last_print, statements.Print)
+
+    def test_streamed_tokens_and_token_buffer_give_the_same_errors(self):
+        sources = {
+            "stream": Scanner(self.SOURCE).scan_tokens(),
+            "buffer": RegexScanner(self.SOURCE).scan_buffer(),
+        }
+        expected = self.parse_errors(list(Scanner(self.SOURCE).scan_tokens()))[1]
+        for name, tokens in sources.items():
+            with self.subTest(name):
+                _, errors = self.parse_errors(tokens)
+                self.assertEqual(
+                    [(e.token.line, e.message) for e in errors.errors],
+                    [(e.token.line, e.message) for e in expected.errors],
+                )
+
+    def test_without_recovery_raises_the_first_error(self):
+        parser = Parser(Scanner(self.SOURCE).scan_tokens(), recover=False)
+        with self.assertRaises(ParserException) as context:
+            list(parser.parse())
+        self.assertNotIsInstance(context.exception, ParserErrors)
+        self.assertEqual(context.exception.token.line, 2)
+
+    def test_error_at_end_of_file(self):
+        _, errors = self.parse_errors(Scanner("print 1; {").scan_tokens())
+        self.assertEqual(len(errors.errors), 1)
+        self.assertEqual(errors.token.type, t.EOF)
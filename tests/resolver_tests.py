@@ -0,0 +1,82 @@
+import unittest
+
+from pylox.interpreter import Interpreter
+from pylox.parser.parser import Parser
+from pylox.resolver import Resolver, ResolverException
+from pylox.scanner import Scanner
+
+
+def resolve(source: str):
+    stmts = list(Parser(Scanner(source).scan_tokens()).parse())
+    Resolver(Interpreter())._resolve_all(stmts)
+    return stmts
+
+
+class ResolverTests(unittest.TestCase):
+    def test_globals_have_no_slot(self):
+        declaration, stmt = resolve("var a = 1; print a;")
+        self.assertIsNone(declaration.slot)
+        self.assertIsNone(stmt.expression.depth)
+        self.assertIsNone(stmt.expression.slot)
+
+    def test_nested_blocks_share_a_frame(self):
+        (block,) = resolve("{ var a = 1; var b = 2; { var c = a; print b; } }")
+        a, b, inner = block.statements
+        c, stmt = inner.statements
+        self.assertEqual((a.slot, b.slot, c.slot), (0, 1, 2))
+        self.assertEqual((block.size, inner.size), (3, 0))
+        self.assertEqual((c.initialiser.depth, c.initialiser.slot), (0, 0))
+        self.assertEqual((stmt.expression.depth, stmt.expression.slot), (0, 1))
+
+    def test_function_blocks_use_the_call_frame(self):
+        (function,) = resolve("fun f(a) { var b; { var c = a; } for (;;) b = c; }")
+        b, block, loop = function.body
+        self.assertEqual((b.slot, block.statements[0].slot), (1, 2))
+        self.assertEqual((function.size, block.size, loop.size), (3, 0, 0))
+
+    def test_captured_locals_are_upvalues_of_the_closure(self):
+        (function,) = resolve("""
+            fun f(a) {
+                var b;
+                {
+                    var c = 1;
+                    var d = 2;
+                    fun g() { return a + d; }
+                }
+            }
+        """)
+        b, block = function.body
+        c, d, g = block.statements
+        self.assertEqual((function.size, block.size), (5, 0))
+        self.assertEqual((b.slot, c.slot, d.slot, g.slot), (1, 2, 3, 4))
+        self.assertEqual((b.captured, c.captured, d.captured), (False, False, True))
+        self.assertEqual(function.captured_params, [0])
+        self.assertEqual(g.upvalues, [(True, 0), (True, 3)])
+        a_use, d_use = g.body[0].value.left, g.body[0].value.right
+        self.assertEqual((a_use.depth, a_use.slot, a_use.captured), (1, 0, True))
+        self.assertEqual((d_use.depth, d_use.slot, d_use.captured), (1, 1, True))
+
+    def test_upvalues_pass_through_functions_in_between(self):
+        (f,) = resolve("fun f(a) { fun g() { fun h() { return a; } } }")
+        (g,) = f.body
+        (h,) = g.body
+        self.assertEqual(g.upvalues, [(True, 0)])
+        self.assertEqual(h.upvalues, [(False, 0)])
+        use = h.body[0].value
+        self.assertEqual((use.depth, use.slot), (2, 0))
+
+    def test_uses_before_capture_read_the_cell(self):
+        (block,) = resolve("{ var a = 1; print a; fun f() { return a; } }")
+        a, stmt, _ = block.statements
+        self.assertTrue(a.captured)
+        self.assertTrue(stmt.expression.captured)
+
+    def test_top_level_return_is_an_error(self):
+        for source in ["print 1; return;", "{ return 1; }", "while (true) return;"]:
+            with self.subTest(source):
+                with self.assertRaises(ResolverException):
+                    resolve(source)
+
+    def test_redeclaring_local_is_an_error(self):
+        with self.assertRaises(ResolverException):
+            resolve("{ var a = 1; var a = 2; }")
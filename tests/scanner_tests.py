@@ -1,12 +1,20 @@
+import mmap
+import os
 import unittest
 
+from pylox.regex_scanner import RegexScanner
 from pylox.scanner import Scanner, ScannerError
 from pylox.token_types import TokenTypes
+from test_utils.fields import fields
 
 
-class ScannerTest_UnambiguousSingleCharTokens(unittest.TestCase):
+class ScannerTestCase(unittest.TestCase):
+    scanner_class: type = Scanner
+
+
+class ScannerTest_UnambiguousSingleCharTokens(ScannerTestCase):
     def test_single_left_paren(self):
-        scanner = Scanner("(")
+        scanner = self.scanner_class("(")
 
         tokens = list(scanner.scan_tokens())
 
@@ -20,7 +28,7 @@ class ScannerTest_UnambiguousSingleCharTokens(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
     def test_multiple_single_char_tokens(self):
-        scanner = Scanner("(-*")
+        scanner = self.scanner_class("(-*")
 
         tokens = list(scanner.scan_tokens())
 
@@ -31,7 +39,7 @@ class ScannerTest_UnambiguousSingleCharTokens(unittest.TestCase):
         self.assertEqual(tokens[3].type, TokenTypes.EOF)
 
     def test_single_invalid_char_should_return_scanner_error(self):
-        scanner = Scanner("@")
+        scanner = self.scanner_class("@")
 
         tokens = list(scanner.scan_tokens())
 
@@ -41,9 +49,9 @@ class ScannerTest_UnambiguousSingleCharTokens(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
 
-class ScannerTest_OperatorTokens(unittest.TestCase):
+class ScannerTest_OperatorTokens(ScannerTestCase):
     def test_not(self):
-        scanner = Scanner("!")
+        scanner = self.scanner_class("!")
 
         tokens = list(scanner.scan_tokens())
 
@@ -51,7 +59,7 @@ class ScannerTest_OperatorTokens(unittest.TestCase):
         self.assertEqual(tokens[0].type, TokenTypes.BANG)
 
     def test_not_equal(self):
-        scanner = Scanner("!=")
+        scanner = self.scanner_class("!=")
 
         tokens = list(scanner.scan_tokens())
 
@@ -59,7 +67,7 @@ class ScannerTest_OperatorTokens(unittest.TestCase):
         self.assertEqual(tokens[0].type, TokenTypes.BANG_EQUAL)
 
     def test_not_equal_greater(self):
-        scanner = Scanner("!=>")
+        scanner = self.scanner_class("!=>")
 
         tokens = list(scanner.scan_tokens())
 
@@ -68,7 +76,7 @@ class ScannerTest_OperatorTokens(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.GREATER)
 
     def test_not_equal_greater_equal(self):
-        scanner = Scanner("!=>=")
+        scanner = self.scanner_class("!=>=")
 
         tokens = list(scanner.scan_tokens())
 
@@ -77,7 +85,7 @@ class ScannerTest_OperatorTokens(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.GREATER_EQUAL)
 
     def test_div_equal(self):
-        scanner = Scanner("/=")
+        scanner = self.scanner_class("/=")
 
         tokens = list(scanner.scan_tokens())
 
@@ -86,9 +94,9 @@ class ScannerTest_OperatorTokens(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EQUAL)
 
 
-class ScannerTest_Comments(unittest.TestCase):
+class ScannerTest_Comments(ScannerTestCase):
     def test_slash_slash(self):
-        scanner = Scanner("//")
+        scanner = self.scanner_class("//")
 
         tokens = list(scanner.scan_tokens())
 
@@ -100,7 +108,7 @@ class ScannerTest_Comments(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
     def test_a_comment(self):
-        scanner = Scanner("// a comment")
+        scanner = self.scanner_class("// a comment")
 
         tokens = list(scanner.scan_tokens())
 
@@ -112,9 +120,9 @@ class ScannerTest_Comments(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
 
-class ScannerTest_Whitespace(unittest.TestCase):
+class ScannerTest_Whitespace(ScannerTestCase):
     def test_single_space(self):
-        scanner = Scanner(" ")
+        scanner = self.scanner_class(" ")
 
         tokens = list(scanner.scan_tokens())
 
@@ -127,7 +135,7 @@ class ScannerTest_Whitespace(unittest.TestCase):
 
     def test_multiple_whitespace(self):
         whitespace_text = "    \r\t\t\t"
-        scanner = Scanner(whitespace_text)
+        scanner = self.scanner_class(whitespace_text)
 
         tokens = list(scanner.scan_tokens())
 
@@ -139,9 +147,9 @@ class ScannerTest_Whitespace(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
 
-class ScannerTest_Newlines(unittest.TestCase):
+class ScannerTest_Newlines(ScannerTestCase):
     def test_single_newline(self):
-        scanner = Scanner("\n")
+        scanner = self.scanner_class("\n")
 
         tokens = list(scanner.scan_tokens())
 
@@ -153,7 +161,7 @@ class ScannerTest_Newlines(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
     def test_two_newlines(self):
-        scanner = Scanner("\n\n")
+        scanner = self.scanner_class("\n\n")
 
         tokens = list(scanner.scan_tokens())
 
@@ -164,7 +172,7 @@ class ScannerTest_Newlines(unittest.TestCase):
         self.assertEqual(tokens[1].line, 2)
 
     def test_operators_and_newlines(self):
-        scanner = Scanner(".\n.\n\n.")
+        scanner = self.scanner_class(".\n.\n\n.")
 
         tokens = list(scanner.scan_tokens())
 
@@ -184,9 +192,9 @@ class ScannerTest_Newlines(unittest.TestCase):
         self.assertEqual(tokens[6].type, TokenTypes.EOF)
 
 
-class ScannerTest_Strings(unittest.TestCase):
+class ScannerTest_Strings(ScannerTestCase):
     def test_single_empty_string(self):
-        scanner = Scanner('""')
+        scanner = self.scanner_class('""')
 
         tokens = list(scanner.scan_tokens())
 
@@ -198,7 +206,7 @@ class ScannerTest_Strings(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
     def test_single_nonempty_string(self):
-        scanner = Scanner('"asdf"')
+        scanner = self.scanner_class('"asdf"')
 
         tokens = list(scanner.scan_tokens())
 
@@ -210,7 +218,7 @@ class ScannerTest_Strings(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
     def test_unterminated_string(self):
-        scanner = Scanner('"this string is missing a trailing quote')
+        scanner = self.scanner_class('"this string is missing a trailing quote')
 
         tokens = list(scanner.scan_tokens())
 
@@ -219,7 +227,7 @@ class ScannerTest_Strings(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
     def test_string_with_newlines(self):
-        scanner = Scanner('"this string is \nover two lines"')
+        scanner = self.scanner_class('"this string is \nover two lines"')
 
         tokens = list(scanner.scan_tokens())
 
@@ -231,9 +239,9 @@ class ScannerTest_Strings(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
 
-class ScannerTest_Numbers(unittest.TestCase):
+class ScannerTest_Numbers(ScannerTestCase):
     def test_single_digit(self):
-        scanner = Scanner("2")
+        scanner = self.scanner_class("2")
 
         tokens = list(scanner.scan_tokens())
 
@@ -245,7 +253,7 @@ class ScannerTest_Numbers(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
     def test_multi_digit(self):
-        scanner = Scanner("234")
+        scanner = self.scanner_class("234")
 
         tokens = list(scanner.scan_tokens())
 
@@ -255,7 +263,7 @@ class ScannerTest_Numbers(unittest.TestCase):
         self.assertEqual(tokens[0].literal, 234)
 
     def test_fractional_number(self):
-        scanner = Scanner("100.12")
+        scanner = self.scanner_class("100.12")
 
         tokens = list(scanner.scan_tokens())
 
@@ -265,9 +273,9 @@ class ScannerTest_Numbers(unittest.TestCase):
         self.assertEqual(tokens[0].literal, 100.12)
 
 
-class ScannerTest_Identifiers(unittest.TestCase):
+class ScannerTest_Identifiers(ScannerTestCase):
     def test_single_char(self):
-        scanner = Scanner("a")
+        scanner = self.scanner_class("a")
 
         tokens = list(scanner.scan_tokens())
 
@@ -279,7 +287,7 @@ class ScannerTest_Identifiers(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
     def test_multiple_char(self):
-        scanner = Scanner("ab")
+        scanner = self.scanner_class("ab")
 
         tokens = list(scanner.scan_tokens())
 
@@ -289,7 +297,7 @@ class ScannerTest_Identifiers(unittest.TestCase):
         self.assertEqual(tokens[0].literal, None)
 
     def test_multiple_chars_with_underscore(self):
-        scanner = Scanner("a_b")
+        scanner = self.scanner_class("a_b")
 
         tokens = list(scanner.scan_tokens())
 
@@ -299,7 +307,7 @@ class ScannerTest_Identifiers(unittest.TestCase):
         self.assertEqual(tokens[0].literal, None)
 
     def test_identifier_starting_with_keyword(self):
-        scanner = Scanner("orchid")
+        scanner = self.scanner_class("orchid")
 
         tokens = list(scanner.scan_tokens())
 
@@ -309,7 +317,7 @@ class ScannerTest_Identifiers(unittest.TestCase):
         self.assertEqual(tokens[0].literal, None)
 
     def test_identifier_made_of_two_keywords(self):
-        scanner = Scanner("orclass")
+        scanner = self.scanner_class("orclass")
 
         tokens = list(scanner.scan_tokens())
 
@@ -319,9 +327,9 @@ class ScannerTest_Identifiers(unittest.TestCase):
         self.assertEqual(tokens[0].literal, None)
 
 
-class ScannerTest_Keywords(unittest.TestCase):
+class ScannerTest_Keywords(ScannerTestCase):
     def test_or_keyword(self):
-        scanner = Scanner("or")
+        scanner = self.scanner_class("or")
 
         tokens = list(scanner.scan_tokens())
 
@@ -333,7 +341,7 @@ class ScannerTest_Keywords(unittest.TestCase):
         self.assertEqual(tokens[1].type, TokenTypes.EOF)
 
 
-class ScannerTest_Combinations(unittest.TestCase):
+class ScannerTest_Combinations(ScannerTestCase):
     def filter_useless_tokens(self, tokens):
         useless = set(
             [
@@ -344,7 +352,7 @@ class ScannerTest_Combinations(unittest.TestCase):
         return (token for token in tokens if token.type not in useless)
 
     def scan_useful_tokens(self, string):
-        tokens = Scanner(string).scan_tokens()
+        tokens = self.scanner_class(string).scan_tokens()
         return list(self.filter_useless_tokens(tokens))
 
     def test_this_or_that(self):
@@ -401,3 +409,163 @@ class ScannerTest_Combinations(unittest.TestCase):
         self.assertEqual(tokens[10].type, TokenTypes.RIGHT_BRACE)
         self.assertEqual(tokens[11].type, TokenTypes.RIGHT_BRACE)
         self.assertEqual(tokens[12].type, TokenTypes.EOF)
+
+
+class ScannerTest_SkipTrivia(ScannerTestCase):
+    def scan_without_trivia(self, string):
+        return list(self.scanner_class(string).scan_tokens(skip_trivia=True))
+
+    def test_only_trivia(self):
+        tokens = self.scan_without_trivia(" \t// comment\n\r\n")
+
+        self.assertEqual(len(tokens), 1)
+        self.assertEqual(tokens[0].type, TokenTypes.EOF)
+        self.assertEqual(tokens[0].line, 3)
+
+    def test_lines_are_tracked(self):
+        tokens = self.scan_without_trivia(
+            """var a = 1; // one
+            // two
+
+            print "three\nfour" ;
+            a"""
+        )
+
+        self.assertEqual(
+            [(t.type, t.line) for t in tokens],
+            [
+                (TokenTypes.VAR, 1),
+                (TokenTypes.IDENTIFIER, 1),
+                (TokenTypes.EQUAL, 1),
+                (TokenTypes.NUMBER, 1),
+                (TokenTypes.SEMICOLON, 1),
+                (TokenTypes.PRINT, 4),
+                (TokenTypes.STRING, 5),
+                (TokenTypes.SEMICOLON, 5),
+                (TokenTypes.IDENTIFIER, 6),
+                (TokenTypes.EOF, 6),
+            ],
+        )
+
+    def test_same_as_filtered_full_stream(self):
+        source = 'fun f(a) {\n  // hi\n  return a/2; }\n@\n"x\ny" // end'
+        trivia = [TokenTypes.WHITESPACE, TokenTypes.NEWLINE, TokenTypes.COMMENT]
+        expected = [
+            fields(t)
+            for t in self.scanner_class(source).scan_tokens()
+            if getattr(t, "type", None) not in trivia
+        ]
+        actual = [fields(t) for t in self.scan_without_trivia(source)]
+        self.assertEqual(actual, expected)
+
+
+class RegexScannerTest_UnambiguousSingleCharTokens(
+    ScannerTest_UnambiguousSingleCharTokens
+):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_OperatorTokens(ScannerTest_OperatorTokens):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_Comments(ScannerTest_Comments):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_Whitespace(ScannerTest_Whitespace):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_Newlines(ScannerTest_Newlines):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_Strings(ScannerTest_Strings):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_Numbers(ScannerTest_Numbers):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_Identifiers(ScannerTest_Identifiers):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_Keywords(ScannerTest_Keywords):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_Combinations(ScannerTest_Combinations):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_SkipTrivia(ScannerTest_SkipTrivia):
+    scanner_class = RegexScanner
+
+
+class RegexScannerTest_SameTokensAsScanner(unittest.TestCase):
+    def assert_same_tokens(self, source):
+        expected = [fields(t) for t in Scanner(source).scan_tokens()]
+        actual = [fields(t) for t in RegexScanner(source).scan_tokens()]
+        self.assertEqual(actual, expected)
+
+    def test_lox_test_file(self):
+        this_dir = os.path.dirname(__file__)
+        with open(os.path.join(this_dir, "lox_test_file.lox")) as infile:
+            self.assert_same_tokens(infile.read())
+
+    def test_errors_and_odd_input(self):
+        sources = [
+            "@ # $",
+            'var a = "unterminated\n\nstring',
+            "1.2.3 4. .5 a_b_ _c",
+            "!===<=>=/ //\n// \n\t\r\n",
+            '"multi\nline" x\n"another\n\n" y',
+        ]
+        for source in sources:
+            with self.subTest(source=source):
+                self.assert_same_tokens(source)
+
+
+class RegexScannerTest_Bytes(unittest.TestCase):
+    def assert_same_tokens_as_str(self, source: str, skip_trivia=False):
+        expected = [fields(t) for t in RegexScanner(source).scan_tokens(skip_trivia)]
+        actual = [
+            fields(t) for t in RegexScanner(source.encode()).scan_tokens(skip_trivia)
+        ]
+        self.assertEqual(actual, expected)
+
+    def test_lox_test_file(self):
+        this_dir = os.path.dirname(__file__)
+        with open(os.path.join(this_dir, "lox_test_file.lox")) as infile:
+            source = infile.read()
+        self.assert_same_tokens_as_str(source)
+        self.assert_same_tokens_as_str(source, skip_trivia=True)
+
+    def test_non_ascii_text(self):
+        self.assert_same_tokens_as_str('print "héllo ✓\nwörld"; // ünïcode')
+
+    def test_non_ascii_error_character(self):
+        tokens = list(RegexScanner("a ✓ b".encode()).scan_tokens())
+
+        self.assertIsInstance(tokens[2], ScannerError)
+        self.assertIn('"✓"', tokens[2].message)
+        self.assertEqual(tokens[4].lexeme, "b")
+
+    def test_memory_mapped_file(self):
+        this_dir = os.path.dirname(__file__)
+        path = os.path.join(this_dir, "lox_test_file.lox")
+        with open(path) as infile:
+            expected = [fields(t) for t in RegexScanner(infile.read()).scan_tokens()]
+        with open(path, "rb") as infile:
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                actual = [fields(t) for t in RegexScanner(mapped).scan_tokens()]
+        self.assertEqual(actual, expected)
+
+    def test_char_scanner_decodes_bytes(self):
+        source = 'var a = "✓";'
+        expected = [fields(t) for t in Scanner(source).scan_tokens()]
+        actual = [fields(t) for t in Scanner(source.encode()).scan_tokens()]
+        self.assertEqual(actual, expected)
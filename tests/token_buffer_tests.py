@@ -0,0 +1,92 @@
+import os
+import unittest
+
+from pylox.parser.parser import Parser, ParserException
+from pylox.regex_scanner import RegexScanner
+from pylox.token import Token
+from pylox.token_types import TokenTypes
+from test_utils.fields import fields
+
+SOURCE = """var a = 1.5; // one
+fun f(x) {
+    return "multi
+line" + x;
+}
+print f(a) >= 2;
+"""
+
+
+def dump(thing):
+    if isinstance(thing, Token):
+        return fields(thing)
+    if isinstance(thing, list):
+        return [dump(x) for x in thing]
+    if hasattr(thing, "__slots__"):
+        return (type(thing).__name__, {k: dump(v) for k, v in fields(thing).items()})
+    return thing
+
+
+class TokenBufferTests(unittest.TestCase):
+    def test_tokens_match_scanned_tokens(self):
+        for source in [SOURCE, SOURCE.encode(), "", "\n\n", "a\n"]:
+            with self.subTest(source=source):
+                buffer = RegexScanner(source).scan_buffer()
+                expected = [
+                    fields(token)
+                    for token in RegexScanner(source).scan_tokens(skip_trivia=True)
+                ]
+                self.assertEqual([fields(token) for token in buffer], expected)
+
+    def test_columns(self):
+        buffer = RegexScanner("print 12;").scan_buffer()
+
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.type(1), TokenTypes.NUMBER)
+        self.assertEqual((buffer.starts[1], buffer.ends[1]), (6, 8))
+        self.assertEqual(buffer.lexeme(1), "12")
+        self.assertEqual(buffer.literal(1), 12.0)
+        self.assertEqual(buffer.type(3), TokenTypes.EOF)
+
+    def test_line_numbers(self):
+        buffer = RegexScanner(SOURCE).scan_buffer()
+
+        lines = {buffer.lexeme(i): buffer.line(i) for i in range(len(buffer))}
+        self.assertEqual(lines["var"], 1)
+        self.assertEqual(lines["fun"], 2)
+        self.assertEqual(lines['"multi\nline"'], 4)
+        self.assertEqual(lines["print"], 6)
+        self.assertEqual(buffer.line(len(buffer) - 1), 7)
+
+    def test_scanner_errors(self):
+        buffer = RegexScanner('a\n@ "b\n').scan_buffer()
+
+        self.assertEqual(
+            [(e.line, e.message) for e in buffer.errors],
+            [
+                (2, 'unexpected character "@" at line 2'),
+                (3, "unterminated string at line 3"),
+            ],
+        )
+
+
+class TokenBufferParserTests(unittest.TestCase):
+    def test_same_ast_as_token_list(self):
+        this_dir = os.path.dirname(__file__)
+        with open(os.path.join(this_dir, "lox_test_file.lox")) as infile:
+            lox_test_file = infile.read()
+
+        for source in [SOURCE, lox_test_file]:
+            with self.subTest(source=source):
+                tokens = list(RegexScanner(source).scan_tokens())
+                expected = list(Parser(tokens).parse())
+                actual = list(Parser(RegexScanner(source).scan_buffer()).parse())
+                self.assertEqual(dump(actual), dump(expected))
+
+    def test_error_token(self):
+        buffer = RegexScanner("print 1;\nprint (2;").scan_buffer()
+
+        with self.assertRaises(ParserException) as context:
+            list(Parser(buffer).parse())
+
+        self.assertEqual(context.exception.token.lexeme, ";")
+        self.assertEqual(context.exception.token.line, 2)
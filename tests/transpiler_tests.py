@@ -0,0 +1,226 @@
+import functools
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pylox.lox import Lox
+from pylox.transpiler import (
+    MIN_CACHED_SOURCE,
+    ModuleCache,
+    PythonInterpreter,
+    Transpiler,
+)
+from tests import lox_tests
+
+from test_utils.test_io import TestOutputStream
+
+
+class PythonEngine(unittest.TestCase):
+    """Runs a test case from lox_tests with the python engine"""
+
+    def setUp(self):
+        python_lox = functools.partial(Lox, engine="python")
+        patch = mock.patch.object(lox_tests, "Lox", python_lox)
+        patch.start()
+        self.addCleanup(patch.stop)
+        super().setUp()
+
+
+class ExpressionTests(PythonEngine, lox_tests.LoxTests_Execute_Expressions):
+    pass
+
+
+class StatementTests(PythonEngine, lox_tests.LoxTests_Execute_Statements):
+    pass
+
+
+class VariableTests(PythonEngine, lox_tests.LoxTests_Variables):
+    pass
+
+
+class GlobalTests(PythonEngine, lox_tests.LoxTests_Globals):
+    pass
+
+
+class ScopingTests(PythonEngine, lox_tests.LoxTests_Scoping):
+    pass
+
+
+class IfElseTests(PythonEngine, lox_tests.LoxTests_IfElse):
+    pass
+
+
+class StreamingTests(PythonEngine, lox_tests.LoxTests_Streaming):
+    pass
+
+
+class ClosureTests(PythonEngine, lox_tests.LoxTests_Closures):
+    pass
+
+
+class FileRunnerTests(PythonEngine, lox_tests.LoxFileRunnerTests):
+    pass
+
+
+class LogicalOperatorTests(PythonEngine, lox_tests.LoxTests_LogicalOperators):
+    pass
+
+
+class WhileLoopTests(PythonEngine, lox_tests.LoxTests_WhileLoops):
+    pass
+
+
+class ForLoopTests(PythonEngine, lox_tests.LoxTests_ForLoops):
+    pass
+
+
+class FunctionTests(PythonEngine, lox_tests.LoxTests_Functions):
+    pass
+
+
+def transpile(source: str) -> str:
+    return Transpiler().transpile(Lox().compile(source).statements).source
+
+
+class TranspilerTests(unittest.TestCase):
+    def test_locals_are_python_locals(self):
+        source = transpile("fun f(a) { var b = a; return b; }")
+        self.assertIn("def _lox_def_f(a_1_0):", source)
+        self.assertIn("b_1_1 = a_1_0", source)
+        self.assertIn("return b_1_1", source)
+
+    def test_assigned_upvalues_are_nonlocal(self):
+        source = transpile("fun f() { var c = 0; fun g() { c = c + 1; } }")
+        self.assertIn("nonlocal c_1_0", source)
+
+    def test_locals_captured_in_loops_are_cells(self):
+        source = transpile("while (true) { var a = 1; fun f() { return a; } }")
+        self.assertIn("a_1_0 = _lox_Cell(1.0)", source)
+        self.assertIn("def f_1_1(*, a_1_0=a_1_0):", source)
+        self.assertIn("return a_1_0.value", source)
+
+    def test_checked_operators(self):
+        source = transpile("fun f(a) { return -a; } fun g() { return -1; }")
+        self.assertIn("operand must be a number", source)
+        self.assertIn("return -1.0", source)
+
+    def test_optimiser_temporaries(self):
+        source = transpile("fun f(a) { return (a + 1) * (a + 1); }")
+        compile(source, "<test>", "exec")
+        self.assertIn("tmp_1_1", source)
+
+
+class ModuleCacheTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = ModuleCache(directory.name)
+        self.source = "x = 1\n" * MIN_CACHED_SOURCE
+
+    def test_stores_compiled_modules(self):
+        self.assertIsNone(self.cache.load(self.source))
+        code = self.cache.compile(self.source)
+        self.assertEqual(self.cache.load(self.source), code)
+
+    def test_small_modules_are_not_stored(self):
+        self.cache.compile("x = 1\n")
+        self.assertEqual(os.listdir(self.cache.directory), [])
+
+    def test_corrupt_files_are_misses(self):
+        self.cache.compile(self.source)
+        with open(self.cache.path(self.source), "wb") as outfile:
+            outfile.write(b"not marshal")
+        self.assertIsNone(self.cache.load(self.source))
+        namespace = {}
+        exec(self.cache.compile(self.source), namespace)
+        self.assertEqual(namespace["x"], 1)
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "needs Unix permissions")
+    def test_directories_others_can_write_to_are_not_used(self):
+        self.cache.compile(self.source)
+        os.chmod(self.cache.directory, 0o777)
+        self.assertIsNone(self.cache.load(self.source))
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "needs Unix permissions")
+    def test_default_directory_is_the_users_own(self):
+        cache = ModuleCache()
+        cache.compile(self.source)
+        self.assertIn(str(os.getuid()), cache.directory)
+        self.assertEqual(os.stat(cache.directory).st_mode & 0o777, 0o700)
+
+
+class PythonInterpreterTests(unittest.TestCase):
+    def setUp(self):
+        self.output = TestOutputStream()
+        self.lox = Lox(output=self.output, engine="python")
+
+    def test_uses_python_interpreter(self):
+        self.assertIsInstance(self.lox.interpreter, PythonInterpreter)
+
+    def test_errors_match_tree_engine(self):
+        programs = [
+            'print 1 - "a";',
+            'print -"a";',
+            'print 1 + "a";',
+            'print "a" + 1;',
+            "print nope;",
+            "nope = 1;",
+            "var a = 1; a();",
+            "fun f(a) {} f();",
+            "fun f() { return 1 < nil; } { var x = 1; print x + f(); }",
+            'for (var i = 0; i < "a"; i = i + 1) print i;',
+        ]
+        for program in programs:
+            with self.subTest(program):
+                tree_output = TestOutputStream()
+                Lox(output=tree_output, throw=False).execute(program)
+                Lox(output=self.output, throw=False, engine="python").execute(program)
+                self.assertEqual(self.output.last_sent, tree_output.last_sent)
+
+    def test_deep_expressions_run_in_the_interpreter(self):
+        # nested deeper than Python's compiler allows
+        lox = Lox(output=self.output, engine="python", optimise=False)
+        lox.execute("print " + " + ".join(["1"] * 300) + ";")
+        self.assertEqual(self.output.last_sent, 300)
+        lox.execute("print " + "-" * 250 + "1;")
+        self.assertEqual(self.output.last_sent, 1)
+
+    def test_closures_in_loops_keep_their_own_variable(self):
+        self.lox.execute(
+            """
+            var first;
+            for (var i = 0; i < 3; i = i + 1) {
+                var j = i;
+                fun f() { j = j + 10; return j; }
+                if (first == nil) first = f;
+            }
+            first();
+            print first();
+            """
+        )
+        self.assertEqual(self.output.last_sent, 20)
+
+    def test_function_returns_from_loop_in_block(self):
+        self.lox.execute(
+            """
+            fun find(n) {
+                for (var i = 0; i < 10; i = i + 1) {
+                    { if (i * i >= n) return i; }
+                }
+                return nil;
+            }
+            print find(20);
+            print find(200);
+            """
+        )
+        self.assertEqual(self.output.num_sent(), 2)
+        self.assertEqual(self.output.last_sent, "nil")
+
+    def test_functions_print_their_name(self):
+        self.lox.execute("fun f() {} print f;")
+        self.assertEqual(str(self.output.last_sent), "<fn f>")
+
+    def test_native_function(self):
+        self.lox.execute("print clock() > 0;")
+        self.assertEqual(self.output.last_sent, True)
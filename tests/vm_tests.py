@@ -0,0 +1,257 @@
+import functools
+import unittest
+from unittest import mock
+
+from pylox.environment import Environment
+from pylox.lox import Lox
+from pylox.vm import Compiler, disassemble
+from pylox.vm import opcodes as op
+from pylox.vm.objects import Function
+from tests import lox_tests
+
+from test_utils.test_io import TestOutputStream
+
+
+def compile(source: str) -> Function:
+    """The script of source's only top level statement"""
+    (statement,) = Lox().compile(source).statements
+    return Compiler(Environment()).compile(statement)
+
+
+def opcodes(function: Function):
+    code = function.chunk.code
+    offset = 0
+    found = []
+    while offset < len(code):
+        found.append(code[offset])
+        offset += 2 if code[offset] in op.HAS_OPERAND else 1
+    return found
+
+
+class VMEngine(unittest.TestCase):
+    """Runs a test case from lox_tests with the vm engine"""
+
+    def setUp(self):
+        vm_lox = functools.partial(Lox, engine="vm")
+        patch = mock.patch.object(lox_tests, "Lox", vm_lox)
+        patch.start()
+        self.addCleanup(patch.stop)
+        super().setUp()
+
+
+class ExpressionTests(VMEngine, lox_tests.LoxTests_Execute_Expressions):
+    pass
+
+
+class StatementTests(VMEngine, lox_tests.LoxTests_Execute_Statements):
+    pass
+
+
+class VariableTests(VMEngine, lox_tests.LoxTests_Variables):
+    pass
+
+
+class GlobalTests(VMEngine, lox_tests.LoxTests_Globals):
+    pass
+
+
+class ScopingTests(VMEngine, lox_tests.LoxTests_Scoping):
+    pass
+
+
+class IfElseTests(VMEngine, lox_tests.LoxTests_IfElse):
+    pass
+
+
+class StreamingTests(VMEngine, lox_tests.LoxTests_Streaming):
+    pass
+
+
+class ClosureTests(VMEngine, lox_tests.LoxTests_Closures):
+    pass
+
+
+class FileRunnerTests(VMEngine, lox_tests.LoxFileRunnerTests):
+    pass
+
+
+class LogicalOperatorTests(VMEngine, lox_tests.LoxTests_LogicalOperators):
+    pass
+
+
+class WhileLoopTests(VMEngine, lox_tests.LoxTests_WhileLoops):
+    pass
+
+
+class ForLoopTests(VMEngine, lox_tests.LoxTests_ForLoops):
+    pass
+
+
+class FunctionTests(VMEngine, lox_tests.LoxTests_Functions):
+    pass
+
+
+class CompilerTests(unittest.TestCase):
+    def test_expression(self):
+        script = compile("print 1 + 2 * -nope;")
+        self.assertEqual(
+            opcodes(script),
+            [
+                op.CONSTANT,
+                op.CONSTANT,
+                op.GET_GLOBAL,
+                op.NEGATE,
+                op.MULTIPLY,
+                op.ADD,
+                op.PRINT,
+                op.NIL,
+                op.RETURN,
+            ],
+        )
+
+    def test_constants_are_added_once(self):
+        script = compile('print nope + "a" + "a" + nope;')
+        nope, a = script.chunk.constants
+        self.assertEqual(a, "a")
+        self.assertIs(nope, nope.table.cell("nope"))
+
+    def test_constant_right_operands(self):
+        script = compile('print nope < 2 == (nope + "s");')
+        self.assertEqual(
+            opcodes(script)[:6],
+            [
+                op.GET_GLOBAL,
+                op.LESS_CONSTANT,
+                op.GET_GLOBAL,
+                op.ADD_CONSTANT,
+                op.EQUAL,
+                op.PRINT,
+            ],
+        )
+
+    def test_block_locals_are_in_the_script_frame(self):
+        script = compile("{ var a = 1; { var b = a; } }")
+        self.assertEqual(script.size, 2)
+        self.assertEqual(len(script.locals), 2)
+
+    def test_assignment_statements_store(self):
+        script = compile("fun f(a) { a = a + 1; }")
+        function = script.chunk.constants[0]
+        self.assertEqual(
+            opcodes(function),
+            [op.GET_LOCAL, op.ADD_CONSTANT, op.STORE_LOCAL, op.NIL, op.RETURN],
+        )
+
+    def test_captured_variables(self):
+        script = compile("fun f(a) { var b; fun g() { a = b; } }")
+        f = script.chunk.constants[0]
+        g = f.chunk.constants[0]
+        self.assertEqual(f.captured_params, (0,))
+        self.assertEqual(opcodes(f)[:2], [op.NIL, op.STORE_CELL])
+        self.assertEqual(g.upvalues, ((True, 1), (True, 0)))
+        self.assertEqual(opcodes(g)[:3], [op.GET_UPVALUE, op.SET_UPVALUE, op.POP])
+
+    def test_jumps_go_past_what_they_skip(self):
+        script = compile("if (nope) print 1; else print 2;")
+        code = script.chunk.code
+        # GET_GLOBAL, JUMP_IF_FALSE, CONSTANT, PRINT, JUMP, CONSTANT, PRINT
+        self.assertEqual((code[2], code[7]), (op.JUMP_IF_FALSE, op.JUMP))
+        self.assertEqual(4 + code[3], 9)
+        self.assertEqual(9 + code[8], 12)
+
+    def test_loops_jump_back_to_the_condition(self):
+        script = compile("while (nope) print 1;")
+        code = script.chunk.code
+        loop = len(code) - 4
+        self.assertEqual(code[loop], op.LOOP)
+        self.assertEqual(loop + 2 - code[loop + 1], 0)
+
+    def test_line_table(self):
+        script = compile("print\n1\n+\nnope;")
+        self.assertEqual(len(script.chunk.lines), len(script.chunk.code))
+        # GET_GLOBAL nope, ADD
+        self.assertEqual(script.chunk.lines[2], 4)
+        self.assertEqual(script.chunk.lines[4], 3)
+
+
+class DisassemblerTests(unittest.TestCase):
+    def test_disassemble(self):
+        script = compile("fun f(a) {\n  if (a) return a;\n}")
+        self.assertEqual(
+            disassemble(script),
+            "\n".join(
+                [
+                    "== script ==",
+                    "0000    1 CLOSURE              0 <fn f>",
+                    "0002    | DEFINE_GLOBAL        1 'f'",
+                    "0004    | NIL",
+                    "0005    | RETURN",
+                    "",
+                    "== f ==",
+                    "0000    2 GET_LOCAL            0",
+                    "0002    | JUMP_IF_FALSE        3 -> 7",
+                    "0004    | GET_LOCAL            0",
+                    "0006    | RETURN",
+                    "0007    | NIL",
+                    "0008    | RETURN",
+                ]
+            ),
+        )
+
+
+class VirtualMachineTests(unittest.TestCase):
+    def setUp(self):
+        self.output = TestOutputStream()
+        self.lox = Lox(output=self.output, engine="vm")
+
+    def test_errors_match_tree_engine(self):
+        programs = [
+            'print 1 - "a";',
+            'print -"a";',
+            'print 1 + "a";',
+            "print nope;",
+            "nope = 1;",
+            "var a = 1; a();",
+            "fun f(a) {} f();",
+            "fun f() { return 1 < nil; } { var x = 1; print x + f(); }",
+            'for (var i = 0; i < "a"; i = i + 1) print i;',
+        ]
+        for program in programs:
+            with self.subTest(program):
+                tree_output = TestOutputStream()
+                Lox(output=tree_output, throw=False).execute(program)
+                Lox(output=self.output, throw=False, engine="vm").execute(program)
+                self.assertEqual(self.output.last_sent, tree_output.last_sent)
+
+    def test_negative_zero_constant(self):
+        # 0.0 == -0.0, so they mustn't share a constant
+        self.lox.execute("fun f() { print 0; print -0; var b = -0; print b; } f();")
+        self.assertEqual(
+            [str(value) for value in self.output.sent], ["0.0", "-0.0", "-0.0"]
+        )
+
+    def test_deep_recursion(self):
+        # deeper than Python's recursion limit
+        self.lox.execute(
+            """
+            fun count(n) { if (n == 0) return 0; return 1 + count(n - 1); }
+            print count(5000);
+            """
+        )
+        self.assertEqual(self.output.last_sent, 5000)
+
+    def test_unbounded_recursion(self):
+        # raises the error that the other engines do, rather than running
+        # until it's out of memory
+        with self.assertRaises(RecursionError):
+            self.lox.execute("fun f() { f(); } f();")
+
+    def test_native_function(self):
+        self.lox.execute("print clock() > 0;")
+        self.assertEqual(self.output.last_sent, True)
+
+    def test_string_concatenation(self):
+        self.lox.execute(
+            'var s = ""; for (var i = 0; i < 3; i = i + 1) s = s + "ab"; print s;'
+        )
+        self.assertEqual(self.output.last_sent, "ababab")